@@ -6,7 +6,7 @@ from sqlalchemy import pool
 from alembic import context
 
 from api.dependencies import Base
-from api.models import comment, customer, delivery, product, purchase, rating
+from api.models import comment, customer, delivery, idempotency, invalidation, job, product, purchase, rating, revenue, score
 
 import os
 import sys
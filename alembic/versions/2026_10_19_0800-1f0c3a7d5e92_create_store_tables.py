@@ -0,0 +1,164 @@
+"""create store tables
+
+Revision ID: 1f0c3a7d5e92
+Revises:
+Create Date: 2026-10-19 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f0c3a7d5e92'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases that predate the migrations already have the original tables
+    if 'products' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'customers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('firstname', sa.String(length=50), nullable=False),
+        sa.Column('lastname', sa.String(length=50), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('phone', sa.String(length=20), nullable=False),
+        sa.Column('delivery_address', sa.String(length=500), nullable=False),
+        sa.Column('billing_address', sa.String(length=500), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.CheckConstraint('length(firstname) >= 2', name='check_firstname_length'),
+        sa.CheckConstraint('length(lastname) >= 2', name='check_lastname_length'),
+        sa.CheckConstraint("email LIKE '%@%.%'", name='check_email_format'),
+        sa.CheckConstraint('length(phone) >= 10', name='check_phone_length'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_customers_email', 'customers', ['email'], unique=True)
+    op.create_index('ix_customers_id', 'customers', ['id'], unique=False)
+
+    op.create_table(
+        'deliveries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column(
+            'type',
+            sa.Enum('STANDARD', 'EXPRESS', 'SAME_DAY', 'INTERNATIONAL', name='deliverytype'),
+            nullable=False
+        ),
+        sa.Column(
+            'status',
+            sa.Enum(
+                'PROCESSING', 'SHIPPED', 'IN_TRANSIT', 'OUT_FOR_DELIVERY', 'DELIVERED', 'FAILED',
+                'RETURNED', name='deliverystatus'
+            ),
+            nullable=False
+        ),
+        sa.Column('min_days', sa.Integer(), nullable=False),
+        sa.Column('max_days', sa.Integer(), nullable=False),
+        sa.Column('tracking_number', sa.String(length=100), nullable=True),
+        sa.Column('carrier', sa.String(length=100), nullable=True),
+        sa.Column('notes', sa.String(length=500), nullable=True),
+        sa.Column('shipping_date', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('delivery_date', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('estimated_delivery', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.CheckConstraint('min_days >= 0', name='check_min_days_positive'),
+        sa.CheckConstraint('max_days > min_days', name='check_max_days_greater'),
+        sa.CheckConstraint(
+            '(shipping_date IS NULL) OR (delivery_date IS NULL) OR (shipping_date <= delivery_date)',
+            name='check_shipping_before_delivery'
+        ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deliveries_id', 'deliveries', ['id'], unique=False)
+
+    op.create_table(
+        'products',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('image_url', sa.String(length=500), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.String(length=1000), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('in_stock', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.CheckConstraint('price > 0', name='check_positive_price'),
+        sa.CheckConstraint('quantity >= 0', name='check_non_negative_quantity'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_products_id', 'products', ['id'], unique=False)
+    op.create_index('ix_products_category', 'products', ['category'], unique=False)
+    op.create_index('ix_products_name', 'products', ['name'], unique=False)
+
+    op.create_table(
+        'comments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.String(length=1000), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.CheckConstraint('length(content) >= 3', name='check_comment_length'),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_comments_product_id', 'comments', ['product_id'], unique=False)
+    op.create_index('ix_comments_id', 'comments', ['id'], unique=False)
+    op.create_index('ix_comments_customer_id', 'comments', ['customer_id'], unique=False)
+
+    op.create_table(
+        'purchases',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('unit_price', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('delivery_id', sa.Integer(), nullable=True),
+        sa.Column('purchase_date', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.CheckConstraint('quantity > 0', name='check_positive_quantity'),
+        sa.CheckConstraint('unit_price > 0', name='check_positive_unit_price'),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='RESTRICT'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='RESTRICT'),
+        sa.ForeignKeyConstraint(['delivery_id'], ['deliveries.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_purchases_id', 'purchases', ['id'], unique=False)
+    op.create_index('ix_purchases_delivery_id', 'purchases', ['delivery_id'], unique=False)
+    op.create_index('ix_purchases_product_id', 'purchases', ['product_id'], unique=False)
+    op.create_index('ix_purchases_customer_id', 'purchases', ['customer_id'], unique=False)
+
+    op.create_table(
+        'ratings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('rating', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.CheckConstraint('rating >= 1 AND rating <= 5', name='check_rating_range'),
+        sa.UniqueConstraint('customer_id', 'product_id', name='unique_customer_product_rating'),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ratings_product_id', 'ratings', ['product_id'], unique=False)
+    op.create_index('ix_ratings_customer_id', 'ratings', ['customer_id'], unique=False)
+    op.create_index('ix_ratings_id', 'ratings', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    # The store tables may predate this revision (see upgrade), and dropping
+    # them would delete every customer, product and purchase; leave them be
+    pass
@@ -0,0 +1,65 @@
+"""add customer search columns
+
+Revision ID: 8c41d7e2f9a3
+Revises: 5b2e8f1c4a70
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d7e2f9a3'
+down_revision: Union[str, None] = '5b2e8f1c4a70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = {
+    'search_firstname': 50,
+    'search_lastname': 50,
+    'search_email': 255,
+    'search_phone': 20,
+}
+
+
+def upgrade() -> None:
+    for name, length in SEARCH_COLUMNS.items():
+        op.add_column('customers', sa.Column(name, sa.String(length=length), nullable=True))
+
+    # Backfill with the same normalization as api.models.customer
+    connection = op.get_bind()
+    customers = connection.execute(
+        sa.text('SELECT id, firstname, lastname, email, phone FROM customers')
+    ).all()
+    if customers:
+        connection.execute(
+            sa.text(
+                'UPDATE customers SET search_firstname = :firstname, '
+                'search_lastname = :lastname, search_email = :email, '
+                'search_phone = :phone WHERE id = :id'
+            ),
+            [
+                {
+                    'id': customer.id,
+                    'firstname': customer.firstname.strip().casefold(),
+                    'lastname': customer.lastname.strip().casefold(),
+                    'email': customer.email.strip().casefold(),
+                    'phone': ''.join(char for char in customer.phone if char.isdigit()),
+                }
+                for customer in customers
+            ]
+        )
+
+    for name in SEARCH_COLUMNS:
+        op.create_index(f'ix_customers_{name}', 'customers', [name], unique=False)
+
+
+def downgrade() -> None:
+    for name in SEARCH_COLUMNS:
+        op.drop_index(f'ix_customers_{name}', table_name='customers')
+    with op.batch_alter_table('customers') as batch_op:
+        for name in SEARCH_COLUMNS:
+            batch_op.drop_column(name)
@@ -0,0 +1,37 @@
+"""add query-shaped indexes
+
+Revision ID: d27a9b5c6e18
+Revises: 8c41d7e2f9a3
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd27a9b5c6e18'
+down_revision: Union[str, None] = '8c41d7e2f9a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Index name, table and columns, each matching a filter-plus-sort the routers run
+INDEXES = (
+    ('ix_comments_product_id_created_at', 'comments', ['product_id', 'created_at']),
+    ('ix_ratings_product_id_created_at', 'ratings', ['product_id', 'created_at']),
+    ('ix_purchases_customer_id_purchase_date', 'purchases', ['customer_id', 'purchase_date']),
+    ('ix_purchases_purchase_date', 'purchases', ['purchase_date']),
+    ('ix_products_price', 'products', ['price']),
+    ('ix_products_category_price', 'products', ['category', 'price']),
+)
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,45 @@
+"""add revenue rollups
+
+Revision ID: e4b7c19a2f05
+Revises: d27a9b5c6e18
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7c19a2f05'
+down_revision: Union[str, None] = 'd27a9b5c6e18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUPS = ('revenue_hourly', 'revenue_daily')
+
+
+def upgrade() -> None:
+    # Fill the new tables afterwards with `python -m api.rollups`, which
+    # also reads the archived purchases
+    for table in ROLLUPS:
+        op.create_table(
+            table,
+            sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('category', sa.String(length=50), nullable=False),
+            sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+            sa.Column('units', sa.Integer(), nullable=False),
+            sa.Column('orders', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('bucket', 'product_id')
+        )
+        op.create_index(f'ix_{table}_category_bucket', table, ['category', 'bucket'], unique=False)
+        op.create_index(f'ix_{table}_product_id_bucket', table, ['product_id', 'bucket'], unique=False)
+
+
+def downgrade() -> None:
+    for table in ROLLUPS:
+        op.drop_index(f'ix_{table}_product_id_bucket', table_name=table)
+        op.drop_index(f'ix_{table}_category_bucket', table_name=table)
+        op.drop_table(table)
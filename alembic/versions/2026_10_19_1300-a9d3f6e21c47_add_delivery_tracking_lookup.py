@@ -0,0 +1,32 @@
+"""add delivery tracking lookup
+
+Revision ID: a9d3f6e21c47
+Revises: e4b7c19a2f05
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3f6e21c47'
+down_revision: Union[str, None] = 'e4b7c19a2f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('deliveries', sa.Column('last_event_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        'ix_deliveries_carrier_tracking_number', 'deliveries', ['carrier', 'tracking_number'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_deliveries_carrier_tracking_number', table_name='deliveries')
+    with op.batch_alter_table('deliveries') as batch_op:
+        batch_op.drop_column('last_event_at')
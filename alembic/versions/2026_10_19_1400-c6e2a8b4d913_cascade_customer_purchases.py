@@ -0,0 +1,40 @@
+"""cascade customer purchases
+
+Revision ID: c6e2a8b4d913
+Revises: a9d3f6e21c47
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e2a8b4d913'
+down_revision: Union[str, None] = 'a9d3f6e21c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The original foreign keys are unnamed; batch mode reflects them under these names
+NAMING_CONVENTION = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+FK_NAME = 'fk_purchases_customer_id_customers'
+
+
+def _set_customer_fk(ondelete: str) -> None:
+    # SQLite cannot alter a constraint: batch mode copies the table
+    with op.batch_alter_table('purchases', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(FK_NAME, type_='foreignkey')
+        batch_op.create_foreign_key(
+            FK_NAME, 'customers', ['customer_id'], ['id'], ondelete=ondelete
+        )
+
+
+def upgrade() -> None:
+    _set_customer_fk('CASCADE')
+
+
+def downgrade() -> None:
+    _set_customer_fk('RESTRICT')
@@ -0,0 +1,51 @@
+"""add product scores
+
+Revision ID: f3a1c8d5b270
+Revises: c6e2a8b4d913
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a1c8d5b270'
+down_revision: Union[str, None] = 'c6e2a8b4d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCORE_INDEXES = (
+    ('ix_product_scores_bayesian', ['bayesian', 'product_id']),
+    ('ix_product_scores_wilson', ['wilson', 'product_id']),
+    ('ix_product_scores_category_bayesian', ['category', 'bayesian', 'product_id']),
+    ('ix_product_scores_category_wilson', ['category', 'wilson', 'product_id']),
+)
+
+
+def upgrade() -> None:
+    # Fill the new table afterwards with `python -m api.scores`
+    op.create_table(
+        'product_scores',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('ratings', sa.Integer(), nullable=False),
+        sa.Column('average', sa.Float(), nullable=True),
+        sa.Column('bayesian', sa.Float(), nullable=False),
+        sa.Column('wilson', sa.Float(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+    for name, columns in SCORE_INDEXES:
+        op.create_index(name, 'product_scores', columns, unique=False)
+    op.create_index('ix_ratings_product_id_rating', 'ratings', ['product_id', 'rating'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ratings_product_id_rating', table_name='ratings')
+    for name, _ in SCORE_INDEXES:
+        op.drop_index(name, table_name='product_scores')
+    op.drop_table('product_scores')
@@ -0,0 +1,37 @@
+"""add invalidations
+
+Revision ID: b8d4e2f7a613
+Revises: f3a1c8d5b270
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4e2f7a613'
+down_revision: Union[str, None] = 'f3a1c8d5b270'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'invalidations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('origin', sa.String(length=100), nullable=False),
+        sa.Column('topic', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True
+    )
+    op.create_index('ix_invalidations_created_at', 'invalidations', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_invalidations_created_at', table_name='invalidations')
+    op.drop_table('invalidations')
@@ -0,0 +1,194 @@
+"""
+Admission control and load shedding.
+
+Requests are split into reads and writes. Each class has a gate with a
+bounded number of requests in flight and a bounded queue of requests waiting
+for a slot; when the queue is full, or a request has waited too long, it is
+rejected right away with a 503 and a `Retry-After` header instead of piling
+up behind SQLite's single writer. An optional per-client token bucket
+rejects clients that exceed their rate with a 429.
+"""
+import asyncio
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Any
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from api import settings
+
+
+# HTTP methods that go through the write gate
+WRITE_METHODS: frozenset[str] = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+
+# Paths that bypass admission control, so they stay reachable under overload
+EXEMPT_PREFIXES: tuple[str, ...] = ('/stats',)
+# Long-lived event streams would hold a read slot for their whole lifetime;
+# only GETs of the two stream routes of api.routers.deliveries are exempt
+EVENT_STREAM: re.Pattern = re.compile(r'/deliveries/(?:customers/)?\d+/events')
+
+
+def exempt(scope: Scope) -> bool:
+    """Whether a request bypasses admission control, deadlines and profiling."""
+    path: str = scope['path']
+    return path.startswith(EXEMPT_PREFIXES) or (
+        scope['method'] == 'GET' and EVENT_STREAM.fullmatch(path) is not None
+    )
+
+
+class Gate:
+    """Bounded concurrency with a bounded wait queue for one class of requests."""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._semaphore = None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Semaphore created on first use, inside the server's event loop."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; return False if the request should be shed."""
+        if not self.semaphore.locked():
+            # Fast path: a slot is free, no need to queue
+            await self.semaphore.acquire()
+        elif self.waiting >= self.queue_size:
+            self.shed += 1
+            return False
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        """Give the slot back to the next waiting request."""
+        self.active -= 1
+        self.semaphore.release()
+
+    def stats(self) -> dict[str, int]:
+        """Current queue depth and counters of the gate."""
+        return {
+            'concurrency': self.concurrency,
+            'queue_size': self.queue_size,
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'shed': self.shed,
+        }
+
+
+class TokenBuckets:
+    """Per-client token buckets, keeping at most `max_clients` buckets."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self.limited = 0
+
+    def take(self, client: str) -> float:
+        """Take a token; return 0 if allowed, else the seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(client, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / self.rate
+            self.limited += 1
+        self.buckets[client] = (tokens, now)
+        if len(self.buckets) > self.max_clients:
+            # Forget the least recently seen client
+            self.buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionController:
+    """Read and write gates plus the optional per-client rate limit."""
+
+    def __init__(self):
+        self.reads = Gate(
+            'reads', settings.READ_CONCURRENCY, settings.READ_QUEUE_SIZE, settings.QUEUE_TIMEOUT
+        )
+        self.writes = Gate(
+            'writes', settings.WRITE_CONCURRENCY, settings.WRITE_QUEUE_SIZE, settings.QUEUE_TIMEOUT
+        )
+        # Each worker keeps its own buckets and the server spreads clients
+        # across them, so each enforces its share of the configured limit
+        self.clients = (
+            TokenBuckets(
+                settings.CLIENT_RATE / settings.WORKERS,
+                max(1, settings.CLIENT_BURST // settings.WORKERS)
+            )
+            if settings.CLIENT_RATE > 0 else None
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth and counters of both gates and of the rate limiter."""
+        return {
+            'reads': self.reads.stats(),
+            'writes': self.writes.stats(),
+            'rate_limited': 0 if self.clients is None else self.clients.limited,
+        }
+
+
+# Admission controller shared by the middleware and the stats endpoint
+controller = AdmissionController()
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    """Build a rejection response with a Retry-After header."""
+    return JSONResponse(
+        {'detail': detail},
+        status_code=status_code,
+        headers={'Retry-After': str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that admits, queues or sheds every HTTP request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or exempt(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if controller.clients is not None:
+            client = scope['client'][0] if scope.get('client') else 'unknown'
+            wait = controller.clients.take(client)
+            if wait:
+                await _reject(429, "Too many requests", wait)(scope, receive, send)
+                return
+
+        gate = controller.writes if scope['method'] in WRITE_METHODS else controller.reads
+        if not await gate.acquire():
+            await _reject(503, "Server busy, try again later", 1)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
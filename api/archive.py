@@ -0,0 +1,143 @@
+"""
+Hot/cold partitioning of purchases.
+
+Purchases older than ARCHIVE_AFTER_DAYS are moved, in batches, from the
+`purchases` table into `archive.purchases`, a table of the same shape in a
+separate SQLite file attached to every connection (see api.dependencies).
+Each row keeps its `unit_price`, so historical totals stay what they were
+when the purchase was made. The hot table, and its indexes, then only hold
+recent history.
+
+`query_purchases` reads a date range and only includes the archive when the
+range reaches past the hot window.
+
+Run an archival pass from the command line with `python -m api.archive`.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Sequence
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, MetaData, Numeric, Table, delete, insert, literal, select,
+    union_all
+)
+from sqlalchemy.orm import Session
+from api import settings
+from api.dependencies import SessionLocal, engine
+from api.models.purchase import Purchase
+
+
+# Columns copied from purchases into the archive, in table order
+COLUMNS: tuple[str, ...] = tuple(Purchase.__table__.columns.keys())
+
+# The archive lives in its own metadata so it is not part of the Alembic
+# migrations of the main database; it has no foreign keys because SQLite
+# cannot enforce them across attached databases.
+archive_metadata = MetaData(schema='archive')
+
+archived_purchases = Table(
+    'purchases',
+    archive_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('quantity', Integer, nullable=False),
+    Column('unit_price', Numeric(10, 2), nullable=False),
+    Column('customer_id', Integer, nullable=False),
+    Column('product_id', Integer, nullable=False),
+    Column('delivery_id', Integer),
+    Column('purchase_date', DateTime(timezone=True), nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False),
+    Column('updated_at', DateTime(timezone=True), nullable=False),
+    Column('archived_at', DateTime(timezone=True), nullable=False),
+    # Archive reads are date ranges, overall or for one customer
+    Index('ix_archived_purchases_purchase_date', 'purchase_date'),
+    Index('ix_archived_purchases_customer_date', 'customer_id', 'purchase_date'),
+)
+
+_created = False
+
+
+def ensure_archive() -> None:
+    """Create the archive table on first use."""
+    global _created
+    if not _created:
+        archive_metadata.create_all(engine, checkfirst=True)
+        _created = True
+
+
+def as_utc(value: datetime) -> datetime:
+    """Convert a timestamp to UTC, reading naive ones as UTC already."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def hot_cutoff() -> datetime:
+    """Purchases made before this moment belong in the archive."""
+    return datetime.now(timezone.utc) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+def archive_purchases(db: Session, before: Optional[datetime] = None,
+                      batch_size: Optional[int] = None) -> int:
+    """
+    Move purchases made before `before` to the archive, one batch per transaction.
+
+    Returns the number of purchases moved. Each batch is copied and deleted
+    in the same transaction, so a purchase is never in both tables or in
+    neither, and writers are only blocked for one batch at a time.
+    """
+    ensure_archive()
+    before = hot_cutoff() if before is None else as_utc(before)
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    hot = Purchase.__table__
+    moved = 0
+    while True:
+        ids = db.scalars(
+            select(hot.c.id).where(hot.c.purchase_date < before).order_by(hot.c.id).limit(batch_size)
+        ).all()
+        if not ids:
+            return moved
+        db.execute(insert(archived_purchases).from_select(
+            [*COLUMNS, 'archived_at'],
+            select(*(hot.c[name] for name in COLUMNS), literal(datetime.now(timezone.utc)))
+            .where(hot.c.id.in_(ids))
+        ))
+        db.execute(delete(hot).where(hot.c.id.in_(ids)))
+        db.commit()
+        moved += len(ids)
+
+
+def query_purchases(db: Session, columns: Sequence[str], customer_id: Optional[int] = None,
+                    since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    skip: int = 0, limit: Optional[int] = None) -> list[Any]:
+    """
+    Purchases in a date range, oldest first, from the hot table and, when
+    `since` reaches past the hot window, from the archive too.
+    """
+    since = None if since is None else as_utc(since)
+    until = None if until is None else as_utc(until)
+
+    def ranged(table: Table) -> Any:
+        statement = select(*(table.c[name] for name in columns))
+        if customer_id is not None:
+            statement = statement.where(table.c.customer_id == customer_id)
+        if since is not None:
+            statement = statement.where(table.c.purchase_date >= since)
+        if until is not None:
+            statement = statement.where(table.c.purchase_date < until)
+        return statement
+
+    hot = ranged(Purchase.__table__)
+    if since is None or since < hot_cutoff():
+        ensure_archive()
+        statement = union_all(hot, ranged(archived_purchases))
+    else:
+        statement = hot
+    statement = statement.order_by(*(['purchase_date', 'id'] if 'purchase_date' in columns else ['id']))
+    if skip:
+        statement = statement.offset(skip)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return db.execute(statement).all()
+
+
+if __name__ == '__main__':
+    with SessionLocal() as session:
+        print(f"Archived {archive_purchases(session)} purchases")
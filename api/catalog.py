@@ -0,0 +1,210 @@
+"""
+Immutable in-memory snapshot of the product catalog.
+
+When SUPERMAN_CATALOG_SNAPSHOT is on, product reads are served from a
+`CatalogSnapshot` instead of SQLite. A snapshot is never modified: product
+writes made by this process build a patched copy and swap it in with a
+single assignment, so readers always see one consistent version without
+taking a lock. A patched copy only moves the written product within the
+sorted sequences, by bisection, instead of sorting the catalog again.
+
+Writes made by other processes are detected through `PRAGMA data_version`
+on a dedicated connection, which changes whenever another connection
+commits. Because any table's commit bumps it, a cheap signature of the
+products table (row count, latest `updated_at` and sum of IDs) is then
+compared with the snapshot's own before paying for a rebuild.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Mapping, Optional
+from sqlalchemy import func, select
+from api import settings
+from api.dependencies import SessionLocal, engine
+from api.models.product import Product
+
+
+# Columns copied into the snapshot, in table order
+COLUMNS: tuple[str, ...] = tuple(Product.__table__.columns.keys())
+
+ProductRow = Mapping[str, Any]
+Signature = tuple[int, Optional[datetime], int]
+
+
+def _id_key(row: ProductRow) -> int:
+    """Sort key of the ID-ordered sequences."""
+    return row['id']
+
+
+def _price_key(row: ProductRow) -> tuple[float, int]:
+    """Sort key of the price-ordered sequence."""
+    return row['price'], row['id']
+
+
+def _replace(rows: tuple[ProductRow, ...], old: Optional[ProductRow], new: Optional[ProductRow],
+             key: Callable[[ProductRow], Any]) -> tuple[ProductRow, ...]:
+    """Copy of a sorted sequence with `old` taken out and `new` put in place."""
+    patched = list(rows)
+    if old is not None:
+        # Keys are unique, so the first row not below old's key is old
+        del patched[bisect_left(patched, key(old), key=key)]
+    if new is not None:
+        insort(patched, new, key=key)
+    return tuple(patched)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Every product, indexed by ID and category and sorted by price."""
+    products: tuple[ProductRow, ...]
+    by_id: Mapping[int, ProductRow]
+    by_category: Mapping[str, tuple[ProductRow, ...]]
+    by_price: tuple[ProductRow, ...]
+
+    @classmethod
+    def build(cls, rows: Iterable[ProductRow]) -> 'CatalogSnapshot':
+        """Build a snapshot from product rows."""
+        products = tuple(sorted((MappingProxyType(dict(row)) for row in rows), key=_id_key))
+        by_category: dict[str, list[ProductRow]] = {}
+        for row in products:
+            by_category.setdefault(row['category'], []).append(row)
+        return cls(
+            products=products,
+            by_id=MappingProxyType({row['id']: row for row in products}),
+            by_category=MappingProxyType(
+                {category: tuple(rows) for category, rows in by_category.items()}
+            ),
+            by_price=tuple(sorted(products, key=_price_key)),
+        )
+
+    def with_product(self, row: ProductRow) -> 'CatalogSnapshot':
+        """Copy of the snapshot with a product added or replaced."""
+        row = MappingProxyType(dict(row))
+        return self._patched(self.by_id.get(row['id']), row)
+
+    def without_product(self, product_id: int) -> 'CatalogSnapshot':
+        """Copy of the snapshot with a product removed."""
+        old = self.by_id.get(product_id)
+        return self if old is None else self._patched(old, None)
+
+    def _patched(self, old: Optional[ProductRow], new: Optional[ProductRow]) -> 'CatalogSnapshot':
+        """Copy of the snapshot with one product's entries replaced in every index."""
+        by_id = dict(self.by_id)
+        if old is not None:
+            del by_id[old['id']]
+        if new is not None:
+            by_id[new['id']] = new
+        # Only the categories the product leaves or joins change
+        by_category = dict(self.by_category)
+        for category in {row['category'] for row in (old, new) if row is not None}:
+            rows = _replace(
+                by_category.get(category, ()),
+                old if old is not None and old['category'] == category else None,
+                new if new is not None and new['category'] == category else None,
+                _id_key
+            )
+            if rows:
+                by_category[category] = rows
+            else:
+                del by_category[category]
+        return CatalogSnapshot(
+            products=_replace(self.products, old, new, _id_key),
+            by_id=MappingProxyType(by_id),
+            by_category=MappingProxyType(by_category),
+            by_price=_replace(self.by_price, old, new, _price_key),
+        )
+
+    def select(self, category: Optional[str] = None, by_price: bool = False,
+               descending: bool = False) -> tuple[ProductRow, ...]:
+        """Products of a category, or all of them, by ID or by price."""
+        if by_price:
+            products = self.by_price
+            if category is not None:
+                products = tuple(row for row in products if row['category'] == category)
+        elif category is not None:
+            products = self.by_category.get(category, ())
+        else:
+            products = self.products
+        return products[::-1] if descending else products
+
+    @property
+    def signature(self) -> Signature:
+        """Row count, latest update and sum of IDs of the snapshot."""
+        return (
+            len(self.products),
+            max((row['updated_at'] for row in self.products), default=None),
+            sum(self.by_id),
+        )
+
+
+def to_row(product: Product) -> ProductRow:
+    """Copy the columns of a product instance into a snapshot row."""
+    return {name: getattr(product, name) for name in COLUMNS}
+
+
+class Catalog:
+    """Holder of the current snapshot and of the change detection state."""
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self.data_version: Optional[int] = None
+        self.checked_at = 0.0
+        self.rebuilds = 0
+        self._connection: Any = None
+        self._lock = threading.Lock()
+
+    def current(self) -> CatalogSnapshot:
+        """Return the current snapshot, rebuilding it if another process changed products."""
+        if self.snapshot is None or time.monotonic() - self.checked_at >= self.check_interval:
+            with self._lock:
+                self._refresh()
+        return self.snapshot
+
+    def _refresh(self) -> None:
+        """Check `data_version` and the products signature; rebuild on a mismatch."""
+        self.checked_at = time.monotonic()
+        if self._connection is None:
+            # Kept out of the pool for good: data_version is per connection
+            self._connection = engine.raw_connection()
+        cursor = self._connection.cursor()
+        try:
+            data_version = cursor.execute('PRAGMA data_version').fetchone()[0]
+        finally:
+            cursor.close()
+        if self.snapshot is not None and data_version == self.data_version:
+            return
+        self.data_version = data_version
+        with SessionLocal() as db:
+            count, updated_at, id_sum = db.execute(select(
+                func.count(Product.id),
+                func.max(Product.updated_at),
+                func.coalesce(func.sum(Product.id), 0)
+            )).one()
+            if self.snapshot is not None and (count, updated_at, id_sum) == self.snapshot.signature:
+                return
+            rows = [to_row(product) for product in db.scalars(select(Product))]
+        self.snapshot = CatalogSnapshot.build(rows)
+        self.rebuilds += 1
+
+    def put(self, product: Product) -> None:
+        """Swap in a snapshot that includes a committed product write."""
+        row = to_row(product)
+        with self._lock:
+            if self.snapshot is not None:
+                self.snapshot = self.snapshot.with_product(row)
+
+    def remove(self, product_id: int) -> None:
+        """Swap in a snapshot without a deleted product."""
+        with self._lock:
+            if self.snapshot is not None:
+                self.snapshot = self.snapshot.without_product(product_id)
+
+
+# Catalog used by the product router, or None when snapshot mode is off
+catalog: Optional[Catalog] = (
+    Catalog(settings.CATALOG_CHECK_INTERVAL) if settings.CATALOG_SNAPSHOT else None
+)
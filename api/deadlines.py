@@ -0,0 +1,137 @@
+"""
+Query deadlines and cancellation of abandoned reads.
+
+Every GET request gets a deadline of SUPERMAN_QUERY_TIMEOUT seconds from
+the moment it is admitted; endpoints can shorten, extend or lift it with
+the `query_deadline` dependency. The deadline is enforced inside SQLite: a
+progress handler installed on every connection by api.dependencies runs
+every PROGRESS_STEPS virtual machine instructions and aborts the running
+statement once the request's deadline has passed, so a runaway scan gives its connection back
+to the pool instead of grinding on. The request then fails with a 504.
+
+GET requests are also cancelled, the same way, when the client disconnects.
+That is only noticed while the event loop is free, so endpoints that can
+run long queries are plain `def` functions, served from the threadpool.
+Writes have no deadline unless their endpoint sets one, and run to
+completion whether or not the client is still there.
+"""
+import asyncio
+import time
+from typing import Any, Callable, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from api import settings
+from api.admission import exempt
+from api.dependencies import current_deadline
+
+
+# Methods given the default deadline and cancelled on disconnect
+READ_METHODS: frozenset[str] = frozenset({'GET', 'HEAD'})
+
+
+class Deadline:
+    """Point in time after which the queries of a request are interrupted."""
+
+    def __init__(self, timeout: Optional[float]):
+        self.started = time.monotonic()
+        self.expires: Optional[float] = None
+        self.limit(timeout)
+        # Why the request was cancelled: 'expired' or 'disconnected'
+        self.reason: Optional[str] = None
+
+    def limit(self, timeout: Optional[float]) -> None:
+        """Expire `timeout` seconds after the request started; None or 0 never expires."""
+        self.expires = self.started + timeout if timeout else None
+
+    def cancel(self, reason: str) -> None:
+        """Interrupt the request's queries from now on."""
+        if self.reason is None:
+            self.reason = reason
+            stats[reason] += 1
+
+    def check(self) -> int:
+        """SQLite progress handler: non-zero aborts the running statement."""
+        if self.reason is None and self.expires is not None and time.monotonic() >= self.expires:
+            self.cancel('expired')
+        return int(self.reason is not None)
+
+
+# Requests cancelled so far, by reason
+stats: dict[str, int] = {'expired': 0, 'disconnected': 0}
+
+
+def query_deadline(timeout: Optional[float]) -> Callable[[], Any]:
+    """
+    Dependency giving an endpoint's queries `timeout` seconds from the start
+    of the request; None lifts the deadline.
+    """
+    async def set_deadline() -> None:
+        deadline = current_deadline.get()
+        if deadline is not None:
+            deadline.limit(timeout)
+    return set_deadline
+
+
+def cancelled() -> Optional[str]:
+    """Why the current request's queries were interrupted, or None."""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline.reason
+
+
+class _DisconnectWatch:
+    """Reads a request's messages ahead of the app, to notice the client leaving."""
+
+    def __init__(self, receive: Receive, deadline: Deadline):
+        self.messages: asyncio.Queue[Message] = asyncio.Queue()
+        self.task = asyncio.create_task(self._pump(receive, deadline))
+
+    async def _pump(self, receive: Receive, deadline: Deadline) -> None:
+        while True:
+            message = await receive()
+            self.messages.put_nowait(message)
+            if message['type'] == 'http.disconnect':
+                deadline.cancel('disconnected')
+                return
+
+    async def receive(self) -> Message:
+        message = await self.messages.get()
+        if message['type'] == 'http.disconnect':
+            # Keep answering later calls, as the server would
+            self.messages.put_nowait(message)
+        return message
+
+
+class DeadlineMiddleware:
+    """ASGI middleware that gives every request its deadline."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or exempt(scope):
+            await self.app(scope, receive, send)
+            return
+
+        reading = scope['method'] in READ_METHODS
+        deadline = Deadline(settings.QUERY_TIMEOUT if reading else None)
+        token = current_deadline.set(deadline)
+        if not reading:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                current_deadline.reset(token)
+            return
+
+        # Request bodies of reads are empty, so reading ahead costs nothing
+        watch = _DisconnectWatch(receive, deadline)
+
+        async def send_and_stop_watching(message: Message) -> None:
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                # Leaving after the last byte is not a cancellation
+                watch.task.cancel()
+            await send(message)
+
+        try:
+            await self.app(scope, watch.receive, send_and_stop_watching)
+        finally:
+            current_deadline.reset(token)
+            watch.task.cancel()
@@ -1,17 +1,54 @@
 """
 Connect the FastAPI application to the SQLite database.
 """
-from sqlalchemy import create_engine
+import contextvars
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
-from typing import Generator
+from typing import Any, Generator, Optional
+from api.settings import ARCHIVE_PATH, BUSY_TIMEOUT, SQLITE_WAL
 
 
 # Database connection settings
-DATABASE_URL: str = 'sqlite:///./superman.db'
+DATABASE_URL: str = os.getenv('SUPERMAN_DATABASE_URL', 'sqlite:///./superman.db')
 
 # Create the database engine
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(
+    DATABASE_URL, connect_args={"check_same_thread": False, "timeout": BUSY_TIMEOUT}
+)
+
+# SQLite instructions between two deadline checks of a running statement
+PROGRESS_STEPS: int = 10_000
+
+# Deadline (api.deadlines.Deadline) of the request being served; copied
+# into threadpool calls. Kept here so that every connection checks it,
+# whenever api.deadlines is imported.
+current_deadline: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar(
+    'current_deadline', default=None
+)
+
+
+def _progress() -> int:
+    """SQLite progress handler: non-zero aborts the running statement; a no-op outside requests."""
+    deadline = current_deadline.get()
+    return 0 if deadline is None else deadline.check()
+
+
+@event.listens_for(engine, "connect")
+def configure_connection(dbapi_connection: Any, connection_record: Any) -> None:
+    """Set up every new SQLite connection: foreign keys, the archive, the journal mode and request deadlines."""
+    # Off by default in SQLite; the ondelete cascades rely on it
+    dbapi_connection.execute("PRAGMA foreign_keys = ON")
+    dbapi_connection.set_progress_handler(_progress, PROGRESS_STEPS)
+    dbapi_connection.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_PATH,))
+    if SQLITE_WAL:
+        # Stored in the database files, so only the first connection switches
+        dbapi_connection.execute("PRAGMA main.journal_mode = WAL")
+        dbapi_connection.execute("PRAGMA archive.journal_mode = WAL")
+        # Safe with WAL: a power loss can only lose the last commits
+        dbapi_connection.execute("PRAGMA synchronous = NORMAL")
+
 
 # Create a session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
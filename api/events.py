@@ -0,0 +1,152 @@
+"""
+In-process fan-out of delivery status changes to server-sent event streams.
+
+`Delivery.update_status` records each transition on the session it belongs
+to. Once that session commits, the transitions are published to the hub
+under `delivery:<id>` and `customer:<id>` topics, and every subscribed stream
+receives them. A subscriber is just a small bounded queue, so thousands of
+idle streams cost little more than their coroutines; a slow subscriber drops
+its oldest events rather than holding up the others.
+
+With several workers, a stream may be served by another process than the
+one committing the transition, so transitions are also sent to the other
+processes through api.invalidations and published there.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from api.dependencies import SessionLocal
+from api.invalidations import handler, notify
+
+
+# Key under Session.info holding the transitions of the current transaction
+PENDING_KEY: str = 'delivery_transitions'
+# Key under Session.info holding the events ready to publish on commit
+READY_KEY: str = 'delivery_events'
+
+
+class EventHub:
+    """Topic to subscriber queues, owned by the server's event loop."""
+
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = queue_size
+        self.topics: defaultdict[str, set[asyncio.Queue]] = defaultdict(set)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, topic: str) -> asyncio.Queue:
+        """Register a new subscriber queue for a topic."""
+        self.loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.topics[topic].add(queue)
+        return queue
+
+    def unsubscribe(self, topic: str, queue: asyncio.Queue) -> None:
+        """Remove a subscriber queue, and the topic once it has none left."""
+        subscribers = self.topics.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self.topics[topic]
+
+    def publish(self, topic: str, payload: dict[str, Any]) -> None:
+        """Deliver an event to a topic's subscribers, from any thread."""
+        if self.loop is None or topic not in self.topics:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._deliver(topic, payload)
+        else:
+            # Sync endpoints run on the threadpool; hand the event to the loop
+            self.loop.call_soon_threadsafe(self._deliver, topic, payload)
+
+    def _deliver(self, topic: str, payload: dict[str, Any]) -> None:
+        """Put an event on every subscriber queue of a topic."""
+        self.published += 1
+        for queue in self.topics.get(topic, ()):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(payload)
+
+    def stats(self) -> dict[str, int]:
+        """Topic and subscriber counts of the hub."""
+        return {
+            'topics': len(self.topics),
+            'subscribers': sum(len(queues) for queues in self.topics.values()),
+            'published': self.published,
+            'dropped': self.dropped,
+        }
+
+
+# Hub shared by the session hooks and the streaming endpoints
+hub = EventHub()
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    """Format an optional timestamp for an event payload."""
+    return None if value is None else value.isoformat()
+
+
+def delivery_event(delivery: Any, previous_status: Any) -> dict[str, Any]:
+    """Build the payload of a delivery status transition."""
+    return {
+        'delivery_id': delivery.id,
+        'status': delivery.status.value,
+        'previous_status': None if previous_status is None else previous_status.value,
+        'tracking_number': delivery.tracking_number,
+        'carrier': delivery.carrier,
+        'shipping_date': _isoformat(delivery.shipping_date),
+        'delivery_date': _isoformat(delivery.delivery_date),
+        'estimated_delivery': _isoformat(delivery.estimated_delivery),
+        'customer_ids': sorted({purchase.customer_id for purchase in delivery.purchases}),
+        'occurred_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def record_transition(session: Optional[Session], delivery: Any, previous_status: Any) -> None:
+    """Remember a status transition until the session commits."""
+    if session is not None and delivery.status != previous_status:
+        session.info.setdefault(PENDING_KEY, []).append((delivery, previous_status))
+
+
+@event.listens_for(SessionLocal, 'before_commit')
+def _prepare_events(session: Session) -> None:
+    """Serialize pending transitions while the objects can still be read."""
+    transitions = session.info.pop(PENDING_KEY, None)
+    if transitions:
+        session.flush()
+        events = [delivery_event(delivery, previous) for delivery, previous in transitions]
+        session.info.setdefault(READY_KEY, []).extend(events)
+        for payload in events:
+            notify(session, 'deliveries', payload)
+
+
+@handler('deliveries')
+def publish_event(payload: dict[str, Any]) -> None:
+    """Publish a transition to the streams of its delivery and customers."""
+    hub.publish(f"delivery:{payload['delivery_id']}", payload)
+    for customer_id in payload['customer_ids']:
+        hub.publish(f"customer:{customer_id}", payload)
+
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _publish_events(session: Session) -> None:
+    """Publish the transitions of a committed transaction."""
+    for payload in session.info.pop(READY_KEY, ()):
+        publish_event(payload)
+
+
+@event.listens_for(SessionLocal, 'after_soft_rollback')
+def _discard_events(session: Session, previous_transaction: Any) -> None:
+    """Forget the transitions of a rolled back transaction."""
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(READY_KEY, None)
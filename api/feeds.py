@@ -0,0 +1,215 @@
+"""
+Newest-first comment feeds, paginated by keyset, with a cache of first pages.
+
+A feed page is read with a prepared statement that walks the
+`(product_id, created_at)` index backwards, so a page costs the same at any
+depth: the next page starts strictly before the `(created_at, id)` of the
+last row of the previous one, which the API hands out as an opaque cursor.
+
+The first page of the most recently read products is kept in memory.
+`create_comment` merges each new comment into its product's cached page
+after commit (`comment_created`), so "show the latest reviews" is served
+without a query. Other workers drop the page instead (`feed_changed`).
+Other changes (comment deletes through cascades, customer renames) only
+reach the cache through its TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+from sqlalchemy import Integer, bindparam, select, tuple_
+from sqlalchemy.orm import Session
+from api import settings
+from api.invalidations import handler, notify
+from api.models.comment import Comment
+from api.models.customer import Customer
+
+
+FeedRow = Mapping[str, Any]
+Cursor = tuple[datetime, int]
+
+# Newest comments of a product with their authors' names
+FEED = select(
+    Comment.id,
+    Comment.content,
+    Comment.customer_id,
+    Customer.firstname,
+    Customer.lastname,
+    Comment.created_at
+).join(
+    Customer, Customer.id == Comment.customer_id
+).where(
+    Comment.product_id == bindparam('product_id')
+).order_by(
+    Comment.created_at.desc(), Comment.id.desc()
+).limit(bindparam('limit'))
+
+# The same, starting strictly after a cursor. The cursor is bound with the
+# column's type so it is stored-format text; sqlite3's own adapter drops a
+# zero microsecond part and would compare wrong against stored timestamps.
+FEED_BEFORE = FEED.where(
+    tuple_(Comment.created_at, Comment.id) < tuple_(
+        bindparam('created_at', type_=Comment.created_at.type), bindparam('id', type_=Integer)
+    )
+)
+
+
+def encode_cursor(row: FeedRow) -> str:
+    """Cursor pointing just past a feed row."""
+    return f"{row['created_at'].isoformat()}_{row['id']}"
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Parse a cursor from `encode_cursor`; raise ValueError if malformed."""
+    created_at, _, ident = cursor.rpartition('_')
+    return datetime.fromisoformat(created_at), int(ident)
+
+
+# Display name of a comment's author
+CUSTOMER_NAME = select(Customer.firstname, Customer.lastname).where(
+    Customer.id == bindparam('ident')
+)
+
+
+def to_row(comment: Any, customer_name: str) -> FeedRow:
+    """Copy a comment, instance or row, into a feed row."""
+    return MappingProxyType({
+        'id': comment.id,
+        'content': comment.content,
+        'customer_id': comment.customer_id,
+        'customer_name': customer_name,
+        'created_at': comment.created_at,
+    })
+
+
+def _sort_key(row: FeedRow) -> Cursor:
+    """Feed order key, applied in reverse."""
+    return row['created_at'], row['id']
+
+
+class FeedCache:
+    """First feed page of the most recently read products, evicted LRU."""
+
+    def __init__(self, page_size: int, max_products: int, ttl: float):
+        self.page_size = page_size
+        self.max_products = max_products
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every write; a page loaded across a write is not stored
+        self.generation = 0
+        self._pages: OrderedDict[int, tuple[float, tuple[FeedRow, ...]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def holds(self, product_id: int) -> bool:
+        """Whether the first page of a product is cached."""
+        return product_id in self._pages
+
+    def get(self, product_id: int) -> Optional[tuple[FeedRow, ...]]:
+        """Cached first page of a product, or None on a miss."""
+        with self._lock:
+            entry = self._pages.get(product_id)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(product_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, product_id: int, rows: tuple[FeedRow, ...], generation: int) -> None:
+        """Store a first page loaded while the cache was at `generation`."""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._pages[product_id] = (time.monotonic(), rows[:self.page_size])
+            self._pages.move_to_end(product_id)
+            while len(self._pages) > self.max_products:
+                self._pages.popitem(last=False)
+
+    def add(self, product_id: int, row: Optional[FeedRow]) -> None:
+        """Merge a committed comment into its product's cached page, or drop the page without one."""
+        with self._lock:
+            self.generation += 1
+            entry = self._pages.get(product_id)
+            if entry is None:
+                return
+            if row is None:
+                del self._pages[product_id]
+                return
+            loaded_at, rows = entry
+            # Commits may land out of created_at order, so merge rather than prepend
+            rows = sorted((*rows, row), key=_sort_key, reverse=True)[:self.page_size]
+            self._pages[product_id] = (loaded_at, tuple(rows))
+
+    def invalidate(self, product_id: Optional[int] = None) -> None:
+        """Drop the cached page of a product, or of every product."""
+        with self._lock:
+            self.generation += 1
+            if product_id is None:
+                self._pages.clear()
+            else:
+                self._pages.pop(product_id, None)
+
+    def stats(self) -> dict[str, int]:
+        """Number of cached products and the hit and miss counters."""
+        with self._lock:
+            return {'products': len(self._pages), 'hits': self.hits, 'misses': self.misses}
+
+
+# Cache shared by the comment and product routers
+feed_cache = FeedCache(
+    settings.FEED_PAGE_SIZE, settings.FEED_CACHE_PRODUCTS, settings.FEED_CACHE_TTL
+)
+
+
+def feed_changed(db: Session, product_id: Optional[int] = None) -> None:
+    """Tell the other workers, on commit, to drop a product's cached page or every page."""
+    notify(db, 'feeds', {'product_id': product_id})
+
+
+@handler('feeds')
+def _drop_pages(payload: dict[str, Any]) -> None:
+    """Drop the pages another worker changed."""
+    feed_cache.invalidate(payload['product_id'])
+
+
+def comment_created(db: Session, comment: Any) -> None:
+    """Merge a committed comment into its product's cached page, if there is one."""
+    row = None
+    if feed_cache.holds(comment.product_id):
+        name = db.execute(CUSTOMER_NAME, {'ident': comment.customer_id}).first()
+        if name is not None:
+            row = to_row(comment, f"{name.firstname} {name.lastname}")
+    feed_cache.add(comment.product_id, row)
+
+
+def _query(db: Session, product_id: int, limit: int,
+           before: Optional[Cursor] = None) -> tuple[FeedRow, ...]:
+    """Read a feed page from the database."""
+    if before is None:
+        result = db.execute(FEED, {'product_id': product_id, 'limit': limit})
+    else:
+        result = db.execute(FEED_BEFORE, {
+            'product_id': product_id, 'limit': limit,
+            'created_at': before[0], 'id': before[1]
+        })
+    return tuple(to_row(row, f"{row.firstname} {row.lastname}") for row in result)
+
+
+def comment_feed(db: Session, product_id: int, limit: int,
+                 before: Optional[Cursor] = None) -> tuple[FeedRow, ...]:
+    """
+    Up to `limit` comments of a product, newest first, after `before`.
+
+    First pages no longer than FEED_PAGE_SIZE come from the cache.
+    """
+    if before is not None or limit > feed_cache.page_size:
+        return _query(db, product_id, limit, before)
+    rows = feed_cache.get(product_id)
+    if rows is None:
+        generation = feed_cache.generation
+        rows = _query(db, product_id, feed_cache.page_size)
+        feed_cache.put(product_id, rows, generation)
+    return rows[:limit]
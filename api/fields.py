@@ -0,0 +1,52 @@
+"""
+Sparse fieldsets for read endpoints.
+
+A `?fields=id,name,price` query parameter is validated against the fields
+of the endpoint's response schema and turned into a query of the matching
+columns, so the database only reads and returns the requested columns
+instead of whole rows, and no column the API does not expose is returned.
+"""
+from typing import Any, Iterable, Optional
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Query, Session
+
+
+def parse_fields(schema: type[BaseModel], fields: Optional[str]) -> Optional[list[str]]:
+    """
+    Validate a `fields` parameter against the fields of a response schema.
+
+    Returns None when no fieldset was requested, otherwise the requested
+    names in schema order, always starting with the primary key `id`. Each
+    name is also the name of a column of the model (see query_fields).
+    Raises a 400 error for names that are not fields of the schema.
+    """
+    if fields is None:
+        return None
+    columns = ['id', *(name for name in schema.model_fields if name != 'id')]
+    requested = {name.strip() for name in fields.split(',') if name.strip()}
+    unknown = requested.difference(columns)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    requested.add('id')
+    return [name for name in columns if name in requested]
+
+
+def query_fields(db: Session, model: Any, columns: list[str]) -> Query:
+    """Start a query that selects only the given columns of a model."""
+    return db.query(*(getattr(model, name) for name in columns))
+
+
+def fields_response(rows: Iterable[Any], columns: list[str]) -> JSONResponse:
+    """Serialize column-only rows, bypassing the endpoint's full response model."""
+    return JSONResponse(jsonable_encoder([dict(zip(columns, row)) for row in rows]))
+
+
+def field_response(row: Any, columns: list[str]) -> JSONResponse:
+    """Serialize a single column-only row."""
+    return JSONResponse(jsonable_encoder(dict(zip(columns, row))))
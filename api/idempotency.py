@@ -0,0 +1,285 @@
+"""
+Idempotency keys for POST requests.
+
+A client may send an `Idempotency-Key` header with any POST. The first
+request with a given key runs normally and its response is kept for
+IDEMPOTENCY_TTL seconds; a retry with the same key gets that response
+replayed (with an `Idempotent-Replayed: true` header) instead of writing
+again. A retry that arrives while the first attempt is still running waits
+for its result. Reusing a key with a different body is rejected with a 422.
+
+Keys live in the `idempotency_keys` table, so a retry is recognised by
+whichever worker receives it. An attempt claims its key with an `INSERT
+... ON CONFLICT DO NOTHING`, and marks it as committed in the transaction
+of the request's own write (`before_commit`). An attempt that fails before
+writing gives its key up, so a retry runs again; one that dies after
+writing never runs again, and its retries get a 409.
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Row, and_, delete, event, func, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from api import settings
+from api.dependencies import SessionLocal, engine
+from api.models.idempotency import IdempotencyKey
+
+
+HEADER: bytes = b'idempotency-key'
+
+# Response headers worth replaying; the rest are recomputed by the server
+REPLAYED_HEADERS: frozenset[bytes] = frozenset({b'content-type', b'location'})
+
+# Seconds after which a running attempt that has not finished is presumed dead
+LEASE: float = 300.0
+
+# Seconds between two checks of a key another attempt is running
+POLL_INTERVAL: float = 0.05
+
+# Seconds between two deletions of expired keys
+PRUNE_INTERVAL: float = 60.0
+
+KEYS = IdempotencyKey.__table__
+
+
+@dataclass
+class Claim:
+    """The key of the attempt being run, and whether its write has committed."""
+    key: str
+    committed: bool = False
+
+
+# Claim of the request being served; copied into threadpool calls
+current_claim: contextvars.ContextVar[Optional[Claim]] = contextvars.ContextVar(
+    'current_claim', default=None
+)
+
+
+def _utcnow() -> datetime:
+    """Current time in UTC."""
+    return datetime.now(timezone.utc)
+
+
+class IdempotencyStore:
+    """Key to response store in the database, with TTL eviction and a bound on its size."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.replayed = 0
+        self.pruned_at = 0.0
+
+    def _values(self, fingerprint: str, now: datetime) -> dict[str, Any]:
+        """Columns of a freshly claimed key."""
+        return {
+            'fingerprint': fingerprint, 'status': None, 'headers': None, 'body': None,
+            'committed': False, 'locked_until': now + timedelta(seconds=LEASE),
+            'expires_at': now + timedelta(seconds=self.ttl),
+        }
+
+    def claim(self, key: str, fingerprint: str) -> bool:
+        """Claim a key for a new attempt; False if a live attempt or response holds it."""
+        now = _utcnow()
+        with engine.begin() as connection:
+            if time.monotonic() - self.pruned_at >= PRUNE_INTERVAL:
+                self._prune(connection, now)
+            values = self._values(fingerprint, now)
+            claimed = connection.execute(
+                sqlite_insert(KEYS).values(key=key, **values).on_conflict_do_nothing()
+            ).rowcount
+            if not claimed:
+                # The INSERT holds the write lock, so no other process can take over too
+                claimed = connection.execute(update(KEYS).where(
+                    KEYS.c.key == key,
+                    or_(
+                        KEYS.c.expires_at <= now,
+                        # A dead attempt that wrote nothing can run again
+                        and_(KEYS.c.status.is_(None), KEYS.c.committed.is_(False),
+                             KEYS.c.locked_until <= now),
+                    )
+                ).values(**values)).rowcount
+            return bool(claimed)
+
+    def get(self, key: str) -> Optional[Row]:
+        """The live row of a key, with whether its attempt's lease has lapsed."""
+        now = _utcnow()
+        with engine.connect() as connection:
+            return connection.execute(
+                select(KEYS, (KEYS.c.locked_until <= now).label('lapsed'))
+                .where(KEYS.c.key == key, KEYS.c.expires_at > now)
+            ).first()
+
+    def finish(self, key: str, status: int, headers: list[tuple[bytes, bytes]], body: bytes) -> None:
+        """Store the response of an attempt for replays."""
+        encoded = json.dumps([[name.decode('latin-1'), value.decode('latin-1')] for name, value in headers])
+        with engine.begin() as connection:
+            connection.execute(update(KEYS).where(KEYS.c.key == key).values(
+                status=status, headers=encoded, body=body
+            ))
+
+    def abandon(self, key: str) -> None:
+        """Forget an attempt that failed, so that a retry runs again, unless it wrote."""
+        with engine.begin() as connection:
+            connection.execute(delete(KEYS).where(KEYS.c.key == key, KEYS.c.committed.is_(False)))
+            # Waiters on an attempt that wrote need not wait for its lease
+            connection.execute(update(KEYS).where(KEYS.c.key == key).values(locked_until=_utcnow()))
+
+    def _prune(self, connection: Any, now: datetime) -> None:
+        """Delete expired keys, then the oldest completed ones above the size bound."""
+        self.pruned_at = time.monotonic()
+        connection.execute(delete(KEYS).where(KEYS.c.expires_at <= now))
+        excess = connection.execute(select(func.count()).select_from(KEYS)).scalar() - self.max_entries
+        if excess > 0:
+            # Never drop an attempt that others may be waiting on
+            oldest = select(KEYS.c.key).where(KEYS.c.status.is_not(None)).order_by(
+                KEYS.c.expires_at
+            ).limit(excess)
+            connection.execute(delete(KEYS).where(KEYS.c.key.in_(oldest.scalar_subquery())))
+
+    def stats(self) -> dict[str, int]:
+        """Size of the store and replay counter of this process."""
+        with engine.connect() as connection:
+            entries = connection.execute(select(func.count()).select_from(KEYS)).scalar()
+        return {'entries': entries, 'replayed': self.replayed}
+
+
+# Store shared by the middleware and the stats endpoint
+store = IdempotencyStore(settings.IDEMPOTENCY_TTL, settings.IDEMPOTENCY_MAX_KEYS)
+
+
+@event.listens_for(SessionLocal, 'before_commit')
+def _mark_committed(session: Session) -> None:
+    """Record, in the same transaction, that the current attempt has written."""
+    claim = current_claim.get()
+    if claim is not None and not claim.committed:
+        session.execute(update(KEYS).where(KEYS.c.key == claim.key).values(committed=True))
+
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _committed(session: Session) -> None:
+    """Stop marking once the attempt's write has committed."""
+    claim = current_claim.get()
+    if claim is not None:
+        claim.committed = True
+
+
+def _replay(row: Row) -> Response:
+    """Rebuild the stored response of a completed attempt."""
+    response = Response(row.body, status_code=row.status)
+    response.raw_headers = [
+        (b'content-length', str(len(row.body)).encode()),
+        *((name.encode('latin-1'), value.encode('latin-1')) for name, value in json.loads(row.headers)),
+        (b'idempotent-replayed', b'true'),
+    ]
+    return response
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware that deduplicates POST requests carrying an Idempotency-Key."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['method'] != 'POST':
+            await self.app(scope, receive, send)
+            return
+        token = dict(scope['headers']).get(HEADER)
+        if token is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Read the whole body to fingerprint it, then hand it on unchanged
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunks.append(message.get('body', b''))
+            more_body = message.get('more_body', False)
+        body = b''.join(chunks)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        key = f"{scope['path']}:{token.decode('latin-1')}"
+
+        claimed = await run_in_threadpool(store.claim, key, fingerprint)
+        while not claimed:
+            row = await run_in_threadpool(store.get, key)
+            if row is None:
+                # Expired or given up meanwhile; try again
+                claimed = await run_in_threadpool(store.claim, key, fingerprint)
+                continue
+            if row.fingerprint != fingerprint:
+                response = JSONResponse(
+                    {'detail': "Idempotency-Key reused with a different request body"},
+                    status_code=422
+                )
+                await response(scope, receive, send)
+                return
+            if row.status is not None:
+                store.replayed += 1
+                await _replay(row)(scope, receive, send)
+                return
+            if row.lapsed and row.committed:
+                # The first attempt wrote, then died before its response was stored
+                response = JSONResponse(
+                    {'detail': "Request with this Idempotency-Key was applied but its response was lost"},
+                    status_code=409
+                )
+                await response(scope, receive, send)
+                return
+            if row.lapsed:
+                claimed = await run_in_threadpool(store.claim, key, fingerprint)
+                continue
+            # Another attempt is running, possibly in another worker
+            await asyncio.sleep(POLL_INTERVAL)
+
+        replayed_body = False
+
+        async def replay_receive() -> Message:
+            nonlocal replayed_body
+            if not replayed_body:
+                replayed_body = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            return await receive()
+
+        status = 0
+        headers: list[tuple[bytes, bytes]] = []
+        response_chunks: list[bytes] = []
+
+        async def capture_send(message: Message) -> None:
+            nonlocal status, headers
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = [
+                    (name, value) for name, value in message.get('headers', [])
+                    if name.lower() in REPLAYED_HEADERS
+                ]
+            elif message['type'] == 'http.response.body':
+                response_chunks.append(message.get('body', b''))
+            await send(message)
+
+        claim = Claim(key)
+        reset = current_claim.set(claim)
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await run_in_threadpool(store.abandon, key)
+            raise
+        finally:
+            current_claim.reset(reset)
+
+        if status >= 500 and not claim.committed:
+            # Server errors before any write are not final, let the client retry for real
+            await run_in_threadpool(store.abandon, key)
+            return
+        await run_in_threadpool(store.finish, key, status, headers, b''.join(response_chunks))
@@ -0,0 +1,170 @@
+"""
+Cache invalidation between server processes.
+
+With several workers (SUPERMAN_WORKERS > 1) every process keeps its own
+in-memory state: comment feed pages, delivery event subscribers, and so on.
+A process that changes data updates its own state as before, and calls
+`notify` before committing to tell the others. The message is a row of the
+invalidations table, written in the same transaction, so it is seen if and
+only if the change is.
+
+Every process runs a `Listener` that checks `PRAGMA data_version` on a
+dedicated connection every INVALIDATION_POLL_INTERVAL seconds. The value
+only changes when another connection commits, so an idle check costs one
+pragma; after a commit, the messages written since the last one seen are
+read and passed to the handler registered for their topic, skipping the
+process's own. Messages are deleted after INVALIDATION_RETENTION seconds.
+
+With a single worker `notify` does nothing and the listener is not started.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from api import settings
+from api.dependencies import SessionLocal, engine
+from api.models.invalidation import Invalidation
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict[str, Any]], None]
+
+# Handlers of the messages sent by other processes, by topic
+HANDLERS: dict[str, Handler] = {}
+
+# Identity of this process in the messages it sends
+ORIGIN: str = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def handler(topic: str) -> Callable[[Handler], Handler]:
+    """Register a function as the handler of a topic's messages."""
+    def register(function: Handler) -> Handler:
+        HANDLERS[topic] = function
+        return function
+    return register
+
+
+def enabled() -> bool:
+    """Whether other processes may need to hear about changes."""
+    return settings.WORKERS > 1
+
+
+def notify(db: Session, topic: str, payload: Optional[dict[str, Any]] = None) -> None:
+    """Send a message to the other processes, with the caller's transaction."""
+    if not enabled():
+        return
+    db.add(Invalidation(origin=ORIGIN, topic=topic, payload=json.dumps(payload or {})))
+    listener.sent += 1
+
+
+class Listener:
+    """Poller applying the messages of other processes to this one."""
+
+    def __init__(self, interval: float, retention: float):
+        self.interval = interval
+        self.retention = retention
+        self.task: Optional[asyncio.Task] = None
+        self.last_id = 0
+        self.data_version: Optional[int] = None
+        self.pruned_at = 0.0
+        self.sent = 0
+        self.received = 0
+        self.failed = 0
+        self._connection: Any = None
+
+    async def start(self) -> None:
+        """Start polling, from the messages sent after now, if there are several workers."""
+        if not enabled():
+            return
+        self.last_id = await run_in_threadpool(self._latest)
+        self.task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        """Stop polling."""
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _poll(self) -> None:
+        """Periodically apply new messages and delete expired ones."""
+        while True:
+            try:
+                for message in await run_in_threadpool(self._read):
+                    self._apply(message)
+                if time.monotonic() - self.pruned_at >= self.retention / 2:
+                    await run_in_threadpool(self._prune)
+            except Exception:
+                logger.exception("Invalidation listener failed")
+            await asyncio.sleep(self.interval)
+
+    @staticmethod
+    def _latest() -> int:
+        """ID of the newest message."""
+        with SessionLocal() as db:
+            return db.scalar(select(func.coalesce(func.max(Invalidation.id), 0)))
+
+    def _read(self) -> list[Invalidation]:
+        """Messages of other processes since the last read, if anything was committed."""
+        if self._connection is None:
+            # Kept out of the pool for good: data_version is per connection
+            self._connection = engine.raw_connection()
+        cursor = self._connection.cursor()
+        try:
+            data_version = cursor.execute('PRAGMA data_version').fetchone()[0]
+        finally:
+            cursor.close()
+        if data_version == self.data_version:
+            return []
+        self.data_version = data_version
+        with SessionLocal() as db:
+            messages = list(db.scalars(
+                select(Invalidation).where(Invalidation.id > self.last_id).order_by(Invalidation.id)
+            ))
+            db.expunge_all()
+        if messages:
+            self.last_id = messages[-1].id
+        return [message for message in messages if message.origin != ORIGIN]
+
+    def _apply(self, message: Invalidation) -> None:
+        """Run the handler of a message, if this process has one."""
+        self.received += 1
+        function = HANDLERS.get(message.topic)
+        if function is None:
+            # The module keeping that state is not loaded here yet
+            return
+        try:
+            function(json.loads(message.payload))
+        except Exception:
+            self.failed += 1
+            logger.exception("Invalidation %s (%s) failed", message.id, message.topic)
+
+    def _prune(self) -> None:
+        """Delete messages older than the retention period."""
+        self.pruned_at = time.monotonic()
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention)
+        with SessionLocal() as db:
+            db.execute(delete(Invalidation).where(Invalidation.created_at < cutoff))
+            db.commit()
+
+    def stats(self) -> dict[str, Any]:
+        """Identity of this process and its message counters."""
+        return {
+            'origin': ORIGIN,
+            'workers': settings.WORKERS,
+            'listening': self.task is not None,
+            'sent': self.sent,
+            'received': self.received,
+            'failed': self.failed,
+        }
+
+
+# Listener shared by the app lifecycle and the stats endpoint
+listener = Listener(settings.INVALIDATION_POLL_INTERVAL, settings.INVALIDATION_RETENTION)
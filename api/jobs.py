@@ -0,0 +1,260 @@
+"""
+In-process background job queue backed by the `jobs` table.
+
+Routers hand work off with `enqueue(db, name, payload)`, which adds a `Job`
+row to the caller's own transaction; once that transaction commits, the job
+is dispatched to a bounded in-memory queue served by a pool of workers.
+Handlers run on the threadpool with their own session. A failed job is
+retried with exponential backoff until JOB_MAX_ATTEMPTS, and a poller picks
+up any due job that is not queued in memory, which covers jobs that
+overflowed the queue, retries and jobs left over from a previous process.
+
+Tasks are registered with the `@task(name)` decorator in api.tasks.
+"""
+import asyncio
+import json
+import logging
+import statistics
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.orm import Session
+from api import settings
+from api.dependencies import SessionLocal
+from api.models.job import Job, JobStatus
+
+
+logger = logging.getLogger(__name__)
+
+TaskHandler = Callable[[Session, dict[str, Any]], None]
+
+# Registered task handlers by name
+TASKS: dict[str, TaskHandler] = {}
+
+# Keys under Session.info holding the jobs of the current transaction
+PENDING_KEY: str = 'pending_jobs'
+READY_KEY: str = 'ready_jobs'
+
+
+def task(name: str) -> Callable[[TaskHandler], TaskHandler]:
+    """Register a function as the handler of a named task."""
+    def register(handler: TaskHandler) -> TaskHandler:
+        TASKS[name] = handler
+        return handler
+    return register
+
+
+def enqueue(db: Session, name: str, payload: Optional[dict[str, Any]] = None) -> Job:
+    """Add a job to the session; it is dispatched once the session commits."""
+    job = Job(name=name, payload=json.dumps(payload or {}))
+    db.add(job)
+    db.info.setdefault(PENDING_KEY, []).append(job)
+    return job
+
+
+def _utcnow() -> datetime:
+    """Current time in UTC."""
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite drops the timezone of stored timestamps, which are all UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class JobQueue:
+    """Bounded queue of job IDs served by a pool of asyncio workers."""
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.tasks: list[asyncio.Task] = []
+        self.queued: set[int] = set()
+        self.running = 0
+        self.done = 0
+        self.failed = 0
+        self.retried = 0
+        self.latencies: deque[float] = deque(maxlen=1000)
+
+    async def start(self) -> None:
+        """Start the workers and the poller on the running event loop."""
+        # Importing the task module registers its handlers
+        import api.tasks  # noqa: F401
+
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self._poll()))
+
+    async def stop(self) -> None:
+        """Stop the workers; unfinished jobs stay in the table for the next start."""
+        for worker in self.tasks:
+            worker.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.loop = None
+
+    def submit(self, job_id: int) -> None:
+        """Queue a committed job, from any thread."""
+        if self.loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._put(job_id)
+        else:
+            self.loop.call_soon_threadsafe(self._put, job_id)
+
+    def _put(self, job_id: int) -> None:
+        """Queue a job unless it already is; when full, leave it to the poller."""
+        if self.queue is None or job_id in self.queued or self.queue.full():
+            return
+        self.queued.add(job_id)
+        self.queue.put_nowait(job_id)
+
+    async def _work(self) -> None:
+        """Run queued jobs one at a time."""
+        while True:
+            job_id = await self.queue.get()
+            self.running += 1
+            try:
+                await run_in_threadpool(self._run, job_id)
+            except Exception:
+                logger.exception("Job %s crashed its worker", job_id)
+            finally:
+                self.running -= 1
+                self.queued.discard(job_id)
+                self.queue.task_done()
+
+    async def _poll(self) -> None:
+        """Periodically queue due jobs that are not in memory and prune old ones."""
+        while True:
+            try:
+                free = self.queue.maxsize - self.queue.qsize()
+                if free > 0:
+                    for job_id in await run_in_threadpool(self._due, free + len(self.queued)):
+                        self._put(job_id)
+                await run_in_threadpool(self._prune)
+            except Exception:
+                logger.exception("Job poller failed")
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+
+    @staticmethod
+    def _due(limit: int) -> list[int]:
+        """IDs of pending jobs that are due and of running jobs whose lease expired."""
+        with SessionLocal() as db:
+            return list(db.scalars(
+                select(Job.id).where(
+                    Job.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),
+                    Job.run_after <= _utcnow()
+                ).order_by(Job.run_after).limit(limit)
+            ))
+
+    @staticmethod
+    def _prune() -> None:
+        """Delete jobs that finished longer than JOB_RETENTION seconds ago."""
+        cutoff = _utcnow() - timedelta(seconds=settings.JOB_RETENTION)
+        with SessionLocal() as db:
+            db.execute(delete(Job).where(Job.status == JobStatus.DONE, Job.run_after <= cutoff))
+            db.commit()
+
+    def _run(self, job_id: int) -> None:
+        """Claim a job, run its handler and record the outcome."""
+        now = _utcnow()
+        with SessionLocal() as db:
+            # Only one worker, in any process, can move a due job to running
+            claimed = db.execute(
+                update(Job).where(
+                    Job.id == job_id,
+                    Job.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),
+                    Job.run_after <= now
+                ).values(
+                    status=JobStatus.RUNNING,
+                    attempts=Job.attempts + 1,
+                    run_after=now + timedelta(seconds=settings.JOB_LEASE)
+                ).execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            if not claimed:
+                return
+
+            job = db.get(Job, job_id)
+            handler = TASKS.get(job.name)
+            try:
+                if handler is None:
+                    raise LookupError(f"Unknown task {job.name!r}")
+                handler(db, json.loads(job.payload))
+                job = db.get(Job, job_id)
+                job.status = JobStatus.DONE
+                job.last_error = None
+                db.commit()
+                self.done += 1
+                self.latencies.append((_utcnow() - _as_utc(job.created_at)).total_seconds())
+            except Exception as error:
+                db.rollback()
+                job = db.get(Job, job_id)
+                job.last_error = repr(error)[:1000]
+                if handler is None or job.attempts >= settings.JOB_MAX_ATTEMPTS:
+                    job.status = JobStatus.FAILED
+                    self.failed += 1
+                    logger.exception("Job %s (%s) failed", job_id, job.name)
+                else:
+                    delay = settings.JOB_BACKOFF * 2 ** (job.attempts - 1)
+                    job.status = JobStatus.PENDING
+                    job.run_after = _utcnow() + timedelta(seconds=delay)
+                    self.retried += 1
+                    if self.loop is not None:
+                        self.loop.call_soon_threadsafe(self.loop.call_later, delay, self.submit, job_id)
+                db.commit()
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth, outcome counters and latency from enqueue to completion."""
+        latencies = sorted(self.latencies)
+        return {
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'queued': 0 if self.queue is None else self.queue.qsize(),
+            'running': self.running,
+            'done': self.done,
+            'failed': self.failed,
+            'retried': self.retried,
+            'latency_ms': {
+                'mean': statistics.fmean(latencies) * 1000 if latencies else None,
+                'p50': latencies[len(latencies) // 2] * 1000 if latencies else None,
+                'p95': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+                'max': latencies[-1] * 1000 if latencies else None,
+            },
+        }
+
+
+# Queue shared by the session hooks, the app lifecycle and the stats endpoint
+job_queue = JobQueue(settings.JOB_WORKERS, settings.JOB_QUEUE_SIZE)
+
+
+@event.listens_for(SessionLocal, 'before_commit')
+def _prepare_jobs(session: Session) -> None:
+    """Assign IDs to the jobs of the transaction while they can still be read."""
+    jobs = session.info.pop(PENDING_KEY, None)
+    if jobs:
+        session.flush()
+        session.info.setdefault(READY_KEY, []).extend(job.id for job in jobs)
+
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _dispatch_jobs(session: Session) -> None:
+    """Queue the jobs of a committed transaction."""
+    for job_id in session.info.pop(READY_KEY, ()):
+        job_queue.submit(job_id)
+
+
+@event.listens_for(SessionLocal, 'after_soft_rollback')
+def _discard_jobs(session: Session, previous_transaction: Any) -> None:
+    """Forget the jobs of a rolled back transaction."""
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(READY_KEY, None)
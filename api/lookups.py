@@ -0,0 +1,78 @@
+"""
+Hot-path lookups built on prepared statements.
+
+Each statement below is built once, at import time, with bound parameters in
+place of the values. SQLAlchemy memoizes the cache key of a statement object
+and keeps its compiled form in the engine's compiled cache, so executing the
+same object again skips both building a `Query` chain and compiling SQL;
+only the parameters change from call to call.
+"""
+from typing import Any, Optional
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session, noload
+from api.models.comment import Comment
+from api.models.customer import Customer
+from api.models.delivery import Delivery
+from api.models.product import Product
+from api.models.purchase import Purchase
+from api.models.rating import Rating
+
+
+# Primary-key fetches
+PRODUCT_BY_ID = select(Product).where(Product.id == bindparam('ident'))
+CUSTOMER_BY_ID = select(Customer).where(Customer.id == bindparam('ident'))
+# Existence only: a Delivery entity would eagerly join all its purchases
+DELIVERY_EXISTS = select(Delivery.id).where(Delivery.id == bindparam('ident'))
+
+# Per-product and per-customer lists
+COMMENTS_BY_PRODUCT = select(Comment).where(
+    Comment.product_id == bindparam('product_id')
+).order_by(
+    Comment.created_at.desc(), Comment.id.desc()
+).options(
+    # The comment schema only carries IDs, so skip the eager joins
+    noload(Comment.customer), noload(Comment.product)
+)
+RATINGS_BY_PRODUCT = select(Rating).where(Rating.product_id == bindparam('product_id'))
+PURCHASES_BY_CUSTOMER = select(Purchase).where(Purchase.customer_id == bindparam('customer_id'))
+
+
+def _first(db: Session, statement: Any, **params: Any) -> Optional[Any]:
+    """Execute a prepared statement and return the first entity, if any."""
+    return db.execute(statement, params).scalars().first()
+
+
+def _all(db: Session, statement: Any, **params: Any) -> list[Any]:
+    """Execute a prepared statement and return every entity."""
+    # Joined eager loads repeat the parent row, unique() folds them back
+    return db.execute(statement, params).unique().scalars().all()
+
+
+def product_by_id(db: Session, product_id: int) -> Optional[Product]:
+    """Fetch a product by its ID."""
+    return _first(db, PRODUCT_BY_ID, ident=product_id)
+
+
+def customer_by_id(db: Session, customer_id: int) -> Optional[Customer]:
+    """Fetch a customer by its ID."""
+    return _first(db, CUSTOMER_BY_ID, ident=customer_id)
+
+
+def delivery_exists(db: Session, delivery_id: int) -> bool:
+    """Whether a delivery with this ID exists."""
+    return _first(db, DELIVERY_EXISTS, ident=delivery_id) is not None
+
+
+def comments_by_product(db: Session, product_id: int) -> list[Comment]:
+    """Fetch every comment of a product, newest first."""
+    return _all(db, COMMENTS_BY_PRODUCT, product_id=product_id)
+
+
+def ratings_by_product(db: Session, product_id: int) -> list[Rating]:
+    """Fetch every rating of a product."""
+    return _all(db, RATINGS_BY_PRODUCT, product_id=product_id)
+
+
+def purchases_by_customer(db: Session, customer_id: int) -> list[Purchase]:
+    """Fetch every purchase of a customer."""
+    return _all(db, PURCHASES_BY_CUSTOMER, customer_id=customer_id)
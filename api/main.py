@@ -1,9 +1,12 @@
 """
 Main module to run the app.
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from api.routers import comments, customers, deliveries, products, purchases, ratings
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError, OperationalError
+from api.settings import LAZY_STARTUP
+from api.startup import LazyRouterMiddleware, add_middleware, include_all, warm_up
 
 
 # Create the FastAPI application
@@ -24,13 +27,94 @@ app.add_middleware(
     allow_headers=['*']
 )
 
-# Include product-related routes
-app.include_router(comments.router)
-app.include_router(customers.router)
-app.include_router(deliveries.router)
-app.include_router(products.router)
-app.include_router(purchases.router)
-app.include_router(ratings.router)
+if LAZY_STARTUP:
+    # Import each router on the first request to its prefix
+    app.add_middleware(LazyRouterMiddleware, target=app)
+else:
+    # Include every router listed in api.startup
+    include_all(app)
+
+# Interrupt the queries of admitted requests past their deadline or whose
+# client left; inside admission, so time spent queued does not count.
+# In lazy mode each middleware module is imported on the first request.
+add_middleware(app, 'deadlines.DeadlineMiddleware', lazy=LAZY_STARTUP)
+
+# Admit, queue or shed requests before any other work is done for them
+add_middleware(app, 'admission.AdmissionMiddleware', lazy=LAZY_STARTUP)
+
+# Replay POST responses for retried Idempotency-Keys; duplicates waiting on
+# a first attempt do not take an admission slot
+add_middleware(app, 'idempotency.IdempotencyMiddleware', lazy=LAZY_STARTUP)
+
+# Profile requests asked for with X-Profile or picked by the sample rate;
+# outermost, so queueing and replays show up in the profile too
+add_middleware(app, 'profiler.ProfilerMiddleware', lazy=LAZY_STARTUP)
+
+
+@app.on_event("startup")
+async def startup():
+    """
+    Warm up the app and start the job workers and the invalidation listener.
+
+    All three are skipped when starting lazily (serverless), where no
+    database work is done before the first request: queued jobs then wait
+    in the `jobs` table for a server started without lazy mode.
+    """
+    if LAZY_STARTUP:
+        return
+    from api.invalidations import listener
+    from api.jobs import job_queue
+
+    # Pay the mapper and OpenAPI costs before the first request
+    warm_up(app)
+    await job_queue.start()
+    await listener.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the job workers and the listener; unfinished jobs are resumed on the next start."""
+    if LAZY_STARTUP:
+        return
+    from api.invalidations import listener
+    from api.jobs import job_queue
+
+    await listener.stop()
+    await job_queue.stop()
+
+
+@app.exception_handler(IntegrityError)
+async def integrity_error(request: Request, exc: IntegrityError):
+    """
+    Report writes rejected by a database constraint.
+
+    Duplicates (UNIQUE), and deletes of rows still referenced, conflict with
+    existing data (409); values failing a CHECK, NOT NULL or foreign key
+    constraint are invalid input (422).
+    """
+    message = str(exc.orig)
+    if message.startswith('UNIQUE'):
+        return JSONResponse(status_code=409, content={"detail": "Request conflicts with existing data"})
+    if message.startswith('FOREIGN KEY'):
+        if request.method == 'DELETE':
+            return JSONResponse(status_code=409, content={"detail": "Row is still referenced"})
+        return JSONResponse(status_code=422, content={"detail": "Referenced row does not exist"})
+    # e.g. "CHECK constraint failed: check_phone_length"
+    constraint = message.partition(': ')[2] or message
+    return JSONResponse(status_code=422, content={"detail": f"Constraint failed: {constraint}"})
+
+
+@app.exception_handler(OperationalError)
+async def operational_error(request: Request, exc: OperationalError):
+    """Report queries interrupted by the request's deadline as gateway timeouts."""
+    from api.deadlines import cancelled
+
+    reason = cancelled()
+    if reason is None:
+        raise exc
+    detail = "Query deadline exceeded" if reason == 'expired' else "Request cancelled"
+    return JSONResponse(status_code=504, content={"detail": detail})
+
 
 # Root endpoint
 @app.get("/", response_model=dict[str, str])
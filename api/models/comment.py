@@ -2,8 +2,8 @@
 Comment model for the Superman Store.
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, CheckConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, CheckConstraint, Index
+from sqlalchemy.orm import relationship, synonym
 from api.dependencies import Base
 
 
@@ -25,6 +25,8 @@ class Comment(Base):
     # Basic information
     id = Column(Integer, primary_key=True, index=True)
     content = Column(String(1000), nullable=False)
+    # Name used by the comments API schema
+    comment = synonym('content')
     
     # Foreign keys
     customer_id = Column(
@@ -62,6 +64,8 @@ class Comment(Base):
             'length(content) >= 3',
             name='check_comment_length'
         ),
+        # Comments of a product, newest first
+        Index('ix_comments_product_id_created_at', 'product_id', 'created_at'),
     )
 
     @property
@@ -2,7 +2,8 @@
 Customer model for the Superman Store.
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, CheckConstraint
+from typing import Any, Callable, Mapping
+from sqlalchemy import Column, Integer, String, DateTime, CheckConstraint, event
 from sqlalchemy.orm import relationship
 from api.dependencies import Base
 
@@ -21,6 +22,18 @@ class Customer(Base):
         billing_address (str): Customer's billing address (max 500 chars)
         created_at (datetime): Timestamp when customer account was created
         updated_at (datetime): Timestamp when customer details were last updated
+        search_firstname (str): Case-folded first name, for prefix search
+        search_lastname (str): Case-folded last name, for prefix search
+        search_email (str): Case-folded email address, for prefix search
+        search_phone (str): Digits of the phone number, for prefix search
+
+    Note:
+        - The search columns are derived on every insert and ORM update;
+          code that writes customers with Core statements must set them
+          with `search_values()`
+        - Deleting a customer deletes their comments, ratings and purchases
+          through the foreign keys, which SQLite enforces on every
+          connection (see api.dependencies)
     """
     __tablename__ = 'customers'
 
@@ -39,10 +52,23 @@ class Customer(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
-    # Relationships
-    comments = relationship("Comment", back_populates="customer", cascade="all, delete-orphan")
-    purchases = relationship("Purchase", back_populates="customer", cascade="all, delete-orphan")
-    ratings = relationship("Rating", back_populates="customer", cascade="all, delete-orphan")
+    # Normalized copies for indexed, case-insensitive prefix search
+    search_firstname = Column(String(50), index=True)
+    search_lastname = Column(String(50), index=True)
+    search_email = Column(String(255), index=True)
+    search_phone = Column(String(20), index=True)
+
+    # Relationships; deletes cascade in the database (ondelete='CASCADE'),
+    # without loading the related rows
+    comments = relationship(
+        "Comment", back_populates="customer", cascade="all, delete-orphan", passive_deletes=True
+    )
+    purchases = relationship(
+        "Purchase", back_populates="customer", cascade="all, delete-orphan", passive_deletes=True
+    )
+    ratings = relationship(
+        "Rating", back_populates="customer", cascade="all, delete-orphan", passive_deletes=True
+    )
 
     # Constraints for data validation
     __table_args__ = (
@@ -72,3 +98,48 @@ class Customer(Base):
     def full_name(self):
         """Get customer's full name."""
         return f"{self.firstname} {self.lastname}"
+
+
+def normalize_text(value: str) -> str:
+    """Normalize a name or email for case-insensitive matching."""
+    return value.strip().casefold()
+
+
+def normalize_phone(value: str) -> str:
+    """Keep only the digits of a phone number."""
+    return ''.join(char for char in value if char.isdigit())
+
+
+# Search column and normalization of each searchable contact detail
+SEARCH_SOURCES: dict[str, tuple[str, Callable[[str], str]]] = {
+    'firstname': ('search_firstname', normalize_text),
+    'lastname': ('search_lastname', normalize_text),
+    'email': ('search_email', normalize_text),
+    'phone': ('search_phone', normalize_phone),
+}
+
+
+def search_values(values: Mapping[str, Any]) -> dict[str, str]:
+    """Derive the search columns of the contact details present in `values`."""
+    return {
+        column: normalize(values[key])
+        for key, (column, normalize) in SEARCH_SOURCES.items()
+        if key in values
+    }
+
+
+def search_columns(firstname: str, lastname: str, email: str, phone: str) -> dict[str, str]:
+    """Derive the search columns of a customer from its contact details."""
+    return search_values(
+        {'firstname': firstname, 'lastname': lastname, 'email': email, 'phone': phone}
+    )
+
+
+@event.listens_for(Customer, 'before_insert')
+@event.listens_for(Customer, 'before_update')
+def _update_search_columns(mapper, connection, target):
+    """Keep the search columns in step with the contact details."""
+    for key, value in search_columns(
+        target.firstname, target.lastname, target.email, target.phone
+    ).items():
+        setattr(target, key, value)
@@ -5,9 +5,10 @@ This model represents delivery options and tracks shipping status for purchases.
 """
 from datetime import datetime, timezone, timedelta
 from enum import Enum, auto
-from sqlalchemy import Column, Integer, String, DateTime, CheckConstraint, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, CheckConstraint, Index, Enum as SQLEnum
+from sqlalchemy.orm import relationship, object_session
 from api.dependencies import Base
+from api.events import record_transition
 
 
 class DeliveryType(str, Enum):
@@ -44,6 +45,7 @@ class Delivery(Base):
         shipping_date (datetime): When the item was shipped
         delivery_date (datetime): When the item was delivered
         estimated_delivery (datetime): Expected delivery date
+        last_event_at (datetime): When the latest applied carrier tracking event occurred
         notes (str): Additional delivery information
         created_at (datetime): When the record was created
         updated_at (datetime): When the record was last modified
@@ -76,6 +78,7 @@ class Delivery(Base):
     shipping_date = Column(DateTime(timezone=True))
     delivery_date = Column(DateTime(timezone=True))
     estimated_delivery = Column(DateTime(timezone=True))
+    last_event_at = Column(DateTime(timezone=True))
     created_at = Column(
         DateTime(timezone=True),
         nullable=False,
@@ -105,6 +108,8 @@ class Delivery(Base):
             '(shipping_date IS NULL) OR (delivery_date IS NULL) OR (shipping_date <= delivery_date)',
             name='check_shipping_before_delivery'
         ),
+        # Carrier tracking events are matched on these
+        Index('ix_deliveries_carrier_tracking_number', 'carrier', 'tracking_number'),
     )
 
     @property
@@ -137,25 +142,33 @@ class Delivery(Base):
         avg_days = (self.min_days + self.max_days) / 2
         return self.shipping_date + timedelta(days=avg_days)
 
-    def update_status(self, new_status: DeliveryStatus, notes: str = None):
+    def update_status(self, new_status: DeliveryStatus, notes: str = None, at: datetime = None):
         """
         Update delivery status and related timestamps.
         
         Args:
             new_status: New delivery status
             notes: Optional notes about the status change
+            at: When the change happened, if not now (carrier tracking events)
+
+        The transition is published to delivery event streams once the
+        session commits.
         """
+        previous_status = self.status
         self.status = new_status
+        at = at or datetime.now(timezone.utc)
         
         if new_status == DeliveryStatus.SHIPPED and not self.shipping_date:
-            self.shipping_date = datetime.now(timezone.utc)
+            self.shipping_date = at
             self.estimated_delivery = self.calculate_estimated_delivery()
         
         elif new_status == DeliveryStatus.DELIVERED and not self.delivery_date:
-            self.delivery_date = datetime.now(timezone.utc)
+            self.delivery_date = at
         
         if notes:
-            self.notes = (self.notes or "") + f"\n[{datetime.now(timezone.utc)}] {notes}"
+            self.notes = (self.notes or "") + f"\n[{at}] {notes}"
+
+        record_transition(object_session(self), self, previous_status)
 
     def __repr__(self):
         """String representation of the Delivery."""
@@ -0,0 +1,48 @@
+"""
+Idempotency key model for the Superman Store.
+
+This table holds the `Idempotency-Key` of recent POST requests and their
+responses (see api.idempotency). It lives in the database rather than in
+memory so that a retry is recognised whichever server process receives it.
+"""
+from sqlalchemy import Column, Integer, String, Text, LargeBinary, Boolean, DateTime, Index
+from api.dependencies import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Model for the idempotency keys of POST requests.
+
+    Attributes:
+        key (str): Request path and the client's Idempotency-Key header
+        fingerprint (str): SHA-256 of the request body
+        status (int): Response status, unset while the first attempt runs
+        headers (str): JSON-encoded response headers to replay
+        body (bytes): Response body to replay
+        committed (bool): Whether the first attempt committed a write
+        locked_until (datetime): When a running attempt is presumed dead
+        expires_at (datetime): When the key may be forgotten
+
+    Note:
+        - `committed` is set in the transaction of the request's own write,
+          so an attempt that dies after writing is never run a second time
+    """
+    __tablename__ = 'idempotency_keys'
+
+    key = Column(String(300), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status = Column(Integer)
+    headers = Column(Text)
+    body = Column(LargeBinary)
+    committed = Column(Boolean, nullable=False, default=False)
+    locked_until = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Expired keys are deleted by age
+        Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    def __repr__(self):
+        """String representation of the IdempotencyKey."""
+        return f"<IdempotencyKey(key={self.key}, status={self.status})>"
@@ -0,0 +1,49 @@
+"""
+Invalidation model for the Superman Store.
+
+This table is the channel through which server processes tell each other
+about changes their in-memory caches must drop (see api.invalidations).
+Messages are written in the transaction of the change they describe and
+deleted once every process has had time to read them.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from api.dependencies import Base
+
+
+class Invalidation(Base):
+    """
+    Model for cache invalidation messages between server processes.
+
+    Attributes:
+        id (int): Ever increasing message number
+        origin (str): Process that sent the message, which ignores it
+        topic (str): Name of the handler the message is for
+        payload (str): JSON-encoded handler arguments
+        created_at (datetime): When the message was written
+
+    Note:
+        - IDs are never reused, so readers can resume after the last one
+          they have seen even when older messages have been deleted
+    """
+    __tablename__ = 'invalidations'
+
+    id = Column(Integer, primary_key=True)
+    origin = Column(String(100), nullable=False)
+    topic = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False, default='{}')
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (
+        # Expired messages are deleted by age
+        Index('ix_invalidations_created_at', 'created_at'),
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        """String representation of the Invalidation."""
+        return f"<Invalidation(id={self.id}, origin={self.origin}, topic={self.topic})>"
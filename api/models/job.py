@@ -0,0 +1,80 @@
+"""
+Job model for the Superman Store.
+
+This model is the durable side of the background job queue: every job is
+written here in the same transaction as the work that produced it, so it
+survives restarts until a worker has run it.
+"""
+from datetime import datetime, timezone
+from enum import Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, Enum as SQLEnum
+from api.dependencies import Base
+
+
+class JobStatus(str, Enum):
+    """Enumeration of job states."""
+    PENDING = "Pending"
+    RUNNING = "Running"
+    DONE = "Done"
+    FAILED = "Failed"
+
+
+class Job(Base):
+    """
+    Model for background jobs in the Superman Store.
+
+    Attributes:
+        id (int): Unique identifier for the job
+        name (str): Name of the registered task to run
+        payload (str): JSON-encoded task arguments
+        status (JobStatus): Current job state
+        attempts (int): Number of times the job has been started
+        run_after (datetime): Earliest time to run a pending job, or the
+            lease expiry of a running one
+        last_error (str): Error of the last failed attempt
+        created_at (datetime): When the job was enqueued
+        updated_at (datetime): When the job was last modified
+
+    Note:
+        - A running job whose lease has expired is considered abandoned and
+          goes back to pending
+        - All timestamps are in UTC
+    """
+    __tablename__ = 'jobs'
+
+    # Basic information
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False, default='{}')
+
+    # Scheduling
+    status = Column(SQLEnum(JobStatus), nullable=False, default=JobStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    run_after = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc)
+    )
+    last_error = Column(String(1000))
+
+    # Timestamps
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc)
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc)
+    )
+
+    # Workers look for due jobs by status and time
+    __table_args__ = (
+        Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+
+    def __repr__(self):
+        """String representation of the Job."""
+        return f"<Job(id={self.id}, name={self.name}, status={self.status.value}, attempts={self.attempts})>"
@@ -2,7 +2,7 @@
 Product model for the Superman Store.
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, Boolean, String, Float, DateTime, CheckConstraint
+from sqlalchemy import Column, Integer, Boolean, String, Float, DateTime, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 from api.dependencies import Base
 
@@ -44,14 +44,19 @@ class Product(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # Relationships
-    purchases = relationship("Purchase", back_populates="product")
-    comments = relationship("Comment", back_populates="product")
-    ratings = relationship("Rating", back_populates="product")
+    # The foreign keys decide what happens on delete: comments and ratings
+    # cascade, purchases block it; the ORM never loads them to find out
+    purchases = relationship("Purchase", back_populates="product", passive_deletes='all')
+    comments = relationship("Comment", back_populates="product", passive_deletes='all')
+    ratings = relationship("Rating", back_populates="product", passive_deletes='all')
 
     # Constraints
     __table_args__ = (
         CheckConstraint('price > 0', name='check_positive_price'),
         CheckConstraint('quantity >= 0', name='check_non_negative_quantity'),
+        # Product lists sorted by price, overall or within a category
+        Index('ix_products_price', 'price'),
+        Index('ix_products_category_price', 'category', 'price'),
     )
 
     def __repr__(self):
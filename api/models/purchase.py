@@ -6,7 +6,7 @@ were bought, by whom, in what quantity, and their delivery status.
 """
 from datetime import datetime, timezone
 from decimal import Decimal
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, CheckConstraint, Numeric
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, CheckConstraint, Numeric, Index
 from sqlalchemy.orm import relationship, column_property
 from sqlalchemy.sql import select
 from api.dependencies import Base
@@ -32,7 +32,8 @@ class Purchase(Base):
         - Quantity must be positive
         - Unit price is stored to maintain historical pricing
         - All timestamps are in UTC
-        - Deleting a customer or product will not delete the purchase record
+        - Deleting a customer deletes their purchases (in the database, see
+          Customer); a product with purchases cannot be deleted
         - Deleting a delivery will nullify the delivery_id
     """
     __tablename__ = 'purchases'
@@ -47,7 +48,7 @@ class Purchase(Base):
     # Foreign keys
     customer_id = Column(
         Integer, 
-        ForeignKey('customers.id', ondelete='RESTRICT'),  # Prevent deletion of referenced customer
+        ForeignKey('customers.id', ondelete='CASCADE'),  # Erased with the customer
         nullable=False,
         index=True
     )
@@ -104,6 +105,9 @@ class Purchase(Base):
         CheckConstraint('quantity > 0', name='check_positive_quantity'),
         # Ensure unit price is positive
         CheckConstraint('unit_price > 0', name='check_positive_unit_price'),
+        # Purchases of a customer, and all purchases, by date
+        Index('ix_purchases_customer_id_purchase_date', 'customer_id', 'purchase_date'),
+        Index('ix_purchases_purchase_date', 'purchase_date'),
     )
 
     # Computed properties
@@ -2,7 +2,7 @@
 Rating model for the Superman Store.
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, CheckConstraint, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, CheckConstraint, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from api.dependencies import Base
 
@@ -69,6 +69,10 @@ class Rating(Base):
         ),
         # Ensure each customer can only rate a product once
         UniqueConstraint('customer_id', 'product_id', name='unique_customer_product_rating'),
+        # Ratings of a product, newest first
+        Index('ix_ratings_product_id_created_at', 'product_id', 'created_at'),
+        # Star histograms of every product, read without touching the table
+        Index('ix_ratings_product_id_rating', 'product_id', 'rating'),
     )
 
     @property
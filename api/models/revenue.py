@@ -0,0 +1,57 @@
+"""
+Revenue rollup models for the Superman Store.
+
+These tables hold revenue, units and order counts per product per hour and
+per day, kept up to date as purchases are written (see api.rollups), so
+reports never scan the purchases table.
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Numeric, Index
+from api.dependencies import Base
+
+
+class RevenueRollup:
+    """
+    Columns shared by the rollup tables, one row per product per bucket.
+
+    Attributes:
+        bucket (datetime): UTC start of the hour or day
+        product_id (int): ID of the product sold; kept after the product is deleted
+        category (str): Current category of the product, "Unknown" once it is deleted
+        revenue (Decimal): Sum of quantity * unit_price
+        units (int): Sum of quantities
+        orders (int): Number of purchases
+    """
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    category = Column(String(50), nullable=False)
+    revenue = Column(Numeric(12, 2), nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    orders = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        """String representation of the rollup row."""
+        return (
+            f"<{type(self).__name__}(bucket={self.bucket}, product_id={self.product_id}, "
+            f"revenue={self.revenue}, units={self.units}, orders={self.orders})>"
+        )
+
+
+class RevenueHourly(RevenueRollup, Base):
+    """Revenue of each product per UTC hour."""
+    __tablename__ = 'revenue_hourly'
+
+    __table_args__ = (
+        # Reports of one category, or of one product, over a range of buckets
+        Index('ix_revenue_hourly_category_bucket', 'category', 'bucket'),
+        Index('ix_revenue_hourly_product_id_bucket', 'product_id', 'bucket'),
+    )
+
+
+class RevenueDaily(RevenueRollup, Base):
+    """Revenue of each product per UTC day."""
+    __tablename__ = 'revenue_daily'
+
+    __table_args__ = (
+        Index('ix_revenue_daily_category_bucket', 'category', 'bucket'),
+        Index('ix_revenue_daily_product_id_bucket', 'product_id', 'bucket'),
+    )
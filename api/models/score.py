@@ -0,0 +1,62 @@
+"""
+Product score model for the Superman Store.
+
+Scores rank products by their ratings. They are computed in bulk from the
+ratings table by api.scores and replaced as a whole on every refresh, and
+kept up to date one product at a time between refreshes, so
+ranked catalog reads are index scans of this table instead of aggregates
+over the ratings.
+"""
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from api.dependencies import Base
+
+
+class ProductScore(Base):
+    """
+    Model for the rating scores of a product, one row per product.
+
+    Attributes:
+        product_id (int): ID of the scored product
+        category (str): Category of the product when it was last scored
+        ratings (int): Number of ratings of the product
+        average (float): Raw average rating, None without ratings
+        bayesian (float): Average rating shrunk towards the store-wide
+            average, by RATING_PRIOR_WEIGHT ratings' worth
+        wilson (float): Lower bound of the 95% Wilson interval of the share
+            of 4 and 5 star ratings
+        computed_at (datetime): When the scores were computed
+
+    Note:
+        - Products are scored when they are created, when their category
+          changes and when they are rated
+        - The category is copied from the product so that ranked listings of
+          a category are index scans too
+    """
+    __tablename__ = 'product_scores'
+
+    product_id = Column(
+        Integer,
+        ForeignKey('products.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    category = Column(String(50), nullable=False)
+    ratings = Column(Integer, nullable=False, default=0)
+    average = Column(Float)
+    bayesian = Column(Float, nullable=False)
+    wilson = Column(Float, nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Ranked listings, of all products or of one category, read backwards
+    __table_args__ = (
+        Index('ix_product_scores_bayesian', 'bayesian', 'product_id'),
+        Index('ix_product_scores_wilson', 'wilson', 'product_id'),
+        Index('ix_product_scores_category_bayesian', 'category', 'bayesian', 'product_id'),
+        Index('ix_product_scores_category_wilson', 'category', 'wilson', 'product_id'),
+    )
+
+    def __repr__(self):
+        """String representation of the ProductScore."""
+        return (
+            f"<ProductScore(product_id={self.product_id}, ratings={self.ratings}, "
+            f"bayesian={self.bayesian}, wilson={self.wilson})>"
+        )
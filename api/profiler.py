@@ -0,0 +1,271 @@
+"""
+On-demand profiling of single requests.
+
+A request is profiled when it carries `X-Profile: <SUPERMAN_PROFILE_TOKEN>`
+or is picked by SUPERMAN_PROFILE_SAMPLE_RATE. While it is in flight a
+sampler thread records the stack of the thread serving it every
+PROFILE_INTERVAL seconds, plus the stacks of any thread that runs SQL for it
+(threadpool work); every SQL statement it sends is timed through engine
+events. Because handlers share the event loop, samples of that thread also
+include whatever other requests run concurrently on it.
+
+The last PROFILE_CAPTURES captures are kept in memory and served by
+`/stats/profiles`, with stacks in the collapsed format read by
+flamegraph.pl, speedscope and most flame graph viewers. The profiled
+response carries the capture ID in an `X-Profile-Id` header.
+"""
+import contextvars
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+from sqlalchemy import event
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from api import settings
+from api.admission import exempt
+from api.dependencies import engine
+
+
+PROFILE_HEADER: str = 'x-profile'
+
+# Frames under this directory are shown relative to it
+_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+
+@dataclass
+class Statement:
+    """One SQL statement sent while a request was profiled."""
+    sql: str
+    started: float
+    duration: float = 0.0
+
+
+@dataclass
+class Capture:
+    """Samples, SQL and timings of one profiled request."""
+    id: int
+    method: str
+    path: str
+    trigger: str
+    started_at: datetime
+    started: float = field(default_factory=time.perf_counter)
+    duration: float = 0.0
+    status: Optional[int] = None
+    samples: Counter = field(default_factory=Counter)
+    statements: list[Statement] = field(default_factory=list)
+    threads: set[int] = field(default_factory=set)
+
+    def summary(self) -> dict[str, Any]:
+        """Capture metadata and totals, without samples or SQL."""
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'trigger': self.trigger,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(self.duration * 1000, 3),
+            'sql_ms': round(sum(s.duration for s in self.statements) * 1000, 3),
+            'sql_count': len(self.statements),
+            'samples': sum(self.samples.values()),
+        }
+
+    def detail(self) -> dict[str, Any]:
+        """Summary plus every SQL statement with its offset and duration."""
+        return {
+            **self.summary(),
+            'statements': [
+                {
+                    'sql': statement.sql,
+                    'offset_ms': round((statement.started - self.started) * 1000, 3),
+                    'duration_ms': round(statement.duration * 1000, 3),
+                }
+                for statement in self.statements
+            ],
+        }
+
+    def collapsed(self) -> str:
+        """Samples as collapsed stacks, one `frame;frame;frame count` line each."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def _frame_name(frame: Any) -> str:
+    """Function and location of a frame, as shown in the collapsed stacks."""
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = filename[len(_ROOT):]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _stack(frame: Any) -> str:
+    """Collapsed stack of a frame, outermost caller first."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """Thread recording the stacks of a capture's threads until stopped."""
+
+    def __init__(self, capture: Capture, interval: float):
+        super().__init__(name=f'profiler-{capture.id}', daemon=True)
+        self.capture = capture
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in tuple(self.capture.threads):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.capture.samples[_stack(frame)] += 1
+
+
+class Profiler:
+    """Trigger rules and the bounded buffer of recent captures."""
+
+    def __init__(self, token: str, sample_rate: float, interval: float, max_captures: int):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.captures: deque[Capture] = deque(maxlen=max_captures)
+        self._ids = itertools.count(1)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any request can be profiled."""
+        return bool(self.token) or self.sample_rate > 0
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Whether a header value matches the profiling token."""
+        return bool(self.token) and token is not None and hmac.compare_digest(token, self.token)
+
+    def trigger(self, headers: Headers) -> Optional[str]:
+        """Why a request should be profiled, or None if it should not."""
+        if self.authorized(headers.get(PROFILE_HEADER)):
+            return 'header'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def start(self, scope: Scope, trigger: str) -> Capture:
+        """Open a capture for a request served by the current thread."""
+        capture = Capture(
+            id=next(self._ids),
+            method=scope['method'],
+            path=scope['path'],
+            trigger=trigger,
+            started_at=datetime.now(timezone.utc),
+        )
+        capture.threads.add(threading.get_ident())
+        return capture
+
+    def finish(self, capture: Capture) -> None:
+        """Close a capture and keep it, evicting the oldest one if full."""
+        capture.duration = time.perf_counter() - capture.started
+        self.captures.append(capture)
+
+    def get(self, capture_id: int) -> Optional[Capture]:
+        """A kept capture by ID."""
+        return next((c for c in self.captures if c.id == capture_id), None)
+
+
+# Profiler shared by the middleware, the SQL hooks and the stats endpoints
+profiler = Profiler(
+    settings.PROFILE_TOKEN, settings.PROFILE_SAMPLE_RATE,
+    settings.PROFILE_INTERVAL, settings.PROFILE_CAPTURES
+)
+
+# Capture of the request being served; copied into threadpool calls
+current_capture: contextvars.ContextVar[Optional[Capture]] = contextvars.ContextVar(
+    'current_capture', default=None
+)
+
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Start timing a statement sent for a profiled request."""
+    capture = current_capture.get()
+    if capture is not None:
+        # Threadpool threads doing the request's work are sampled too
+        capture.threads.add(threading.get_ident())
+        conn.info.setdefault('profiled', []).append(
+            Statement(sql=statement, started=time.perf_counter())
+        )
+
+
+def _finish_statement(conn: Any) -> None:
+    """Record the duration of the statement in flight on a connection, if it is timed."""
+    pending = conn.info.get('profiled')
+    if not pending:
+        return
+    # Popped even without a capture, so nothing stays on the pooled connection
+    timed = pending.pop()
+    capture = current_capture.get()
+    if capture is not None:
+        timed.duration = time.perf_counter() - timed.started
+        capture.statements.append(timed)
+
+
+@event.listens_for(engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Record the duration of a statement sent for a profiled request."""
+    _finish_statement(conn)
+
+
+@event.listens_for(engine, 'handle_error')
+def _handle_error(exception_context):
+    """Record a failed statement, which never reaches after_cursor_execute."""
+    if exception_context.connection is not None:
+        _finish_statement(exception_context.connection)
+
+
+class ProfilerMiddleware:
+    """ASGI middleware that profiles requests picked by the profiler."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope['type'] != 'http'
+            or not profiler.enabled
+            or exempt(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+        trigger = profiler.trigger(Headers(scope=scope))
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        capture = profiler.start(scope, trigger)
+
+        async def send_with_id(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                capture.status = message['status']
+                MutableHeaders(scope=message).append('X-Profile-Id', str(capture.id))
+            await send(message)
+
+        sampler = Sampler(capture, profiler.interval)
+        token = current_capture.set(capture)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stopped.set()
+            current_capture.reset(token)
+            sampler.join()
+            profiler.finish(capture)
@@ -0,0 +1,160 @@
+"""
+Maintenance of the revenue rollups in api.models.revenue.
+
+`record_purchase` adds a purchase to its hour and day rows with an upsert in
+the transaction that writes the purchase, so the rollups commit or roll back
+with it. `rebuild_rollups` recomputes them in bulk from the hot and archived
+purchases, for backfills and after data fixes.
+
+Both file every sale under its product's current category, and under
+"Unknown" once the product is gone: `file_product` moves a product's rows
+when its category changes or it is deleted, so the incremental rollups
+always match what a rebuild would produce.
+
+Purchase dates are stored in UTC, so buckets are UTC hours and days.
+
+Rebuild from the command line with `python -m api.rollups [--since DATE]`.
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Optional
+from sqlalchemy import delete, func, insert, select, union_all, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from api.archive import archived_purchases, as_utc, ensure_archive
+from api.dependencies import SessionLocal
+from api.models.product import Product
+from api.models.purchase import Purchase
+from api.models.revenue import RevenueDaily, RevenueHourly
+from api.startup import load_models
+
+# Category of archived purchases whose product has been deleted
+UNKNOWN_CATEGORY: str = 'Unknown'
+
+Totals = list[Any]
+
+
+def hour_of(moment: datetime) -> datetime:
+    """Start of the UTC hour of a moment."""
+    return as_utc(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def day_of(moment: datetime) -> datetime:
+    """Start of the UTC day of a moment."""
+    return as_utc(moment).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _upsert(db: Session, model: Any, rows: list[dict[str, Any]]) -> None:
+    """Add revenue, units and orders to existing rollup rows, or insert them."""
+    statement = sqlite_insert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=['bucket', 'product_id'],
+        set_={
+            'category': statement.excluded.category,
+            'revenue': model.revenue + statement.excluded.revenue,
+            'units': model.units + statement.excluded.units,
+            'orders': model.orders + statement.excluded.orders,
+        }
+    )
+    db.execute(statement, rows)
+
+
+def record_purchase(db: Session, purchase: Any, category: str) -> None:
+    """Add a purchase (instance or row) to its hourly and daily rollups, in the caller's transaction."""
+    row = {
+        'product_id': purchase.product_id,
+        'category': category,
+        'revenue': purchase.quantity * float(purchase.unit_price),
+        'units': purchase.quantity,
+        'orders': 1,
+    }
+    _upsert(db, RevenueHourly, [{**row, 'bucket': hour_of(purchase.purchase_date)}])
+    _upsert(db, RevenueDaily, [{**row, 'bucket': day_of(purchase.purchase_date)}])
+
+
+def file_product(db: Session, product_id: int, category: str) -> None:
+    """File every rollup row of a product under a category, in the caller's transaction."""
+    for model in (RevenueHourly, RevenueDaily):
+        db.execute(update(model).where(model.product_id == product_id).values(category=category))
+
+
+def _hourly_totals(table: Any, since: Optional[datetime]) -> Any:
+    """Revenue, units and orders of a purchases table per hour and product."""
+    hour = func.strftime('%Y-%m-%d %H', table.c.purchase_date)
+    statement = select(
+        hour.label('hour'),
+        table.c.product_id,
+        func.sum(table.c.quantity * table.c.unit_price).label('revenue'),
+        func.sum(table.c.quantity).label('units'),
+        func.count().label('orders'),
+    ).group_by(hour, table.c.product_id)
+    if since is not None:
+        statement = statement.where(table.c.purchase_date >= since)
+    return statement
+
+
+def rebuild_rollups(db: Session, since: Optional[datetime] = None) -> int:
+    """
+    Recompute the rollups from whole days on or after `since`, or from scratch.
+
+    Returns the number of purchases rolled up. The rollups are cleared
+    first, which takes the write lock, so no purchase can commit between
+    the clear and the recount and be counted twice or not at all.
+    """
+    ensure_archive()
+    since = None if since is None else day_of(since)
+    for model in (RevenueHourly, RevenueDaily):
+        statement = delete(model)
+        if since is not None:
+            statement = statement.where(model.bucket >= since)
+        db.execute(statement)
+
+    totals = union_all(
+        _hourly_totals(Purchase.__table__, since),
+        _hourly_totals(archived_purchases, since)
+    ).subquery()
+    categories = dict(db.execute(select(Product.id, Product.category)).all())
+
+    hourly: dict[tuple[datetime, int], Totals] = defaultdict(lambda: [0, 0, 0])
+    for hour, product_id, revenue, units, orders in db.execute(select(totals)):
+        bucket = datetime.strptime(hour, '%Y-%m-%d %H').replace(tzinfo=timezone.utc)
+        row = hourly[bucket, product_id]
+        row[0] += revenue
+        row[1] += units
+        row[2] += orders
+    daily: dict[tuple[datetime, int], Totals] = defaultdict(lambda: [0, 0, 0])
+    for (bucket, product_id), (revenue, units, orders) in hourly.items():
+        row = daily[day_of(bucket), product_id]
+        row[0] += revenue
+        row[1] += units
+        row[2] += orders
+
+    for model, rollup in ((RevenueHourly, hourly), (RevenueDaily, daily)):
+        if rollup:
+            db.execute(insert(model), [
+                {
+                    'bucket': bucket,
+                    'product_id': product_id,
+                    'category': categories.get(product_id, UNKNOWN_CATEGORY),
+                    'revenue': round(revenue, 2),
+                    'units': units,
+                    'orders': orders,
+                }
+                for (bucket, product_id), (revenue, units, orders) in rollup.items()
+            ])
+    db.commit()
+    return sum(orders for _, _, orders in daily.values())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild the revenue rollups.")
+    parser.add_argument(
+        '--since', type=datetime.fromisoformat,
+        help="only rebuild from this day on (ISO 8601), instead of from scratch"
+    )
+    args = parser.parse_args()
+    # Products refer to every other model by name
+    load_models()
+    with SessionLocal() as session:
+        print(f"Rolled up {rebuild_rollups(session, args.since)} purchases")
@@ -1,12 +1,17 @@
 """
 Router for comment-related endpoints.
 """
-from typing import List
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from api import settings
 from api.models.comment import Comment as CommentModel
+from api.feeds import comment_created, comment_feed, decode_cursor, encode_cursor, feed_changed
+from api.lookups import comments_by_product
 from api.dependencies import get_db
+from api.writes import insert_returning
 
 
 # Create a router for comment-related routes
@@ -19,7 +24,8 @@ router = APIRouter(
 # Pydantic models
 class CommentBase(BaseModel):
     """Create the Pydantic model of a comment."""
-    comment: str
+    # Same bounds as check_comment_length and the column
+    comment: str = Field(..., min_length=3, max_length=1000)
     customer_id: int
     product_id: int
 
@@ -34,19 +40,69 @@ class Comment(CommentBase):
         from_attributes = True
 
 
+class FeedComment(BaseModel):
+    """Create the model of a comment in a product's feed."""
+    id: int
+    content: str
+    customer_id: int
+    customer_name: str
+    created_at: datetime
+
+
+class CommentFeed(BaseModel):
+    """Create the model of a page of a product's comment feed."""
+    items: List[FeedComment]
+    next_cursor: Optional[str]
+
+
 # Create a new comment
 @router.post("/", response_model=Comment)
 async def create_comment(review: CommentBase, db: Session = Depends(get_db)):
     """POST /comments endpoint to create a comment."""
-    db_comment = CommentModel(**review.model_dump())
-    db.add(db_comment)
+    row = insert_returning(
+        db, CommentModel,
+        {'content': review.comment, 'customer_id': review.customer_id, 'product_id': review.product_id},
+        CommentModel.content.label('comment')
+    )
+    feed_changed(db, review.product_id)
     db.commit()
-    db.refresh(db_comment)
-    return db_comment
+    comment_created(db, row)
+    return row
+
+
+# Retrieve a page of the comments of a single product, newest first
+@router.get("/products/{product_id}/feed", response_model=CommentFeed)
+async def get_product_feed(
+    product_id: int,
+    limit: int = Query(settings.FEED_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    GET /comments/products/{product_id}/feed endpoint to page through the comments of a product.
+
+    Pass the `next_cursor` of a page as `cursor` to get the next one; it is
+    null on the last page.
+    """
+    before = None
+    if cursor is not None:
+        try:
+            before = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = comment_feed(db, product_id, limit, before)
+    return CommentFeed(
+        items=[dict(row) for row in rows],
+        next_cursor=encode_cursor(rows[-1]) if len(rows) == limit else None
+    )
 
 
 # Retrieve a list of all comments for a single product
-@router.get("/products/{product_id}", response_model=List[Comment])
+@router.get("/products/{product_id}", response_model=List[Comment], deprecated=True)
 async def get_product_reviews(product_id: int, db: Session = Depends(get_db)):
-    """GET /comments/products/{product_id} endpoint to get comments of a product."""
-    return db.query(CommentModel).filter(CommentModel.product_id == product_id).all()
+    """
+    GET /comments/products/{product_id} endpoint to get comments of a product.
+
+    Returns every comment in one response; prefer the paginated feed.
+    """
+    return comments_by_product(db, product_id)
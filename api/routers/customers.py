@@ -1,12 +1,21 @@
 """
 Router for customer-related endpoints.
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+import sys
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, delete, or_
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, EmailStr
-from api.models.customer import Customer as CustomerModel
+from pydantic import BaseModel, EmailStr, Field
+from api.archive import archived_purchases, ensure_archive
+from api.feeds import CUSTOMER_NAME, feed_cache, feed_changed
+from api.models.customer import (
+    Customer as CustomerModel, normalize_phone, normalize_text, search_values
+)
+from api.lookups import customer_by_id
 from api.dependencies import get_db
+from api.fields import field_response, fields_response, parse_fields, query_fields
+from api.writes import insert_returning, update_returning
 
 router = APIRouter(
     prefix="/customers",
@@ -17,14 +26,30 @@ router = APIRouter(
 # Pydantic models
 class CustomerBase(BaseModel):
     """Create the Pydantic model of a customer."""
-    firstname: str
-    lastname: str
+    # Same bounds as the check constraints of the customers table
+    firstname: str = Field(..., min_length=2, max_length=50)
+    lastname: str = Field(..., min_length=2, max_length=50)
     email: EmailStr
-    phone: str
+    phone: str = Field(..., min_length=10, max_length=20)
     delivery_address: str
     billing_address: str
 
 
+class CustomerUpdate(BaseModel):
+    """Create the Pydantic model of a partial customer update."""
+    firstname: Optional[str] = Field(None, min_length=2, max_length=50)
+    lastname: Optional[str] = Field(None, min_length=2, max_length=50)
+    email: Optional[EmailStr] = None
+    phone: Optional[str] = Field(None, min_length=10, max_length=20)
+    delivery_address: Optional[str] = None
+    billing_address: Optional[str] = None
+
+
+class CustomerPurge(BaseModel):
+    """Create the Pydantic model of a request to erase customers."""
+    customer_ids: List[int] = Field(..., min_length=1, max_length=10_000)
+
+
 class Customer(CustomerBase):
     """Create the model of the customer based on the CustomerBase."""
     id: int
@@ -35,30 +60,161 @@ class Customer(CustomerBase):
         from_attributes = True
 
 
+def _upper_bound(prefix: str) -> Optional[str]:
+    """The smallest string above every string starting with `prefix`, if there is one."""
+    # The last code point has no successor; carry over to the one before it
+    stripped = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped:
+        return None
+    code = ord(stripped[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        # Surrogates cannot be encoded for SQLite, and no text contains them
+        code = 0xE000
+    return stripped[:-1] + chr(code)
+
+
+def _prefix(column, prefix: str):
+    """
+    Match values starting with `prefix` as a range, which SQLite serves from
+    the column's index (LIKE would need a case-insensitive index to do so).
+    """
+    upper = _upper_bound(prefix)
+    if upper is None:
+        return column >= prefix
+    return and_(column >= prefix, column < upper)
+
+
+def _search_filter(q: str):
+    """Build the filter of a customer search from the search text."""
+    text = normalize_text(q)
+    digits = normalize_phone(q)
+    if '@' in text:
+        return _prefix(CustomerModel.search_email, text)
+    if digits and len(digits) >= 3 and not any(char.isalpha() for char in text):
+        return _prefix(CustomerModel.search_phone, digits)
+    first, _, rest = text.partition(' ')
+    rest = rest.strip()
+    if rest:
+        # "clark ke" matches Clark Kent, and "kent cl" matches him too
+        return or_(
+            and_(_prefix(CustomerModel.search_firstname, first),
+                 _prefix(CustomerModel.search_lastname, rest)),
+            and_(_prefix(CustomerModel.search_lastname, first),
+                 _prefix(CustomerModel.search_firstname, rest))
+        )
+    return or_(
+        _prefix(CustomerModel.search_firstname, text),
+        _prefix(CustomerModel.search_lastname, text),
+        _prefix(CustomerModel.search_email, text)
+    )
+
+
+def _with_search_values(values: dict) -> dict:
+    """Add the search columns that mapper events would derive for ORM writes."""
+    return {**values, **search_values(values)}
+
+
+def _update_customer(db: Session, customer_id: int, values: dict) -> Any:
+    """Apply an update in one UPDATE ... RETURNING, commit it and return the row."""
+    previous = None
+    if 'firstname' in values or 'lastname' in values:
+        previous = db.execute(CUSTOMER_NAME, {'ident': customer_id}).first()
+    row = update_returning(db, CustomerModel, customer_id, _with_search_values(values))
+    if row is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    renamed = previous is not None and tuple(previous) != (row.firstname, row.lastname)
+    if renamed:
+        feed_changed(db)
+    db.commit()
+    if renamed:
+        # Cached feed pages show the author's name, on any product
+        feed_cache.invalidate()
+    return row
+
+
+# Customers deleted per statement when erasing many at once
+PURGE_BATCH_SIZE: int = 500
+
+
+def _erase_customers(db: Session, customer_ids: List[int]) -> dict[str, int]:
+    """
+    Delete customers and everything recorded about them, in one transaction.
+
+    Each batch is one DELETE of customers, whose comments, ratings and
+    purchases the foreign keys cascade to, plus one DELETE of their archived
+    purchases, which the archive's lack of foreign keys leaves to us.
+    """
+    ensure_archive()
+    erased = {'customers': 0, 'archived_purchases': 0}
+    for start in range(0, len(customer_ids), PURGE_BATCH_SIZE):
+        batch = customer_ids[start:start + PURGE_BATCH_SIZE]
+        erased['customers'] += db.execute(
+            delete(CustomerModel).where(CustomerModel.id.in_(batch)),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        erased['archived_purchases'] += db.execute(
+            delete(archived_purchases).where(archived_purchases.c.customer_id.in_(batch))
+        ).rowcount
+    feed_changed(db)
+    db.commit()
+    # Their comments may be on any cached feed page
+    feed_cache.invalidate()
+    return erased
+
+
 # Create a new customer
 @router.post("/", response_model=Customer)
 async def create_customer(customer: CustomerBase, db: Session = Depends(get_db)):
     """POST /customers endpoint to create a product."""
-    db_customer = CustomerModel(**customer.model_dump())
-    db.add(db_customer)
+    row = insert_returning(db, CustomerModel, _with_search_values(customer.model_dump()))
     db.commit()
-    db.refresh(db_customer)
-    return db_customer
+    return row
 
 
 # Retrieve a list of customers
 @router.get("/", response_model=List[Customer])
-async def get_customers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_customers(
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
     """GET /customers endpoint to get all the customers."""
+    columns = parse_fields(Customer, fields)
+    if columns is not None:
+        rows = query_fields(db, CustomerModel, columns).offset(skip).limit(limit).all()
+        return fields_response(rows, columns)
     customers = db.query(CustomerModel).offset(skip).limit(limit).all()
     return customers
 
 
+# Search customers by name, email or phone
+@router.get("/search", response_model=List[Customer])
+async def search_customers(
+    q: str = Query(..., min_length=1, max_length=255),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    GET /customers/search endpoint to find customers by the start of their
+    first name, last name, "first last", email or phone digits, ignoring case.
+    """
+    if not normalize_text(q):
+        return []
+    return db.query(CustomerModel).filter(_search_filter(q)).limit(limit).all()
+
+
 # Retrieve a single customer
 @router.get("/{customer_id}", response_model=Customer)
-async def get_customer(customer_id: int, db: Session = Depends(get_db)):
+async def get_customer(customer_id: int, fields: Optional[str] = None, db: Session = Depends(get_db)):
     """GET /customers/{customer_id} endpoint to retrieve a customer by its ID."""
-    customer = db.query(CustomerModel).filter(CustomerModel.id == customer_id).first()
+    columns = parse_fields(Customer, fields)
+    if columns is not None:
+        row = query_fields(db, CustomerModel, columns).filter(CustomerModel.id == customer_id).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        return field_response(row, columns)
+    customer = customer_by_id(db, customer_id)
     if customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
@@ -72,23 +228,39 @@ async def update_customer(
     db: Session = Depends(get_db)
 ):
     """PUT /customers/{customer_id} endpoint to update a product by its ID."""
-    customer = db.query(CustomerModel).filter(CustomerModel.id == customer_id).first()
-    if customer is None:
-        raise HTTPException(status_code=404, detail="Customer not found")
-    for key, value in updated_customer.model_dump().items():
-        setattr(customer, key, value)
-    db.commit()
-    db.refresh(customer)
-    return customer
+    return _update_customer(db, customer_id, updated_customer.model_dump())
+
+
+# Update some fields of a single customer
+@router.patch("/{customer_id}", response_model=Customer)
+async def patch_customer(
+    customer_id: int,
+    changes: CustomerUpdate,
+    db: Session = Depends(get_db)
+):
+    """PATCH /customers/{customer_id} endpoint to update the given fields of a customer."""
+    return _update_customer(
+        db, customer_id, changes.model_dump(exclude_unset=True, exclude_none=True)
+    )
+
+
+# Erase customers and all their data
+@router.post("/purge", response_model=dict[str, int])
+async def purge_customers(purge: CustomerPurge, db: Session = Depends(get_db)):
+    """
+    POST /customers/purge endpoint to erase customers with their comments,
+    ratings and purchases, archived ones included, in one transaction.
+
+    Returns how many customers and archived purchases were deleted; unknown
+    IDs are ignored. Revenue rollups keep their anonymous totals.
+    """
+    return _erase_customers(db, list(dict.fromkeys(purge.customer_ids)))
 
 
 # Delete a single customer
 @router.delete("/{customer_id}", response_model=dict[str, str])
-async def delete_product(customer_id: int, db: Session = Depends(get_db)):
-    """DELETE /customers/{customer_id} endpoint to delete a customer by its ID."""
-    customer = db.query(CustomerModel).filter(CustomerModel.id == customer_id).first()
-    if customer is None:
-        raise HTTPException(status_code = 404, detail="Customer not found")
-    db.delete(customer)
-    db.commit()
+async def delete_customer(customer_id: int, db: Session = Depends(get_db)):
+    """DELETE /customers/{customer_id} endpoint to delete a customer and their data by its ID."""
+    if not _erase_customers(db, [customer_id])['customers']:
+        raise HTTPException(status_code=404, detail="Customer not found")
     return {"message": "Customer successfully deleted"}
@@ -1,12 +1,21 @@
 """
 Router for delivery-related endpoints.
 """
-from typing import List
-from fastapi import APIRouter, Depends
+import asyncio
+import json
+from collections import Counter
+from typing import Any, AsyncIterator, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from api.models.delivery import Delivery as DeliveryModel
+from pydantic import BaseModel, Field, ValidationError
+from api import settings
+from api.models.delivery import Delivery as DeliveryModel, DeliveryStatus
 from api.dependencies import get_db
+from api.events import hub
+from api.tracking import OUTCOMES, TrackingEvent, ingest_batch
+from api.writes import insert_returning
 
 
 # Create a router for delivery-related routes
@@ -22,11 +31,15 @@ class DeliveryBase(BaseModel):
     type: str
     min_days: int
     max_days: int
+    # Carrier tracking events are matched on these two
+    carrier: Optional[str] = Field(None, max_length=100)
+    tracking_number: Optional[str] = Field(None, max_length=100)
 
 
 class Delivery(DeliveryBase):
     """Create the model of the delivery based on the DeliveryBase."""
     id: int
+    status: Optional[DeliveryStatus] = None
 
     class Config:
         """Provide configurations to Pydantic."""
@@ -34,15 +47,100 @@ class Delivery(DeliveryBase):
         from_attributes = True
 
 
+class DeliveryStatusUpdate(BaseModel):
+    """Create the Pydantic model of a delivery status change."""
+    status: DeliveryStatus
+    notes: Optional[str] = None
+    # Usually known once the parcel ships
+    carrier: Optional[str] = Field(None, max_length=100)
+    tracking_number: Optional[str] = Field(None, max_length=100)
+
+
+class TrackingError(BaseModel):
+    """Create the model of a tracking event that could not be read."""
+    line: int
+    detail: str
+
+
+class TrackingSummary(BaseModel):
+    """Create the model of the outcome of a tracking event ingestion."""
+    received: int
+    applied: int
+    duplicates: int
+    stale: int
+    unknown: int
+    rejected: int
+    invalid: int
+    errors: List[TrackingError]
+
+
+# Seconds between keep-alive comments on idle event streams
+KEEPALIVE_INTERVAL: float = 15.0
+
+# Invalid tracking events reported back in detail, per request
+MAX_TRACKING_ERRORS: int = 20
+
+
+async def _event_stream(request: Request, topic: str) -> AsyncIterator[str]:
+    """Yield the events of a topic in server-sent event format until the client leaves."""
+    queue = hub.subscribe(topic)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+    finally:
+        hub.unsubscribe(topic, queue)
+
+
+def _event_response(request: Request, topic: str) -> StreamingResponse:
+    """Wrap a topic's event stream in a text/event-stream response."""
+    return StreamingResponse(
+        _event_stream(request, topic),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # Create a new delivery
 @router.post("/", response_model=Delivery)
 async def create_delivery(delivery: DeliveryBase, db: Session = Depends(get_db)):
     """GET /deliveries endpoint to get all the deliveries."""
-    db_delivery = DeliveryModel(**delivery.model_dump())
-    db.add(db_delivery)
+    row = insert_returning(db, DeliveryModel, delivery.model_dump())
     db.commit()
-    db.refresh(db_delivery)
-    return db_delivery
+    return row
+
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[tuple[int, Any]]:
+    """Yield the numbered lines of an NDJSON body as they arrive."""
+    buffer = b""
+    number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line
+    if buffer:
+        yield number + 1, buffer
+
+
+async def _json_items(request: Request) -> AsyncIterator[tuple[int, Any]]:
+    """Yield the numbered items of a JSON array body."""
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not valid JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of events")
+    for number, item in enumerate(items, start=1):
+        yield number, item
 
 
 # Get a list of deliveries
@@ -50,3 +148,83 @@ async def create_delivery(delivery: DeliveryBase, db: Session = Depends(get_db))
 async def get_deliveries(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     deliveries = db.query(DeliveryModel).offset(skip).limit(limit).all()
     return deliveries
+
+
+# Ingest carrier tracking events
+@router.post("/tracking", response_model=TrackingSummary)
+async def ingest_tracking_events(request: Request):
+    """
+    POST /deliveries/tracking endpoint to apply carrier tracking events.
+
+    Takes a JSON array of events or, with an `application/x-ndjson` content
+    type, a stream of one event per line, applied in batches as they are
+    read. Events are matched on `carrier` and `tracking_number`; replayed
+    and out-of-order events are skipped, so a batch can be sent again.
+    """
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    items = _ndjson_lines(request) if ndjson else _json_items(request)
+    counts: Counter = Counter({outcome: 0 for outcome in OUTCOMES})
+    errors: List[TrackingError] = []
+    received = invalid = 0
+    batch: List[TrackingEvent] = []
+    async for number, item in items:
+        if ndjson and not item.strip():
+            continue
+        received += 1
+        try:
+            if ndjson:
+                batch.append(TrackingEvent.model_validate_json(item))
+            else:
+                batch.append(TrackingEvent.model_validate(item))
+        except ValidationError as error:
+            invalid += 1
+            if len(errors) < MAX_TRACKING_ERRORS:
+                errors.append(TrackingError(line=number, detail=str(error.errors()[0]['msg'])))
+            continue
+        if len(batch) >= settings.TRACKING_BATCH_SIZE:
+            # Batches run in order, off the event loop, one transaction each
+            counts.update(await run_in_threadpool(ingest_batch, batch))
+            batch = []
+    if batch:
+        counts.update(await run_in_threadpool(ingest_batch, batch))
+    return TrackingSummary(received=received, invalid=invalid, errors=errors, **counts)
+
+
+# Update the status of a delivery
+@router.patch("/{delivery_id}/status", response_model=Delivery)
+async def update_delivery_status(
+    delivery_id: int,
+    update: DeliveryStatusUpdate,
+    db: Session = Depends(get_db)
+):
+    """
+    PATCH /deliveries/{delivery_id}/status endpoint to change the status of a delivery.
+
+    A `carrier` and `tracking_number` sent along are set first, so that
+    later carrier tracking events find the delivery.
+    """
+    delivery = db.get(DeliveryModel, delivery_id)
+    if delivery is None:
+        raise HTTPException(status_code=404, detail="Delivery not found")
+    if update.carrier is not None:
+        delivery.carrier = update.carrier
+    if update.tracking_number is not None:
+        delivery.tracking_number = update.tracking_number
+    delivery.update_status(update.status, update.notes)
+    db.commit()
+    db.refresh(delivery)
+    return delivery
+
+
+# Stream the status changes of a single delivery
+@router.get("/{delivery_id}/events")
+async def stream_delivery_events(delivery_id: int, request: Request):
+    """GET /deliveries/{delivery_id}/events endpoint to stream status changes of a delivery."""
+    return _event_response(request, f"delivery:{delivery_id}")
+
+
+# Stream the status changes of every delivery of a customer
+@router.get("/customers/{customer_id}/events")
+async def stream_customer_delivery_events(customer_id: int, request: Request):
+    """GET /deliveries/customers/{customer_id}/events endpoint to stream status changes for a customer."""
+    return _event_response(request, f"customer:{customer_id}")
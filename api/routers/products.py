@@ -1,12 +1,27 @@
 """
 Router for product-related endpoints.
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from datetime import datetime
+from enum import Enum
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from api.catalog import catalog
+from api.feeds import comment_feed, feed_cache, feed_changed
 from api.models.product import Product as ProductModel
-from api.dependencies import get_db
+from api.models.rating import Rating as RatingModel
+from api.models.score import ProductScore
+from api.lookups import product_by_id
+from api.rollups import UNKNOWN_CATEGORY, file_product
+from api.scores import score_product
+from api.dependencies import SessionLocal, get_db
+from api.writes import insert_returning, update_returning
+from api.fields import field_response, fields_response, parse_fields, query_fields
 
 
 # Create a router for product-related routes
@@ -16,18 +31,46 @@ router = APIRouter(
 )
 
 
+class ProductSort(str, Enum):
+    """Enumeration of the orders a product list can be sorted in."""
+    ID = "id"
+    PRICE = "price"
+    PRICE_DESC = "-price"
+    # Ranked by the scores in api.scores, best first
+    BEST_RATED = "best_rated"
+    MOST_LIKED = "most_liked"
+
+
+# Score column each ranked sort reads
+SCORE_COLUMNS: dict[ProductSort, Any] = {
+    ProductSort.BEST_RATED: ProductScore.bayesian,
+    ProductSort.MOST_LIKED: ProductScore.wilson,
+}
+
+
 # Pydantic models
 class ProductBase(BaseModel):
     """Create the Pydantic model of a product."""
     name: str
-    price: float
+    price: float = Field(..., gt=0)
     image_url: str
     category: str
     description: str
-    quantity: int
+    quantity: int = Field(..., ge=0)
     in_stock: bool
 
 
+class ProductUpdate(BaseModel):
+    """Create the Pydantic model of a partial product update."""
+    name: Optional[str] = None
+    price: Optional[float] = Field(None, gt=0)
+    image_url: Optional[str] = None
+    category: Optional[str] = None
+    description: Optional[str] = None
+    quantity: Optional[int] = Field(None, ge=0)
+    in_stock: Optional[bool] = None
+
+
 class Product(ProductBase):
     """Create the model of the product based on the ProductBase."""
     id: int
@@ -38,35 +81,175 @@ class Product(ProductBase):
         from_attributes = True
 
 
+class RatingSummary(BaseModel):
+    """Create the model of the rating summary of a product."""
+    count: int
+    average: Optional[float]
+
+
+class ProductComment(BaseModel):
+    """Create the model of a comment shown on a product page."""
+    id: int
+    content: str
+    customer_id: int
+    customer_name: str
+    created_at: datetime
+
+
+class ProductDetail(BaseModel):
+    """Create the model of everything a product page needs."""
+    product: Product
+    ratings: RatingSummary
+    comments: List[ProductComment]
+
+
+def _update_product(db: Session, product_id: int, values: dict) -> Any:
+    """Apply an update in one UPDATE ... RETURNING, commit it and return the row."""
+    row = update_returning(db, ProductModel, product_id, values)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if 'category' in values:
+        # Ranked listings and revenue reports of a category keep their own copy
+        score_product(db, product_id)
+        file_product(db, product_id, values['category'])
+    db.commit()
+    if catalog is not None:
+        catalog.put(row)
+    return row
+
+
+def _load_product(product_id: int) -> Optional[Product]:
+    """Load a product in its own session."""
+    with SessionLocal() as db:
+        product = product_by_id(db, product_id)
+        return None if product is None else Product.model_validate(product)
+
+
+def _load_rating_summary(product_id: int) -> RatingSummary:
+    """Aggregate the ratings of a product in its own session."""
+    with SessionLocal() as db:
+        count, average = db.query(
+            func.count(RatingModel.id),
+            func.avg(RatingModel.rating)
+        ).filter(RatingModel.product_id == product_id).one()
+        return RatingSummary(count=count, average=average)
+
+
+def _load_latest_comments(product_id: int, limit: int) -> List[ProductComment]:
+    """Load the latest comments of a product from its feed, in its own session."""
+    with SessionLocal() as db:
+        return [ProductComment(**row) for row in comment_feed(db, product_id, limit)]
+
+
 # Create a new product
 @router.post("/", response_model=Product)
 async def create_product(product: ProductBase, db: Session = Depends(get_db)):
     """POST /products endpoint to create a product."""
-    db_product = ProductModel(**product.model_dump())
-    db.add(db_product)
+    row = insert_returning(db, ProductModel, product.model_dump())
+    # Ranked listings only show scored products
+    score_product(db, row.id)
     db.commit()
-    db.refresh(db_product)
-    return db_product
+    if catalog is not None:
+        catalog.put(row)
+    return row
 
 
 # Retrieve a list of products
 @router.get("/", response_model=List[Product])
-async def get_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """GET /products endpoint to get all the products."""
-    products = db.query(ProductModel).offset(skip).limit(limit).all()
-    return products
+async def get_products(
+    skip: int = 0,
+    limit: int = 100,
+    category: Optional[str] = None,
+    sort: ProductSort = ProductSort.ID,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    GET /products endpoint to get all the products, optionally of one category.
+
+    `best_rated` ranks products by Bayesian average rating and `most_liked`
+    by the Wilson lower bound of their share of 4 and 5 star ratings. Both
+    read the precomputed scores, which every product gets on creation.
+    """
+    columns = parse_fields(Product, fields)
+    score = SCORE_COLUMNS.get(sort)
+    if catalog is not None and score is None:
+        products = catalog.current().select(
+            category,
+            by_price=sort != ProductSort.ID,
+            descending=sort == ProductSort.PRICE_DESC
+        )[skip:skip + limit]
+        if columns is not None:
+            return fields_response(([row[name] for name in columns] for row in products), columns)
+        return [dict(row) for row in products]
+
+    if columns is not None:
+        query = query_fields(db, ProductModel, columns)
+    else:
+        query = db.query(ProductModel)
+    if score is not None:
+        # Walk the score index backwards; products are looked up by ID
+        query = query.join(ProductScore, ProductScore.product_id == ProductModel.id)
+        if category is not None:
+            query = query.filter(ProductScore.category == category)
+        query = query.order_by(score.desc(), ProductScore.product_id.desc())
+    if category is not None:
+        query = query.filter(ProductModel.category == category)
+    if sort == ProductSort.PRICE:
+        query = query.order_by(ProductModel.price, ProductModel.id)
+    elif sort == ProductSort.PRICE_DESC:
+        query = query.order_by(ProductModel.price.desc(), ProductModel.id.desc())
+    rows = query.offset(skip).limit(limit).all()
+    if columns is not None:
+        return fields_response(rows, columns)
+    return rows
 
 
 # Retrieve a single product
 @router.get("/{product_id}", response_model=Product)
-async def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(product_id: int, fields: Optional[str] = None, db: Session = Depends(get_db)):
     """GET /products/{product_id} endpoint to retrieve a product by its ID."""
-    product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
+    columns = parse_fields(Product, fields)
+    if catalog is not None:
+        product = catalog.current().by_id.get(product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if columns is not None:
+            return field_response([product[name] for name in columns], columns)
+        return dict(product)
+    if columns is not None:
+        row = query_fields(db, ProductModel, columns).filter(ProductModel.id == product_id).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return field_response(row, columns)
+    product = product_by_id(db, product_id)
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 
+# Retrieve a product with its rating summary and latest comments
+@router.get("/{product_id}/detail", response_model=ProductDetail)
+async def get_product_detail(
+    product_id: int,
+    comments: int = Query(10, ge=0, le=50),
+):
+    """
+    GET /products/{product_id}/detail endpoint to render a product page in one call.
+
+    Runs three bounded queries concurrently, each in its own session: the
+    product, an aggregate of its ratings and its latest `comments` comments.
+    """
+    product, ratings, latest_comments = await asyncio.gather(
+        run_in_threadpool(_load_product, product_id),
+        run_in_threadpool(_load_rating_summary, product_id),
+        run_in_threadpool(_load_latest_comments, product_id, comments)
+    )
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return ProductDetail(product=product, ratings=ratings, comments=latest_comments)
+
+
 # Update a single product
 @router.put("/{product_id}", response_model=Product)
 async def update_product(
@@ -75,23 +258,44 @@ async def update_product(
     db: Session = Depends(get_db)
 ):
     """PUT /products/{product_id} endpoint to update a product by its ID."""
-    product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
-    if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    for key, value in updated_product.model_dump().items():
-        setattr(product, key, value)
-    db.commit()
-    db.refresh(product)
-    return product
+    return _update_product(db, product_id, updated_product.model_dump())
+
+
+# Update some fields of a single product
+@router.patch("/{product_id}", response_model=Product)
+async def patch_product(
+    product_id: int,
+    changes: ProductUpdate,
+    db: Session = Depends(get_db)
+):
+    """PATCH /products/{product_id} endpoint to update the given fields of a product."""
+    return _update_product(db, product_id, changes.model_dump(exclude_unset=True, exclude_none=True))
 
 
 # Delete a single product
 @router.delete("/{product_id}", response_model=dict[str, str])
 async def delete_product(product_id: int, db: Session = Depends(get_db)):
-    """DELETE /products/{product_id} endpoint to delete a product by its ID."""
-    product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
-    if product is None:
+    """
+    DELETE /products/{product_id} endpoint to delete a product by its ID.
+
+    Its comments and ratings are deleted with it; a product that has been
+    purchased cannot be deleted.
+    """
+    try:
+        deleted = db.execute(
+            delete(ProductModel).where(ProductModel.id == product_id),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        # Sales of archived purchases stay in the reports, under no category
+        file_product(db, product_id, UNKNOWN_CATEGORY)
+        feed_changed(db, product_id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Product has purchases and cannot be deleted")
+    if not deleted:
         raise HTTPException(status_code=404, detail="Product not found")
-    db.delete(product)
-    db.commit()
+    feed_cache.invalidate(product_id)
+    if catalog is not None:
+        catalog.remove(product_id)
     return {"message": "Product successfully deleted"}
@@ -1,13 +1,20 @@
 """
 Router for purchase-related endpoints.
 """
-from typing import List
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime, timezone
 from api.models.purchase import Purchase as PurchaseModel
+from api.archive import as_utc, query_purchases
+from api.deadlines import query_deadline
+from api.lookups import delivery_exists, product_by_id
 from api.dependencies import get_db
+from api.jobs import enqueue
+from api.rollups import record_purchase
+from api.fields import fields_response, parse_fields
+from api.writes import insert_returning
 
 
 router = APIRouter(
@@ -22,8 +29,8 @@ class PurchaseBase(BaseModel):
     customer_id: int
     product_id: int
     delivery_id: int
-    quantity: int
-    purchase_date: datetime = datetime.now(timezone.utc)
+    quantity: int = Field(..., gt=0)
+    purchase_date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 class Purchase(PurchaseBase):
@@ -36,26 +43,89 @@ class Purchase(PurchaseBase):
         from_attributes = True
 
 
+# Seconds the purchase listings, which may scan the archive, can query for
+LIST_DEADLINE: float = 5.0
+
+# Columns returned when no fieldset is requested
+PURCHASE_COLUMNS: list[str] = ['id', *PurchaseBase.model_fields]
+
+
 # Create a new purchase
 @router.post("/", response_model=Purchase)
 async def create_purchase(purchase: PurchaseBase, db: Session = Depends(get_db)):
-    db_purchase = PurchaseModel(**purchase.model_dump())
-    db.add(db_purchase)
+    """POST /purchases endpoint to create a purchase."""
+    product = product_by_id(db, purchase.product_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if not delivery_exists(db, purchase.delivery_id):
+        raise HTTPException(status_code=404, detail="Delivery not found")
+    # Keep the price paid, so totals survive later price changes and archival
+    row = insert_returning(db, PurchaseModel, {
+        **purchase.model_dump(exclude={'purchase_date'}),
+        'purchase_date': as_utc(purchase.purchase_date),
+        'unit_price': product.price,
+    })
+    # Reports read the rollups, which commit or roll back with the purchase
+    record_purchase(db, row, product.category)
     db.commit()
-    db.refresh(db_purchase)
-    return db_purchase
+    return row
 
 
 # Retrieve a list of all purchases
-@router.get("/", response_model=List[Purchase])
-async def get_purchases(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """GET /purchases endpoint to get all the purchases."""
-    purchases = db.query(PurchaseModel).offset(skip).limit(limit).all()
-    return purchases
+@router.get(
+    "/",
+    response_model=List[Purchase],
+    dependencies=[Depends(query_deadline(LIST_DEADLINE))]
+)
+def get_purchases(
+    skip: int = 0,
+    limit: int = 100,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    GET /purchases endpoint to get all the purchases, oldest first.
+
+    Archived purchases are included, unless a `since` within the hot
+    window rules them out. Runs in the threadpool, so the query stops if
+    the client disconnects.
+    """
+    columns = parse_fields(Purchase, fields) or PURCHASE_COLUMNS
+    rows = query_purchases(db, columns, since=since, until=until, skip=skip, limit=limit)
+    return fields_response(rows, columns)
 
 
 # Retrieve the list of all purchases for a customer
-@router.get("/customers/{customer_id}", response_model=List[Purchase])
-async def get_customer_purchases(customer_id: int, db: Session = Depends(get_db)):
-    """GET /purchases/customers/{customer_id} endpoint to get purchases of a customer."""
-    return db.query(PurchaseModel).filter(PurchaseModel.customer_id == customer_id).all()
+@router.get(
+    "/customers/{customer_id}",
+    response_model=List[Purchase],
+    dependencies=[Depends(query_deadline(LIST_DEADLINE))]
+)
+def get_customer_purchases(
+    customer_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    GET /purchases/customers/{customer_id} endpoint to get purchases of a customer, oldest first.
+
+    Archived purchases are included, unless a `since` within the hot
+    window rules them out. Runs in the threadpool, so the query stops if
+    the client disconnects.
+    """
+    columns = parse_fields(Purchase, fields) or PURCHASE_COLUMNS
+    rows = query_purchases(db, columns, customer_id=customer_id, since=since, until=until)
+    return fields_response(rows, columns)
+
+
+# Move old purchases to the archive
+@router.post("/archive", response_model=dict[str, int], status_code=202)
+async def archive_purchases(db: Session = Depends(get_db)):
+    """POST /purchases/archive endpoint to archive old purchases in the background."""
+    job = enqueue(db, 'purchases.archive')
+    db.commit()
+    return {"job_id": job.id}
@@ -6,7 +6,11 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 from api.models.rating import Rating as RatingModel
+from api.lookups import ratings_by_product
 from api.dependencies import get_db
+from api.jobs import enqueue
+from api.scores import REFRESH_TASK, score_product
+from api.writes import insert_returning
 
 
 # Create a souter for rating-related routes
@@ -38,15 +42,24 @@ class Rating(RatingBase):
 @router.post("/", response_model=Rating)
 async def create_rating(rating: RatingBase, db: Session = Depends(get_db)):
     """POST /ratings endpoint to create a rating."""
-    db_rating = RatingModel(**rating.model_dump())
-    db.add(db_rating)
+    row = insert_returning(db, RatingModel, rating.model_dump())
+    # The rated product moves in the rankings right away
+    score_product(db, rating.product_id)
     db.commit()
-    db.refresh(db_rating)
-    return db_rating
+    return row
 
 
 # Retrieve a list of all the ratings on a single product
 @router.get("/products/{product_id}", response_model=List[Rating])
 async def get_product_ratings(product_id: int, db: Session = Depends(get_db)):
     """GET /ratings/products/{product_id} endpoint to get ratings of a product."""
-    return db.query(RatingModel).filter(RatingModel.product_id == product_id).all()
+    return ratings_by_product(db, product_id)
+
+
+# Recompute the scores products are ranked by
+@router.post("/scores/refresh", response_model=dict[str, int], status_code=202)
+async def refresh_scores(db: Session = Depends(get_db)):
+    """POST /ratings/scores/refresh endpoint to recompute the product scores in the background."""
+    job = enqueue(db, REFRESH_TASK)
+    db.commit()
+    return {"job_id": job.id}
@@ -0,0 +1,163 @@
+"""
+Router for revenue reporting endpoints.
+
+Every report reads the rollup tables in api.models.revenue, never the
+purchases, so reporting does not compete with live traffic for the table.
+"""
+from datetime import datetime
+from enum import Enum
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends
+from sqlalchemy import DateTime, func, type_coerce
+from sqlalchemy.orm import Query, Session
+from pydantic import BaseModel
+from api.archive import as_utc
+from api.deadlines import query_deadline
+from api.dependencies import get_db
+from api.jobs import enqueue
+from api.models.revenue import RevenueDaily, RevenueHourly
+
+
+# Create a router for reporting routes
+router = APIRouter(
+    prefix="/reports",
+    tags=["reports"]
+)
+
+
+# Seconds a report may query for; long ranges are folded from many buckets
+REPORT_DEADLINE: float = 30.0
+
+
+class ReportGrain(str, Enum):
+    """Enumeration of the bucket sizes a report can be broken down by."""
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+
+
+# Pydantic models
+class Revenue(BaseModel):
+    """Create the model of the revenue of a bucket."""
+    bucket: datetime
+    revenue: float
+    units: int
+    orders: int
+
+    class Config:
+        """Provide configurations to Pydantic."""
+        from_attributes = True
+
+
+class CategoryRevenue(Revenue):
+    """Create the model of the revenue of a category in a bucket."""
+    category: str
+
+
+class ProductRevenue(Revenue):
+    """Create the model of the revenue of a product in a bucket."""
+    product_id: int
+
+
+def _report(db: Session, grain: ReportGrain, since: Optional[datetime],
+            until: Optional[datetime], *keys: Any) -> tuple[Any, Query]:
+    """
+    Rollup model and query of revenue per bucket (and per `keys`) in a range.
+
+    Hourly reports read the hourly rollup; daily and weekly ones the daily
+    rollup, weeks (starting on Monday) being folded in SQL.
+    """
+    model = RevenueHourly if grain == ReportGrain.HOUR else RevenueDaily
+    if grain == ReportGrain.WEEK:
+        bucket = type_coerce(
+            func.datetime(model.bucket, 'weekday 0', '-6 days'), DateTime(timezone=True)
+        )
+    else:
+        bucket = model.bucket
+    group = [bucket, *(getattr(model, key) for key in keys)]
+    query = db.query(
+        bucket.label('bucket'),
+        *(getattr(model, key) for key in keys),
+        func.sum(model.revenue).label('revenue'),
+        func.sum(model.units).label('units'),
+        func.sum(model.orders).label('orders')
+    )
+    if since is not None:
+        query = query.filter(model.bucket >= as_utc(since))
+    if until is not None:
+        query = query.filter(model.bucket < as_utc(until))
+    return model, query.group_by(*group).order_by(*group)
+
+
+# Retrieve the revenue per category
+@router.get(
+    "/categories",
+    response_model=List[CategoryRevenue],
+    dependencies=[Depends(query_deadline(REPORT_DEADLINE))]
+)
+def get_category_revenue(
+    grain: ReportGrain = ReportGrain.DAY,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    category: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """GET /reports/categories endpoint to get the revenue per category and bucket."""
+    model, query = _report(db, grain, since, until, 'category')
+    if category is not None:
+        query = query.filter(model.category == category)
+    return query.all()
+
+
+# Retrieve the revenue per product
+@router.get(
+    "/products",
+    response_model=List[ProductRevenue],
+    dependencies=[Depends(query_deadline(REPORT_DEADLINE))]
+)
+def get_products_revenue(
+    grain: ReportGrain = ReportGrain.DAY,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    category: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 1000,
+    db: Session = Depends(get_db)
+):
+    """GET /reports/products endpoint to get the revenue per product and bucket."""
+    model, query = _report(db, grain, since, until, 'product_id')
+    if category is not None:
+        query = query.filter(model.category == category)
+    return query.offset(skip).limit(limit).all()
+
+
+# Retrieve the revenue of a single product
+@router.get(
+    "/products/{product_id}",
+    response_model=List[Revenue],
+    dependencies=[Depends(query_deadline(REPORT_DEADLINE))]
+)
+def get_product_revenue(
+    product_id: int,
+    grain: ReportGrain = ReportGrain.DAY,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """GET /reports/products/{product_id} endpoint to get the revenue of a product per bucket."""
+    model, query = _report(db, grain, since, until)
+    return query.filter(model.product_id == product_id).all()
+
+
+# Recompute the rollups from the purchases
+@router.post("/rebuild", response_model=dict[str, int], status_code=202)
+async def rebuild_reports(since: Optional[datetime] = None, db: Session = Depends(get_db)):
+    """
+    POST /reports/rebuild endpoint to recompute the rollups in the background.
+
+    Rebuilds whole days from `since` on, or everything when it is omitted.
+    """
+    payload = {} if since is None else {'since': as_utc(since).isoformat()}
+    job = enqueue(db, 'reports.rebuild', payload)
+    db.commit()
+    return {"job_id": job.id}
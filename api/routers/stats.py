@@ -0,0 +1,123 @@
+"""
+Router for operational statistics endpoints.
+"""
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from api.admission import controller
+from api import deadlines
+from api.events import hub
+from api.feeds import feed_cache
+from api.idempotency import store
+from api.invalidations import listener
+from api.jobs import job_queue
+from api.profiler import Capture, profiler
+
+
+# Create a router for statistics routes
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"]
+)
+
+
+def require_profile_token(x_profile: Optional[str] = Header(None)) -> None:
+    """Reject requests that do not carry the profiling token."""
+    if not profiler.authorized(x_profile):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+
+
+def get_capture(capture_id: int) -> Capture:
+    """Look up a kept capture, or raise a 404."""
+    capture = profiler.get(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return capture
+
+
+# Retrieve the admission control queue depths and counters
+@router.get("/admission", response_model=dict[str, Any])
+async def get_admission_stats():
+    """GET /stats/admission endpoint to get the admission control queues."""
+    return controller.stats()
+
+
+# Retrieve the size of the idempotency key store
+@router.get("/idempotency", response_model=dict[str, int])
+async def get_idempotency_stats():
+    """GET /stats/idempotency endpoint to get the idempotency key store size."""
+    return await run_in_threadpool(store.stats)
+
+
+# Retrieve the counts of requests whose queries were interrupted
+@router.get("/deadlines", response_model=dict[str, int])
+async def get_deadline_stats():
+    """GET /stats/deadlines endpoint to get the requests cancelled by deadline or disconnect."""
+    return deadlines.stats
+
+
+# Retrieve the subscriber counts of the delivery event hub
+@router.get("/events", response_model=dict[str, int])
+async def get_event_stats():
+    """GET /stats/events endpoint to get the delivery event hub subscribers."""
+    return hub.stats()
+
+
+# Retrieve the background job queue depth and latency
+@router.get("/jobs", response_model=dict[str, Any])
+async def get_job_stats():
+    """GET /stats/jobs endpoint to get the background job queue depth and latency."""
+    return job_queue.stats()
+
+
+# Retrieve the invalidation messages exchanged with the other workers
+@router.get("/invalidations", response_model=dict[str, Any])
+async def get_invalidation_stats():
+    """GET /stats/invalidations endpoint to get the worker's cache invalidation counters."""
+    return listener.stats()
+
+
+# Retrieve the size and hit rate of the comment feed cache
+@router.get("/feeds", response_model=dict[str, int])
+async def get_feed_stats():
+    """GET /stats/feeds endpoint to get the comment feed cache size and hit counters."""
+    return feed_cache.stats()
+
+
+# Retrieve the summaries of the kept request profiles, newest first
+@router.get(
+    "/profiles",
+    response_model=list[dict[str, Any]],
+    dependencies=[Depends(require_profile_token)]
+)
+async def get_profiles():
+    """GET /stats/profiles endpoint to list the kept request profiles."""
+    return [capture.summary() for capture in reversed(profiler.captures)]
+
+
+# Retrieve a request profile with its SQL statements
+@router.get(
+    "/profiles/{capture_id}",
+    response_model=dict[str, Any],
+    dependencies=[Depends(require_profile_token)]
+)
+async def get_profile(capture: Capture = Depends(get_capture)):
+    """GET /stats/profiles/{capture_id} endpoint to get a request profile and its SQL."""
+    return capture.detail()
+
+
+# Retrieve the stack samples of a request profile as collapsed stacks
+@router.get(
+    "/profiles/{capture_id}/collapsed",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_profile_token)]
+)
+async def get_profile_stacks(capture: Capture = Depends(get_capture)):
+    """
+    GET /stats/profiles/{capture_id}/collapsed endpoint to get a flame graph of a request.
+
+    Returns one `frame;frame;frame count` line per distinct stack, as read
+    by flamegraph.pl and speedscope.
+    """
+    return capture.collapsed()
@@ -0,0 +1,226 @@
+"""
+Rating scores of products, computed in bulk for ranked catalog listings.
+
+Sorting by raw average rating puts a product with a single 5 star rating
+above one with hundreds of 4.8 averages. `refresh_scores` computes, for
+every product, two scores that account for how many ratings back it up:
+
+- the Bayesian average, which adds RATING_PRIOR_WEIGHT ratings at the
+  store-wide average to each product's own, so products with few ratings
+  start near the average and move away from it as ratings come in;
+- the Wilson lower bound, the pessimistic end of the 95% confidence
+  interval of the share of 4 and 5 star ratings.
+
+A refresh reads one histogram of ratings per product and star count, a
+grouped index-only scan of the ratings, then scores every product in one
+vectorized NumPy pass (or a plain loop when NumPy is not installed) and
+replaces the product_scores table in a single transaction.
+
+A write only rescores the product it touches (`score_product`), in its own
+transaction: a new product, a category change or a new rating needs that
+product's histogram, an index search, and the store-wide rating count and
+sum, an index-only scan with no sort or grouping. Other products keep the store-wide average of their last scoring until
+a full refresh, queued with `POST /ratings/scores/refresh` or run from the
+command line with `python -m api.scores`.
+"""
+import argparse
+import itertools
+import math
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+from sqlalchemy import bindparam, delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from api import settings
+from api.dependencies import SessionLocal
+from api.models.product import Product
+from api.models.rating import Rating
+from api.models.score import ProductScore
+from api.startup import load_models
+
+try:
+    import numpy as np
+except ImportError:
+    # Scores are then computed one product at a time
+    np = None
+
+# Name of the refresh task in api.tasks
+REFRESH_TASK: str = 'ratings.refresh_scores'
+
+# Highest star count; ratings go from 1 to STARS
+STARS: int = 5
+# Lowest star count counted as a positive rating by the Wilson score
+POSITIVE_STARS: int = 4
+# Normal quantile of the 95% Wilson interval
+WILSON_Z: float = 1.96
+# Store-wide average assumed before there is any rating at all
+NEUTRAL_RATING: float = 3.0
+
+# Number of ratings of each product at each star count
+HISTOGRAM = select(
+    Rating.product_id, Rating.rating, func.count()
+).group_by(Rating.product_id, Rating.rating)
+
+PRODUCTS = select(Product.id, Product.category).order_by(Product.id)
+
+# The same histogram for a single product, a search of ix_ratings_product_id_rating
+PRODUCT_HISTOGRAM = HISTOGRAM.where(Rating.product_id == bindparam('product_id'))
+
+# Number and sum of all ratings, for the store-wide average
+RATING_TOTALS = select(func.count(), func.sum(Rating.rating))
+
+PRODUCT_CATEGORY = select(Product.category).where(Product.id == bindparam('product_id'))
+
+
+def _wilson(positive: float, total: float) -> float:
+    """Lower bound of the Wilson interval of `positive` out of `total`."""
+    if total == 0:
+        return 0.0
+    z2 = WILSON_Z * WILSON_Z
+    share = positive / total
+    centre = share + z2 / (2 * total)
+    margin = WILSON_Z * math.sqrt(share * (1 - share) / total + z2 / (4 * total * total))
+    return (centre - margin) / (1 + z2 / total)
+
+
+def _prior(total: float, stars: float) -> float:
+    """Store-wide average rating, or the neutral one without any rating."""
+    return stars / total if total else NEUTRAL_RATING
+
+
+def _score_loop(product_ids: Sequence[int], histogram: Sequence[Sequence[int]],
+                weight: float, prior: Optional[float] = None) -> list[tuple]:
+    """Scores of every product, one product at a time."""
+    slot = {product_id: index for index, product_id in enumerate(product_ids)}
+    counts = [[0] * STARS for _ in product_ids]
+    for product_id, stars, count in histogram:
+        if product_id in slot:
+            counts[slot[product_id]][stars - 1] = count
+    if prior is None:
+        prior = _prior(
+            sum(sum(row) for row in counts),
+            sum(count * star for row in counts for star, count in enumerate(row, start=1))
+        )
+    scores = []
+    for row in counts:
+        total = sum(row)
+        stars = sum(count * star for star, count in enumerate(row, start=1))
+        positive = sum(row[POSITIVE_STARS - 1:])
+        scores.append((
+            total,
+            stars / total if total else None,
+            (prior * weight + stars) / (weight + total),
+            _wilson(positive, total),
+        ))
+    return scores
+
+
+def _score_arrays(product_ids: Sequence[int], histogram: Sequence[Sequence[int]],
+                  weight: float, prior: Optional[float] = None) -> list[tuple]:
+    """Scores of every product, in one vectorized pass."""
+    ids = np.asarray(product_ids, dtype=np.int64)
+    counts = np.zeros((len(ids), STARS))
+    cells = np.fromiter(
+        itertools.chain.from_iterable(histogram), dtype=np.int64, count=3 * len(histogram)
+    ).reshape(-1, 3)
+    # Product IDs are sorted, so each histogram cell finds its row by bisection
+    rows = np.searchsorted(ids, cells[:, 0]).clip(max=max(len(ids) - 1, 0))
+    known = (ids[rows] == cells[:, 0]) if len(ids) else np.zeros(len(cells), dtype=bool)
+    counts[rows[known], cells[known, 1] - 1] = cells[known, 2]
+
+    total = counts.sum(axis=1)
+    stars = counts @ np.arange(1, STARS + 1, dtype=np.float64)
+    positive = counts[:, POSITIVE_STARS - 1:].sum(axis=1)
+    if prior is None:
+        prior = _prior(total.sum(), stars.sum())
+    # Products without ratings divide by 1 and are masked afterwards
+    rated = total > 0
+    safe_total = np.where(rated, total, 1.0)
+    share = positive / safe_total
+    z2 = WILSON_Z * WILSON_Z
+    wilson = (
+        share + z2 / (2 * safe_total)
+        - WILSON_Z * np.sqrt(share * (1 - share) / safe_total + z2 / (4 * safe_total ** 2))
+    ) / (1 + z2 / safe_total)
+    average = stars / safe_total
+    bayesian = (prior * weight + stars) / (weight + total)
+    return [
+        (int(n), a if r else None, b, w if r else 0.0)
+        for n, a, b, w, r in zip(
+            total.tolist(), average.tolist(), bayesian.tolist(), wilson.tolist(), rated.tolist()
+        )
+    ]
+
+
+def compute_scores(product_ids: Sequence[int], histogram: Sequence[Sequence[int]],
+                   weight: float, prior: Optional[float] = None) -> list[tuple]:
+    """
+    Score products from `(product_id, stars, count)` histogram cells.
+
+    `product_ids` must be sorted. Returns (ratings, average, bayesian,
+    wilson) for each of them, in order; cells of other products are ignored.
+    The Bayesian prior is the average of the histogram unless given.
+    """
+    if np is None:
+        return _score_loop(product_ids, histogram, weight, prior)
+    return _score_arrays(product_ids, histogram, weight, prior)
+
+
+def refresh_scores(db: Session) -> int:
+    """Recompute the scores of every product and commit them; return the number of products."""
+    products = db.execute(PRODUCTS).all()
+    histogram = db.execute(HISTOGRAM).all()
+    scores = compute_scores(
+        [product.id for product in products], histogram, settings.RATING_PRIOR_WEIGHT
+    )
+    computed_at = datetime.now(timezone.utc)
+    rows = [
+        {
+            'product_id': product.id,
+            'category': product.category,
+            'ratings': ratings,
+            'average': average,
+            'bayesian': bayesian,
+            'wilson': wilson,
+            'computed_at': computed_at,
+        }
+        for product, (ratings, average, bayesian, wilson) in zip(products, scores)
+    ]
+    # Readers see either the previous scores or the new ones
+    db.execute(delete(ProductScore))
+    if rows:
+        db.execute(insert(ProductScore), rows)
+    db.commit()
+    return len(rows)
+
+
+def score_product(db: Session, product_id: int) -> None:
+    """Rescore a single product in the caller's transaction."""
+    category = db.scalar(PRODUCT_CATEGORY, {'product_id': product_id})
+    if category is None:
+        return
+    histogram = db.execute(PRODUCT_HISTOGRAM, {'product_id': product_id}).all()
+    total, stars = db.execute(RATING_TOTALS).one()
+    # A single product is cheaper to score without NumPy
+    (ratings, average, bayesian, wilson), = _score_loop(
+        [product_id], histogram, settings.RATING_PRIOR_WEIGHT, _prior(total, stars or 0)
+    )
+    values = {
+        'category': category,
+        'ratings': ratings,
+        'average': average,
+        'bayesian': bayesian,
+        'wilson': wilson,
+        'computed_at': datetime.now(timezone.utc),
+    }
+    db.execute(
+        sqlite_insert(ProductScore).values(product_id=product_id, **values)
+        .on_conflict_do_update(index_elements=['product_id'], set_=values)
+    )
+
+
+if __name__ == '__main__':
+    argparse.ArgumentParser(description="Recompute the rating scores of every product.").parse_args()
+    load_models()
+    with SessionLocal() as session:
+        print(f"Scored {refresh_scores(session)} products")
@@ -0,0 +1,44 @@
+"""
+Run the API under uvicorn with SUPERMAN_WORKERS server processes.
+
+Each worker is a separate process with its own event loop, connection pool,
+caches and job workers, all sharing superman.db. With more than one worker
+the database is switched to WAL mode (see SUPERMAN_SQLITE_WAL) and the
+workers keep their caches in step through api.invalidations and share
+idempotency keys through their table. Admission limits and the `/stats`
+counters are per worker; each worker enforces its share of the client rate
+limit.
+
+Usage:
+    python -m api.serve [--host 0.0.0.0] [--port 8000] [--workers 4]
+"""
+import argparse
+import os
+import uvicorn
+
+
+def main() -> None:
+    """Switch the database to the multi-process settings once, then start the workers."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, help="defaults to SUPERMAN_WORKERS, then 1")
+    args = parser.parse_args()
+    if args.workers is not None:
+        # Read by the settings of this process and of every worker it starts
+        os.environ['SUPERMAN_WORKERS'] = str(args.workers)
+
+    from api import settings
+    from api.dependencies import engine
+
+    # The first connection switches the journal mode, which needs the
+    # database to itself; do it before the workers race for it
+    with engine.connect():
+        pass
+    engine.dispose()
+
+    uvicorn.run('api.main:app', host=args.host, port=args.port, workers=settings.WORKERS)
+
+
+if __name__ == '__main__':
+    main()
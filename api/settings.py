@@ -0,0 +1,107 @@
+"""
+Runtime settings for the Superman Store API, read from environment variables.
+"""
+import os
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean flag such as `1`, `true` or `yes` from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {'1', 'true', 'yes', 'on'}
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer from the environment."""
+    value = os.getenv(name)
+    return default if value is None else int(value)
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float from the environment."""
+    value = os.getenv(name)
+    return default if value is None else float(value)
+
+
+# Vercel sets VERCEL=1 inside its serverless runtime
+SERVERLESS: bool = env_flag('VERCEL')
+
+# Import routers and configure mappers on first use instead of at import time
+LAZY_STARTUP: bool = env_flag('SUPERMAN_LAZY_STARTUP', default=SERVERLESS)
+
+# Server processes started by `python -m api.serve`; WEB_CONCURRENCY is the
+# variable most hosts and process managers set for this
+WORKERS: int = env_int('SUPERMAN_WORKERS', env_int('WEB_CONCURRENCY', 1))
+# Write-ahead logging, so readers in one process never block the writer in
+# another; on by default with several workers
+SQLITE_WAL: bool = env_flag('SUPERMAN_SQLITE_WAL', default=WORKERS > 1)
+# Seconds a connection waits for another process's write lock before failing
+BUSY_TIMEOUT: float = env_float('SUPERMAN_BUSY_TIMEOUT', 10.0)
+# Cache invalidations between workers: seconds between checks for changes
+# made by other processes, and seconds the messages are kept
+INVALIDATION_POLL_INTERVAL: float = env_float('SUPERMAN_INVALIDATION_POLL_INTERVAL', 0.1)
+INVALIDATION_RETENTION: float = env_float('SUPERMAN_INVALIDATION_RETENTION', 60.0)
+
+# Admission control: concurrent requests and queued requests per class
+READ_CONCURRENCY: int = env_int('SUPERMAN_READ_CONCURRENCY', 64)
+READ_QUEUE_SIZE: int = env_int('SUPERMAN_READ_QUEUE_SIZE', 256)
+WRITE_CONCURRENCY: int = env_int('SUPERMAN_WRITE_CONCURRENCY', 4)
+WRITE_QUEUE_SIZE: int = env_int('SUPERMAN_WRITE_QUEUE_SIZE', 32)
+# Seconds a request may wait in the queue before it is shed
+QUEUE_TIMEOUT: float = env_float('SUPERMAN_QUEUE_TIMEOUT', 5.0)
+# Seconds the queries of a GET request may run once admitted; 0 disables
+QUERY_TIMEOUT: float = env_float('SUPERMAN_QUERY_TIMEOUT', 10.0)
+# Per-client token bucket; a rate of 0 disables rate limiting
+CLIENT_RATE: float = env_float('SUPERMAN_CLIENT_RATE', 0.0)
+CLIENT_BURST: int = env_int('SUPERMAN_CLIENT_BURST', 20)
+
+# Seconds a response is kept for replay under its Idempotency-Key
+IDEMPOTENCY_TTL: float = env_float('SUPERMAN_IDEMPOTENCY_TTL', 24 * 60 * 60)
+IDEMPOTENCY_MAX_KEYS: int = env_int('SUPERMAN_IDEMPOTENCY_MAX_KEYS', 100_000)
+
+# Background jobs: workers, in-memory queue bound and retry policy
+JOB_WORKERS: int = env_int('SUPERMAN_JOB_WORKERS', 2)
+JOB_QUEUE_SIZE: int = env_int('SUPERMAN_JOB_QUEUE_SIZE', 1000)
+JOB_MAX_ATTEMPTS: int = env_int('SUPERMAN_JOB_MAX_ATTEMPTS', 5)
+# Seconds before the first retry, doubled for every further attempt
+JOB_BACKOFF: float = env_float('SUPERMAN_JOB_BACKOFF', 1.0)
+# Seconds between scans of the jobs table for due jobs
+JOB_POLL_INTERVAL: float = env_float('SUPERMAN_JOB_POLL_INTERVAL', 5.0)
+# Seconds a worker may hold a job before it is considered abandoned
+JOB_LEASE: float = env_float('SUPERMAN_JOB_LEASE', 300.0)
+# Seconds finished jobs are kept before they are pruned
+JOB_RETENTION: float = env_float('SUPERMAN_JOB_RETENTION', 24 * 60 * 60)
+
+# Serve product reads from an in-memory snapshot of the catalog
+CATALOG_SNAPSHOT: bool = env_flag('SUPERMAN_CATALOG_SNAPSHOT')
+# Seconds between checks for product changes made by other processes
+CATALOG_CHECK_INTERVAL: float = env_float('SUPERMAN_CATALOG_CHECK_INTERVAL', 0.5)
+
+# Archive of old purchases, attached to every connection as `archive`
+ARCHIVE_PATH: str = os.getenv('SUPERMAN_ARCHIVE_PATH', './superman_archive.db')
+# Purchases older than this many days are moved to the archive
+ARCHIVE_AFTER_DAYS: int = env_int('SUPERMAN_ARCHIVE_AFTER_DAYS', 90)
+ARCHIVE_BATCH_SIZE: int = env_int('SUPERMAN_ARCHIVE_BATCH_SIZE', 1000)
+
+# Comment feeds: rows per page, and products whose first page is cached
+FEED_PAGE_SIZE: int = env_int('SUPERMAN_FEED_PAGE_SIZE', 20)
+FEED_CACHE_PRODUCTS: int = env_int('SUPERMAN_FEED_CACHE_PRODUCTS', 1000)
+# Seconds a cached first page is served before it is reloaded
+FEED_CACHE_TTL: float = env_float('SUPERMAN_FEED_CACHE_TTL', 60.0)
+
+# Profiling: requests carrying `X-Profile: <token>` are profiled, as is a
+# random share of all requests; an empty token disables both the header and
+# the endpoints serving the captures
+PROFILE_TOKEN: str = os.getenv('SUPERMAN_PROFILE_TOKEN', '')
+PROFILE_SAMPLE_RATE: float = env_float('SUPERMAN_PROFILE_SAMPLE_RATE', 0.0)
+# Seconds between stack samples, and captures kept for the endpoints
+PROFILE_INTERVAL: float = env_float('SUPERMAN_PROFILE_INTERVAL', 0.001)
+PROFILE_CAPTURES: int = env_int('SUPERMAN_PROFILE_CAPTURES', 50)
+
+# Ratings' worth of the store-wide average added to every product's own
+# when ranking products by Bayesian average
+RATING_PRIOR_WEIGHT: float = env_float('SUPERMAN_RATING_PRIOR_WEIGHT', 10.0)
+
+# Carrier tracking events applied per transaction by the ingestion endpoint
+TRACKING_BATCH_SIZE: int = env_int('SUPERMAN_TRACKING_BATCH_SIZE', 500)
@@ -0,0 +1,143 @@
+"""
+Router and model loading for the FastAPI application.
+
+In the default mode every router is included when `api.main` is imported and
+the SQLAlchemy mappers and the OpenAPI schema are built on startup, before the
+first request. In lazy mode (serverless cold starts) a router module is only
+imported when the first request for its prefix arrives, the middlewares
+are imported on the first request, and mapper configuration and OpenAPI
+generation are left to their first use.
+"""
+import importlib
+import threading
+from typing import Optional
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+# Router modules in api/routers, keyed by their URL prefix
+ROUTERS: tuple[str, ...] = (
+    'comments',
+    'customers',
+    'deliveries',
+    'products',
+    'purchases',
+    'ratings',
+    'reports',
+    'stats',
+)
+
+# Model modules in api/models. Relationships refer to each other by class
+# name, so all of them must be registered before any mapper is configured.
+MODELS: tuple[str, ...] = (
+    'comment',
+    'customer',
+    'delivery',
+    'idempotency',
+    'invalidation',
+    'job',
+    'product',
+    'purchase',
+    'rating',
+    'revenue',
+    'score',
+)
+
+_lock = threading.Lock()
+
+
+def load_models() -> None:
+    """Import every model module so that the mapper registry is complete."""
+    for name in MODELS:
+        importlib.import_module(f'api.models.{name}')
+
+
+def include_router(app: FastAPI, name: str) -> None:
+    """Import a router module and include it in the app, at most once."""
+    if not hasattr(app.state, 'loaded_routers'):
+        app.state.loaded_routers = set()
+    loaded: set[str] = app.state.loaded_routers
+    if name in loaded:
+        return
+    with _lock:
+        if name in loaded:
+            return
+        load_models()
+        module = importlib.import_module(f'api.routers.{name}')
+        app.include_router(module.router)
+        loaded.add(name)
+
+
+def include_all(app: FastAPI) -> None:
+    """Include every router in the app."""
+    for name in ROUTERS:
+        include_router(app, name)
+
+
+def warm_up(app: FastAPI) -> None:
+    """Build the mappers and the OpenAPI schema ahead of the first request."""
+    from sqlalchemy.orm import configure_mappers
+
+    include_all(app)
+    configure_mappers()
+    app.openapi()
+
+
+def add_middleware(app: FastAPI, path: str, lazy: bool) -> None:
+    """Add a middleware given as `module.Class` of the api package, lazily if asked."""
+    if lazy:
+        app.add_middleware(LazyMiddleware, path=path)
+    else:
+        app.add_middleware(_middleware_class(path))
+
+
+def _middleware_class(path: str) -> type:
+    """Import a middleware class given as `module.Class` of the api package."""
+    module, _, name = path.rpartition('.')
+    return getattr(importlib.import_module(f'api.{module}'), name)
+
+
+class LazyMiddleware:
+    """
+    ASGI middleware that imports and builds another middleware on the first request.
+
+    Lifespan events skip the wrapped middleware, so starting the app does
+    not import it either.
+    """
+
+    def __init__(self, app: ASGIApp, path: str):
+        self.app = app
+        self.path = path
+        self.middleware: Optional[ASGIApp] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] == 'lifespan':
+            await self.app(scope, receive, send)
+            return
+        if self.middleware is None:
+            self.middleware = _middleware_class(self.path)(self.app)
+        await self.middleware(scope, receive, send)
+
+
+class LazyRouterMiddleware:
+    """
+    ASGI middleware that includes a router the first time its prefix is hit.
+
+    Starlette looks up `app.router.routes` on every request, so routes added
+    here are matched by the same request that triggered the import.
+    """
+
+    def __init__(self, app: ASGIApp, target: FastAPI):
+        self.app = app
+        self.target = target
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] in ('http', 'websocket'):
+            path: str = scope['path']
+            prefix = path.lstrip('/').split('/', 1)[0]
+            if prefix in ROUTERS:
+                include_router(self.target, prefix)
+            elif path == self.target.openapi_url:
+                # The schema has to describe every route
+                include_all(self.target)
+        await self.app(scope, receive, send)
@@ -0,0 +1,33 @@
+"""
+Background tasks run by the job queue in api.jobs.
+
+Each handler receives its own session and the job's JSON payload, and must
+be safe to run more than once: a job is retried when its handler raises and
+may run again if its worker dies before recording the outcome.
+"""
+from datetime import datetime
+from typing import Any
+from sqlalchemy.orm import Session
+from api.archive import archive_purchases
+from api.jobs import task
+from api.rollups import rebuild_rollups
+from api.scores import REFRESH_TASK, refresh_scores
+
+
+@task('purchases.archive')
+def archive_old_purchases(db: Session, payload: dict[str, Any]) -> None:
+    """Move purchases older than the hot window to the archive."""
+    archive_purchases(db)
+
+
+@task('reports.rebuild')
+def rebuild_revenue_rollups(db: Session, payload: dict[str, Any]) -> None:
+    """Recompute the revenue rollups, from scratch or from a given day."""
+    since = payload.get('since')
+    rebuild_rollups(db, None if since is None else datetime.fromisoformat(since))
+
+
+@task(REFRESH_TASK)
+def refresh_product_scores(db: Session, payload: dict[str, Any]) -> None:
+    """Recompute the rating scores used to rank products."""
+    refresh_scores(db)
@@ -0,0 +1,106 @@
+"""
+Ingestion of carrier tracking events.
+
+Carriers identify a delivery by `(carrier, tracking_number)`. Events are
+applied in batches of TRACKING_BATCH_SIZE, each batch in one transaction:
+one indexed query loads every delivery the batch refers to, the events are
+replayed in the order they occurred through `Delivery.update_status`, and a
+single flush writes the changes. Status transitions are published to the
+delivery event streams on commit, as for manual updates.
+
+Ingestion is idempotent. Each delivery remembers when its latest applied
+event occurred (`last_event_at`); events older than that, or repeating the
+current status at that same moment, are skipped as stale, so carriers can
+redeliver a batch, or deliver it out of order, without effect.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Optional, Sequence
+from pydantic import BaseModel
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, lazyload, load_only, selectinload
+from api.archive import as_utc
+from api.dependencies import SessionLocal
+from api.models.delivery import Delivery, DeliveryStatus
+from api.models.purchase import Purchase
+
+# Outcomes counted for every event
+OUTCOMES: tuple[str, ...] = ('applied', 'duplicates', 'stale', 'unknown', 'rejected')
+
+
+class TrackingEvent(BaseModel):
+    """Create the Pydantic model of a carrier tracking event."""
+    carrier: str
+    tracking_number: str
+    status: DeliveryStatus
+    occurred_at: datetime
+    notes: Optional[str] = None
+
+
+def _load_deliveries(db: Session, events: Sequence[TrackingEvent]) -> dict[tuple[str, str], list[Delivery]]:
+    """Deliveries referred to by a batch of events, keyed by carrier and tracking number."""
+    numbers: dict[str, set[str]] = defaultdict(set)
+    for tracking_event in events:
+        numbers[tracking_event.carrier].add(tracking_event.tracking_number)
+    # One equality-plus-IN term per carrier, so each is a search of
+    # ix_deliveries_carrier_tracking_number (SQLite scans for a row-value IN)
+    statement = select(Delivery).where(or_(*(
+        and_(Delivery.carrier == carrier, Delivery.tracking_number.in_(tracking_numbers))
+        for carrier, tracking_numbers in numbers.items()
+    ))).options(
+        # Status events only need the customers of each delivery
+        selectinload(Delivery.purchases).options(load_only(Purchase.customer_id), lazyload('*'))
+    )
+    deliveries: dict[tuple[str, str], list[Delivery]] = defaultdict(list)
+    for delivery in db.scalars(statement):
+        deliveries[delivery.carrier, delivery.tracking_number].append(delivery)
+    return deliveries
+
+
+def _apply(delivery: Delivery, tracking_event: TrackingEvent, at: datetime) -> str:
+    """Apply an event to a delivery unless it is stale; return the outcome."""
+    last = None if delivery.last_event_at is None else as_utc(delivery.last_event_at)
+    if last is not None and (at < last or (at == last and tracking_event.status == delivery.status)):
+        return 'stale'
+    if (
+        tracking_event.status == DeliveryStatus.DELIVERED
+        and delivery.shipping_date is not None
+        and at < as_utc(delivery.shipping_date)
+    ):
+        # Would break check_shipping_before_delivery and fail the whole batch
+        return 'rejected'
+    if tracking_event.status != delivery.status or tracking_event.notes:
+        delivery.update_status(tracking_event.status, tracking_event.notes, at)
+    delivery.last_event_at = at
+    return 'applied'
+
+
+def apply_events(db: Session, events: Sequence[TrackingEvent]) -> Counter:
+    """Apply a batch of events in the caller's transaction and count their outcomes."""
+    counts: Counter = Counter({outcome: 0 for outcome in OUTCOMES})
+    if not events:
+        return counts
+    deliveries = _load_deliveries(db, events)
+    seen: set[tuple[str, str, DeliveryStatus, datetime]] = set()
+    for tracking_event in sorted(events, key=lambda e: as_utc(e.occurred_at)):
+        at = as_utc(tracking_event.occurred_at)
+        key = (tracking_event.carrier, tracking_event.tracking_number, tracking_event.status, at)
+        if key in seen:
+            counts['duplicates'] += 1
+            continue
+        seen.add(key)
+        matches = deliveries.get(key[:2])
+        if not matches:
+            counts['unknown'] += 1
+            continue
+        outcomes = {_apply(delivery, tracking_event, at) for delivery in matches}
+        counts[next(o for o in OUTCOMES if o in outcomes)] += 1
+    return counts
+
+
+def ingest_batch(events: Sequence[TrackingEvent]) -> Counter:
+    """Apply a batch of events in its own session and transaction."""
+    with SessionLocal() as db:
+        counts = apply_events(db, events)
+        db.commit()
+        return counts
@@ -0,0 +1,37 @@
+"""
+Single-statement writes built on RETURNING.
+
+`insert_returning` and `update_returning` send one `INSERT ... RETURNING` or
+`UPDATE ... RETURNING` statement and hand back the written row, with the
+Python-side defaults and `onupdate` values SQLAlchemy filled in. There is
+no SELECT before an update and no `refresh()` after a commit. An update
+that matches no row returns None, which routers turn into a 404.
+
+The rows are plain `Row` objects, detached from the session, so they stay
+readable after the commit. Mapper events such as the customer search
+columns do not fire for these statements: the caller must pass every
+derived column in `values`.
+"""
+from typing import Any, Mapping, Optional
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+
+def insert_returning(db: Session, model: Any, values: Mapping[str, Any], *extra: Any) -> Row:
+    """Insert a row and return every column of it, plus any `extra` expressions."""
+    statement = insert(model).values(**values).returning(*model.__table__.columns, *extra)
+    return db.execute(statement).one()
+
+
+def update_returning(db: Session, model: Any, ident: int, values: Mapping[str, Any],
+                     *extra: Any) -> Optional[Row]:
+    """Update a row by ID and return every column of it, or None if there is no such row."""
+    if not values:
+        # Nothing to set: read the row instead of bumping updated_at
+        statement = select(*model.__table__.columns, *extra).where(model.id == ident)
+    else:
+        statement = update(model).where(model.id == ident).values(**values).returning(
+            *model.__table__.columns, *extra
+        )
+    return db.execute(statement).first()
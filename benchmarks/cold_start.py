@@ -0,0 +1,126 @@
+"""
+Cold-start benchmark for the Superman Store API.
+
+Starts a fresh interpreter for every run and measures how long it takes to
+import `api.main` and to answer the first request, once in the default
+(eager) mode and once with SUPERMAN_LAZY_STARTUP=1. The runs share a
+scratch database built by the migrations and holding one product.
+
+Usage:
+    python benchmarks/cold_start.py [--runs 10] [--path /products/1]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Code run once in a child interpreter to build the scratch database
+SEED: str = """
+import os, sys
+from alembic import command
+from alembic.config import Config
+config = Config(os.path.join(sys.argv[1], 'alembic.ini'))
+config.set_main_option('script_location', os.path.join(sys.argv[1], 'alembic'))
+config.set_main_option('sqlalchemy.url', os.environ['SUPERMAN_DATABASE_URL'])
+command.upgrade(config, 'head')
+from api.archive import ensure_archive
+from api.dependencies import SessionLocal
+from api.startup import load_models
+load_models()
+ensure_archive()
+from api.models.product import Product
+with SessionLocal() as db:
+    db.add(Product(
+        name='Cape', price=10.5, image_url='https://example.com/cape.png',
+        category='Clothing', description='Red', quantity=3, in_stock=True
+    ))
+    db.commit()
+"""
+
+# Code run in each child interpreter; prints its timings as JSON
+PROBE: str = """
+import json, sys, time
+start = time.perf_counter()
+import api.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(api.main.app) as client:
+    # Entering the client runs the startup hooks, as a server would
+    ready = time.perf_counter()
+    status = client.get(sys.argv[1]).status_code
+    done = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "import_ms": (imported - start) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (done - ready) * 1000,
+}))
+"""
+
+
+def scratch_env(directory: str) -> dict[str, str]:
+    """Environment pointing the app at a scratch database in a directory."""
+    return dict(
+        os.environ, PYTHONPATH=ROOT,
+        SUPERMAN_DATABASE_URL=f"sqlite:///{os.path.join(directory, 'superman.db')}",
+        SUPERMAN_ARCHIVE_PATH=os.path.join(directory, 'superman_archive.db'),
+    )
+
+
+def seed(directory: str) -> None:
+    """Build the scratch database, so the first request hits a real row."""
+    subprocess.run(
+        [sys.executable, '-c', SEED, ROOT],
+        cwd=directory, env=scratch_env(directory), check=True, capture_output=True
+    )
+
+
+def run_once(directory: str, path: str, lazy: bool) -> dict[str, float]:
+    """Run one cold start in a clean interpreter and return its timings."""
+    env = dict(scratch_env(directory), SUPERMAN_LAZY_STARTUP='1' if lazy else '0')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, path],
+        cwd=directory, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    if timings['status'] >= 500:
+        raise SystemExit(f"GET {path} failed with {timings['status']}")
+    return timings
+
+
+def report(directory: str, path: str, runs: int, lazy: bool) -> None:
+    """Print the median cold-start timings of one mode."""
+    timings = [run_once(directory, path, lazy) for _ in range(runs)]
+    import_ms = statistics.median(run['import_ms'] for run in timings)
+    startup_ms = statistics.median(run['startup_ms'] for run in timings)
+    request_ms = statistics.median(run['first_request_ms'] for run in timings)
+    total_ms = import_ms + startup_ms + request_ms
+    print(
+        f"{'lazy' if lazy else 'eager':>5}: import {import_ms:7.1f} ms, "
+        f"startup {startup_ms:7.1f} ms, first request {request_ms:7.1f} ms, "
+        f"total {total_ms:7.1f} ms"
+    )
+
+
+def main() -> None:
+    """Print the median cold-start timings of each mode."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/products/1')
+    args = parser.parse_args()
+
+    # Run from a scratch directory so the benchmark never touches superman.db
+    with tempfile.TemporaryDirectory() as directory:
+        seed(directory)
+        for lazy in (False, True):
+            report(directory, args.path, args.runs, lazy)
+
+
+if __name__ == '__main__':
+    main()
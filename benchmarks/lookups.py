@@ -0,0 +1,100 @@
+"""
+Microbenchmark of the prepared hot-path lookups in api.lookups.
+
+Seeds an in-memory SQLite database and compares the CPU time per call of the
+original `db.query(Model).filter(...)` chains with the prepared statements.
+
+Usage:
+    python benchmarks/lookups.py [--calls 20000] [--rows 1000]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from api.dependencies import Base
+from api import lookups
+from api.models.customer import Customer
+from api.models.product import Product
+from api.models.purchase import Purchase
+from api.startup import load_models
+
+
+def seed(db: Session, rows: int) -> None:
+    """Insert `rows` products and customers and a few purchases per customer."""
+    for i in range(1, rows + 1):
+        db.add(Product(
+            name=f"Product {i}", price=9.99, image_url="https://example.com/p.png",
+            category="Comics", description="x" * 500, quantity=10, in_stock=True
+        ))
+        db.add(Customer(
+            firstname="Clark", lastname="Kent", email=f"clark{i}@dailyplanet.com",
+            phone="5550100000", delivery_address="Metropolis", billing_address="Metropolis"
+        ))
+    db.flush()
+    for i in range(1, rows + 1):
+        for _ in range(3):
+            db.add(Purchase(customer_id=i, product_id=i, quantity=1, unit_price=9.99))
+    db.commit()
+
+
+def cpu_per_call(db: Session, calls: int, rows: int, lookup: Callable[[Session, int], object]) -> float:
+    """Return the CPU microseconds spent per call of `lookup`."""
+    start = time.process_time()
+    for i in range(calls):
+        lookup(db, i % rows + 1)
+        # Keep the identity map from turning the loop into dictionary hits
+        db.expunge_all()
+    return (time.process_time() - start) / calls * 1_000_000
+
+
+CASES: dict[str, tuple[Callable, Callable]] = {
+    'product by id': (
+        lambda db, i: db.query(Product).filter(Product.id == i).first(),
+        lookups.product_by_id,
+    ),
+    'customer by id': (
+        lambda db, i: db.query(Customer).filter(Customer.id == i).first(),
+        lookups.customer_by_id,
+    ),
+    'purchases by customer': (
+        lambda db, i: db.query(Purchase).filter(Purchase.customer_id == i).all(),
+        lookups.purchases_by_customer,
+    ),
+}
+
+
+def main() -> None:
+    """Print the CPU time per call of each lookup, before and after."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=20_000)
+    parser.add_argument('--rows', type=int, default=1_000)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        'sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool
+    )
+    load_models()
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed(db, args.rows)
+        for name, (query, prepared) in CASES.items():
+            # Warm both paths so compilation caches are populated
+            cpu_per_call(db, 100, args.rows, query)
+            cpu_per_call(db, 100, args.rows, prepared)
+            before = cpu_per_call(db, args.calls, args.rows, query)
+            after = cpu_per_call(db, args.calls, args.rows, prepared)
+            print(
+                f"{name:>22}: query {before:7.1f} us, prepared {after:7.1f} us, "
+                f"saved {before - after:6.1f} us/call ({(1 - after / before) * 100:4.1f}%)"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of the product score refresh in api.scores.
+
+Seeds an in-memory SQLite database with products and ratings and times a
+full `refresh_scores`, then the histogram query and the scoring on their
+own, with NumPy and with the plain loop used when it is not installed.
+
+Usage:
+    python benchmarks/scores.py [--products 20000] [--ratings 2000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from api.dependencies import Base
+from api import scores, settings
+from api.models.product import Product
+from api.models.rating import Rating
+from api.startup import load_models
+
+
+def seed(db: Session, products: int, ratings: int) -> None:
+    """Insert `products` products and `ratings` ratings spread unevenly over them."""
+    db.execute(insert(Product), [
+        {
+            'id': i, 'name': f"Product {i}", 'price': 9.99,
+            'image_url': "https://example.com/p.png", 'category': f"Category {i % 10}",
+            'description': "A product", 'quantity': 10, 'in_stock': True,
+        }
+        for i in range(1, products + 1)
+    ])
+    generator = random.Random(42)
+    # A few popular products get most of the ratings, as in a real catalog
+    weights = [1 / rank for rank in range(1, products + 1)]
+    picks = generator.choices(range(1, products + 1), weights=weights, k=ratings)
+    seen: dict[int, int] = {}
+    rows = []
+    for product_id in picks:
+        # One rating per customer and product
+        seen[product_id] = customer_id = seen.get(product_id, 0) + 1
+        rows.append({
+            'rating': generator.choice((1, 2, 3, 4, 4, 5, 5, 5)),
+            'customer_id': customer_id,
+            'product_id': product_id,
+        })
+    db.execute(insert(Rating), rows)
+    db.commit()
+
+
+def timed(action) -> tuple[float, object]:
+    """Run `action` and return its wall time in milliseconds and its result."""
+    start = time.perf_counter()
+    result = action()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main() -> None:
+    """Print the timings of a score refresh and of its parts."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=20_000)
+    parser.add_argument('--ratings', type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        'sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool
+    )
+    load_models()
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed(db, args.products, args.ratings)
+        print(f"{args.products} products, {args.ratings} ratings, NumPy "
+              f"{'installed' if scores.np is not None else 'not installed'}")
+
+        refresh_ms, count = timed(lambda: scores.refresh_scores(db))
+        print(f"{'full refresh':>16}: {refresh_ms:8.1f} ms ({count} products scored)")
+
+        product_ids = [row.id for row in db.execute(scores.PRODUCTS)]
+        histogram_ms, histogram = timed(lambda: db.execute(scores.HISTOGRAM).all())
+        print(f"{'histogram query':>16}: {histogram_ms:8.1f} ms ({len(histogram)} cells)")
+
+        weight = settings.RATING_PRIOR_WEIGHT
+        if scores.np is not None:
+            vector_ms, _ = timed(lambda: scores._score_arrays(product_ids, histogram, weight))
+            print(f"{'scoring, NumPy':>16}: {vector_ms:8.1f} ms")
+        loop_ms, _ = timed(lambda: scores._score_loop(product_ids, histogram, weight))
+        print(f"{'scoring, loop':>16}: {loop_ms:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
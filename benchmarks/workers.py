@@ -0,0 +1,191 @@
+"""
+Throughput benchmark of the multi-worker server mode.
+
+Seeds a scratch database, then for each worker count starts
+`python -m api.serve --workers N` on it and drives it with several client
+processes for a fixed time, with a mix of product, feed and purchase reads
+and a share of comment writes. Prints requests per second, latency
+percentiles and the speedup over the first worker count.
+
+Throughput only scales up to the number of cores left after the clients;
+run it on a machine with at least N + --clients cores.
+
+Usage:
+    python benchmarks/workers.py [--workers 1 2 4] [--duration 10] [--clients 2]
+        [--concurrency 32] [--writes 0.05]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH: str = tempfile.mkdtemp(prefix='superman-workers-')
+
+# Point the app at scratch databases before any api module is imported
+os.environ['SUPERMAN_DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH, 'superman.db')}"
+os.environ['SUPERMAN_ARCHIVE_PATH'] = os.path.join(SCRATCH, 'superman_archive.db')
+sys.path.insert(0, ROOT)
+
+import httpx
+
+# Products, customers and deliveries seeded, and the rows each of them gets
+ROWS: int = 200
+
+
+def seed() -> None:
+    """Create the schema and enough rows for every request of the mix to find data."""
+    from api.archive import ensure_archive
+    from api.dependencies import Base, SessionLocal, engine
+    from api.startup import load_models
+    load_models()
+    from api.models.comment import Comment
+    from api.models.customer import Customer
+    from api.models.delivery import Delivery, DeliveryType
+    from api.models.product import Product
+    from api.models.purchase import Purchase
+
+    Base.metadata.create_all(engine)
+    ensure_archive()
+    with SessionLocal() as db:
+        db.add(Delivery(type=DeliveryType.STANDARD, min_days=2, max_days=5))
+        for i in range(1, ROWS + 1):
+            db.add(Product(
+                name=f"Product {i}", price=5.0 + i, image_url="https://example.com/p.png",
+                category="Comics", description="A product", quantity=10, in_stock=True
+            ))
+            db.add(Customer(
+                firstname="Clark", lastname="Kent", email=f"clark{i}@dailyplanet.com",
+                phone=f"555-010-{i:04d}", delivery_address="Metropolis",
+                billing_address="Metropolis"
+            ))
+        db.flush()
+        for i in range(1, ROWS + 1):
+            for j in range(5):
+                db.add(Comment(content="Great comic", customer_id=i, product_id=(i + j) % ROWS + 1))
+                db.add(Purchase(
+                    customer_id=i, product_id=(i + j) % ROWS + 1, delivery_id=1, quantity=1,
+                    unit_price=9.99
+                ))
+        db.commit()
+    engine.dispose()
+
+
+def pick(generator: random.Random, writes: float) -> tuple[str, str, dict]:
+    """Method, path and JSON body of one request of the mix."""
+    i = generator.randint(1, ROWS)
+    if generator.random() < writes:
+        return 'POST', '/comments/', {'comment': "Still great", 'customer_id': i, 'product_id': i}
+    return generator.choice((
+        ('GET', f'/products/{i}', None),
+        ('GET', f'/comments/products/{i}/feed', None),
+        ('GET', f'/purchases/customers/{i}', None),
+    ))
+
+
+async def drive(url: str, duration: float, concurrency: int, writes: float,
+                seed_value: int) -> tuple[int, int, list[float]]:
+    """Send requests from `concurrency` tasks for `duration` seconds."""
+    generator = random.Random(seed_value)
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async def loop() -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                method, path, body = pick(generator, writes)
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    ok = response.status_code < 500
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return len(latencies), errors, latencies
+
+
+def client(arguments: tuple) -> tuple[int, int, list[float]]:
+    """Entry point of a client process."""
+    return asyncio.run(drive(*arguments))
+
+
+def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    """Poll the server until it answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+def run(workers: int, args: argparse.Namespace) -> dict[str, float]:
+    """Start a server with `workers` processes, load it and return its throughput."""
+    port = args.port + workers
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'api.serve', '--port', str(port), '--workers', str(workers)],
+        # WAL in every run, so that only the number of workers changes
+        cwd=SCRATCH, env=dict(os.environ, PYTHONPATH=ROOT, SUPERMAN_SQLITE_WAL='1'),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_ready(url)
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(client, [
+                (url, args.duration, args.concurrency, args.writes, workers * 100 + n)
+                for n in range(args.clients)
+            ])
+    finally:
+        server.terminate()
+        server.wait()
+    requests = sum(count for count, _, _ in results)
+    latencies = sorted(latency for _, _, values in results for latency in values)
+    return {
+        'rps': requests / args.duration,
+        'errors': sum(errors for _, errors, _ in results),
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+    }
+
+
+def main() -> None:
+    """Print the throughput of each worker count."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--clients', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--writes', type=float, default=0.05)
+    parser.add_argument('--port', type=int, default=8700)
+    args = parser.parse_args()
+
+    seed()
+    print(f"{os.cpu_count()} cores, {args.clients} client processes x {args.concurrency} "
+          f"connections, {args.writes:.0%} writes, {args.duration:.0f} s per run")
+    baseline = None
+    for workers in args.workers:
+        result = run(workers, args)
+        baseline = baseline or result['rps']
+        print(
+            f"{workers:>2} worker{'s' if workers > 1 else ' '}: {result['rps']:8.1f} req/s, "
+            f"p50 {result['p50_ms']:6.1f} ms, p99 {result['p99_ms']:7.1f} ms, "
+            f"errors {result['errors']:5d}, speedup x{result['rps'] / baseline:4.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Shared fixtures: a scratch database built by the Alembic migrations.
+
+The app reads its database settings when first imported, so they are
+pointed at a temporary directory here, before any test module imports it.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH: str = tempfile.mkdtemp(prefix='superman-tests-')
+
+os.environ['SUPERMAN_DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH, 'superman.db')}"
+os.environ['SUPERMAN_ARCHIVE_PATH'] = os.path.join(SCRATCH, 'superman_archive.db')
+os.environ['SUPERMAN_CATALOG_SNAPSHOT'] = '0'
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def migrated() -> None:
+    """Create the schema with `alembic upgrade head`, as deployments do."""
+    from alembic import command
+    from alembic.config import Config
+    from api.archive import ensure_archive
+    from api.startup import load_models
+
+    config = Config(os.path.join(ROOT, 'alembic.ini'))
+    config.set_main_option('script_location', os.path.join(ROOT, 'alembic'))
+    config.set_main_option('sqlalchemy.url', os.environ['SUPERMAN_DATABASE_URL'])
+    command.upgrade(config, 'head')
+    load_models()
+    # The archive is not part of the migrations (see api.archive)
+    ensure_archive()
@@ -0,0 +1,21 @@
+"""
+Tests of which requests bypass admission control.
+"""
+import pytest
+
+from api.admission import exempt
+
+
+@pytest.mark.parametrize('method, path, expected', [
+    ('GET', '/stats/admission', True),
+    ('GET', '/deliveries/7/events', True),
+    ('GET', '/deliveries/customers/7/events', True),
+    ('POST', '/deliveries/7/events', False),
+    ('DELETE', '/deliveries/customers/7/events', False),
+    ('GET', '/products/7/events', False),
+    ('GET', '/deliveries/7/events/extra', False),
+    ('GET', '/deliveries/', False),
+])
+def test_exempt_requests(method: str, path: str, expected: bool) -> None:
+    """Only stats and GETs of the two delivery event streams skip the gates."""
+    assert exempt({'type': 'http', 'method': method, 'path': path}) is expected
@@ -0,0 +1,42 @@
+"""
+Tests of the in-memory catalog snapshot.
+"""
+import random
+
+from api.catalog import CatalogSnapshot
+
+
+def _product(product_id: int, rng: random.Random) -> dict:
+    """A product row with a random category and price."""
+    return {
+        'id': product_id,
+        'category': rng.choice(["Comics", "Clothing", "Toys"]),
+        'price': rng.choice([5.0, 7.5, 10.0, 12.5]),
+    }
+
+
+def _indexes(snapshot: CatalogSnapshot) -> tuple:
+    """Everything a snapshot serves, as plain values."""
+    return (
+        [dict(row) for row in snapshot.products],
+        {product_id: dict(row) for product_id, row in snapshot.by_id.items()},
+        {category: [dict(row) for row in rows] for category, rows in snapshot.by_category.items()},
+        [dict(row) for row in snapshot.by_price],
+    )
+
+
+def test_patched_snapshots_match_a_rebuild() -> None:
+    """Adding, changing and removing products one at a time keeps every index in order."""
+    rng = random.Random(20261019)
+    rows = {product_id: _product(product_id, rng) for product_id in range(1, 30)}
+    snapshot = CatalogSnapshot.build(rows.values())
+    for _ in range(300):
+        product_id = rng.randint(1, 40)
+        if product_id in rows and rng.random() < 0.3:
+            del rows[product_id]
+            snapshot = snapshot.without_product(product_id)
+        else:
+            rows[product_id] = _product(product_id, rng)
+            snapshot = snapshot.with_product(rows[product_id])
+        assert _indexes(snapshot) == _indexes(CatalogSnapshot.build(rows.values()))
+    assert snapshot.without_product(1000) is snapshot
@@ -0,0 +1,69 @@
+"""
+Tests of how writes rejected by validation or by a database constraint are reported.
+"""
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+
+CUSTOMER: dict[str, str] = {
+    'firstname': "Bruce", 'lastname': "Wayne", 'email': "bruce@wayne.com",
+    'phone': "555-010-0007", 'delivery_address': "Gotham", 'billing_address': "Gotham",
+}
+
+
+@pytest.fixture(scope='module')
+def client(migrated) -> Iterator[TestClient]:
+    """A client of the app with a customer, a product and a delivery to refer to."""
+    with TestClient(app) as test_client:
+        test_client.post('/customers/', json=CUSTOMER)
+        test_client.post('/products/', json={
+            'name': "Batarang", 'price': 4.5, 'image_url': "https://example.com/b.png",
+            'category': "Toys", 'description': "A toy", 'quantity': 5, 'in_stock': True,
+        })
+        test_client.post('/deliveries/', json={'type': 'STANDARD', 'min_days': 1, 'max_days': 2})
+        yield test_client
+
+
+def _ids(client: TestClient) -> tuple[int, int, int]:
+    """IDs of the test customer, product and delivery."""
+    customer = next(c for c in client.get('/customers/', params={'limit': 1000}).json()
+                    if c['email'] == CUSTOMER['email'])
+    product = next(p for p in client.get('/products/', params={'limit': 1000}).json()
+                   if p['name'] == "Batarang")
+    delivery = client.get('/deliveries/', params={'limit': 1000}).json()[-1]
+    return customer['id'], product['id'], delivery['id']
+
+
+def test_duplicate_is_a_conflict(client: TestClient) -> None:
+    """A second customer with the same email conflicts with the first."""
+    response = client.post('/customers/', json=CUSTOMER)
+    assert response.status_code == 409
+
+
+def test_short_values_are_invalid(client: TestClient) -> None:
+    """Values the check constraints would reject fail validation instead."""
+    customer_id, product_id, _ = _ids(client)
+    comment = client.post('/comments/', json={
+        'comment': "ok", 'customer_id': customer_id, 'product_id': product_id,
+    })
+    phone = client.post('/customers/', json={**CUSTOMER, 'email': "alfred@wayne.com", 'phone': "555"})
+    assert (comment.status_code, phone.status_code) == (422, 422)
+
+
+def test_constraint_failures_are_invalid(client: TestClient) -> None:
+    """A value only the database checks is invalid input, not a conflict."""
+    response = client.post('/deliveries/', json={'type': 'STANDARD', 'min_days': 3, 'max_days': 1})
+    assert response.status_code == 422
+    assert 'check_max_days_greater' in response.json()['detail']
+
+
+def test_missing_references_are_invalid(client: TestClient) -> None:
+    """References to rows that do not exist are rejected, not reported as conflicts."""
+    customer_id, product_id, delivery_id = _ids(client)
+    purchase = {'customer_id': customer_id, 'product_id': product_id, 'quantity': 1}
+    assert client.post('/purchases/', json={**purchase, 'delivery_id': 999_999}).status_code == 404
+    unknown_customer = {**purchase, 'customer_id': 999_999, 'delivery_id': delivery_id}
+    assert client.post('/purchases/', json=unknown_customer).status_code == 422
@@ -0,0 +1,36 @@
+"""
+Tests of the indexed customer search.
+"""
+import sys
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+
+
+@pytest.fixture(scope='module')
+def client(migrated) -> Iterator[TestClient]:
+    """A client of the app with a customer to find."""
+    with TestClient(app) as test_client:
+        test_client.post('/customers/', json={
+            'firstname': "Barry", 'lastname': "Allen", 'email': "barry@starlabs.com",
+            'phone': "555-010-1940", 'delivery_address': "Central City", 'billing_address': "Central City",
+        })
+        yield test_client
+
+
+@pytest.mark.parametrize('q', ["barr", "allen b", "barry@star", "5550101"])
+def test_prefixes_find_the_customer(client: TestClient, q: str) -> None:
+    """Names, full names, emails and phone numbers match by prefix."""
+    found = client.get('/customers/search', params={'q': q}).json()
+    assert "barry@starlabs.com" in [customer['email'] for customer in found]
+
+
+@pytest.mark.parametrize('q', [chr(sys.maxunicode), "barr" + chr(sys.maxunicode), "b" + chr(0xD7FF)])
+def test_prefixes_without_a_successor(client: TestClient, q: str) -> None:
+    """Prefixes ending in the last code point, or before the surrogates, are searched too."""
+    response = client.get('/customers/search', params={'q': q})
+    assert response.status_code == 200
+    assert response.json() == []
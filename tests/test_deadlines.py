@@ -0,0 +1,119 @@
+"""
+Tests of query deadlines enforced by the SQLite progress handler.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+from typing import Iterator
+
+import pytest
+from fastapi import Depends
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from api import deadlines
+from api.deadlines import query_deadline
+from api.dependencies import engine, get_db
+from api.main import app
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A query that never ends on its own
+ENDLESS: str = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c"
+)
+
+# Opens a pooled connection before api.deadlines is imported, then runs an
+# endless query on it under an expiring deadline
+EARLY_CONNECTION = textwrap.dedent("""
+    import sys
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from api.dependencies import current_deadline, engine
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    from api.deadlines import Deadline
+    current_deadline.set(Deadline(0.2))
+    with engine.connect() as connection:
+        try:
+            connection.execute(text(
+                "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) "
+                "SELECT count(*) FROM c"
+            ))
+        except OperationalError as error:
+            sys.exit(0 if "interrupted" in str(error) else 1)
+    sys.exit(1)
+""")
+
+
+def test_deadline_interrupts_connections_opened_before_import(migrated) -> None:
+    """Every connection checks the deadline, whatever the import order."""
+    result = subprocess.run([sys.executable, '-c', EARLY_CONNECTION], cwd=ROOT, timeout=30)
+    assert result.returncode == 0
+
+
+def test_no_deadline_is_a_no_op(migrated) -> None:
+    """Outside requests the progress handler lets statements run."""
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM products")).scalar() >= 0
+
+
+def _endless(db: Session = Depends(get_db)) -> dict[str, int]:
+    """Test endpoint that runs the endless query; a def endpoint, like the slow ones."""
+    return {'count': db.execute(text(ENDLESS)).scalar()}
+
+
+@pytest.fixture(scope='module')
+def slow_routes(migrated) -> Iterator[None]:
+    """Two test GET routes running the endless query, one with a short deadline, one with none."""
+    routes = list(app.router.routes)
+    app.add_api_route('/tests/endless/expiring', _endless, dependencies=[Depends(query_deadline(0.2))])
+    app.add_api_route('/tests/endless/unbounded', _endless, dependencies=[Depends(query_deadline(None))])
+    yield
+    app.router.routes[:] = routes
+
+
+def test_slow_read_past_its_deadline_is_a_504(slow_routes) -> None:
+    """A GET whose query outlives its deadline is interrupted and answered with a 504."""
+    expired = deadlines.stats['expired']
+    with TestClient(app) as client:
+        response = client.get('/tests/endless/expiring')
+    assert response.status_code == 504
+    assert response.json() == {'detail': "Query deadline exceeded"}
+    assert deadlines.stats['expired'] == expired + 1
+
+
+def test_disconnect_cancels_a_def_endpoint_query(slow_routes) -> None:
+    """A client leaving while a threadpool endpoint queries interrupts that query."""
+    disconnected = deadlines.stats['disconnected']
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': '/tests/endless/unbounded', 'raw_path': b'/tests/endless/unbounded',
+        'root_path': '', 'query_string': b'', 'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    messages = []
+
+    async def request() -> None:
+        sent = False
+
+        async def receive() -> dict:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Leave once the query is running
+            await asyncio.sleep(0.3)
+            return {'type': 'http.disconnect'}
+
+        async def send(message: dict) -> None:
+            messages.append(message)
+
+        await asyncio.wait_for(app(scope, receive, send), timeout=30)
+
+    asyncio.run(request())
+    assert deadlines.stats['disconnected'] == disconnected + 1
+    assert messages[0]['status'] == 504
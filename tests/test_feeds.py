@@ -0,0 +1,74 @@
+"""
+Tests of the keyset-paginated comment feed in api.feeds.
+"""
+from datetime import datetime
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.dependencies import SessionLocal
+from api.feeds import comment_feed, decode_cursor, encode_cursor
+from api.main import app
+from api.models.comment import Comment
+from api.models.customer import Customer
+from api.models.product import Product
+
+
+@pytest.fixture
+def product_id(migrated) -> Iterator[int]:
+    """A product with six comments, three of them at a whole second."""
+    with SessionLocal() as db:
+        product = Product(
+            name="Feed test", price=9.99, image_url="https://example.com/p.png",
+            category="Comics", description="A product", quantity=1, in_stock=True
+        )
+        customer = Customer(
+            firstname="Lois", lastname="Lane", email="lois.feeds@dailyplanet.com",
+            phone="555-010-9999", delivery_address="Metropolis", billing_address="Metropolis"
+        )
+        db.add_all([product, customer])
+        db.flush()
+        for created_at in (datetime(2026, 1, 1, 12), datetime(2026, 1, 1, 12, 0, 0, 500)):
+            for _ in range(3):
+                db.add(Comment(
+                    content="Great comic", customer_id=customer.id, product_id=product.id,
+                    created_at=created_at
+                ))
+        db.commit()
+        yield product.id
+        db.delete(product)
+        db.delete(customer)
+        db.commit()
+
+
+@pytest.mark.parametrize('page_sizes', [(3, 1, 1, 1), (1, 1, 1, 1, 1, 1), (2, 2, 2), (4, 4)])
+def test_pages_cross_whole_second_timestamps(product_id: int, page_sizes: tuple[int, ...]) -> None:
+    """Paging returns every comment once, newest first, across a zero-microsecond timestamp."""
+    with SessionLocal() as db:
+        expected = [row['id'] for row in comment_feed(db, product_id, 6)]
+        seen: list[int] = []
+        before = None
+        for limit in page_sizes:
+            rows = comment_feed(db, product_id, limit, before)
+            seen.extend(row['id'] for row in rows)
+            if rows:
+                before = decode_cursor(encode_cursor(rows[-1]))
+        assert len(expected) == 6
+        assert seen == expected
+
+
+@pytest.mark.parametrize('method', ['patch', 'put'])
+def test_renaming_the_author_refreshes_cached_pages(product_id: int, method: str) -> None:
+    """Cached first pages show a customer's new name once it is changed."""
+    with TestClient(app) as client:
+        page = client.get(f'/comments/products/{product_id}/feed').json()
+        customer_id = page['items'][0]['customer_id']
+        customer = client.get(f'/customers/{customer_id}').json()
+        changes = {'firstname': "Louise"}
+        if method == 'put':
+            changes = {**customer, **changes}
+            del changes['id']
+        assert getattr(client, method)(f'/customers/{customer_id}', json=changes).status_code == 200
+        page = client.get(f'/comments/products/{product_id}/feed').json()
+        assert {item['customer_name'] for item in page['items']} == {"Louise Lane"}
@@ -0,0 +1,40 @@
+"""
+Tests of `?fields=` sparse fieldsets on read endpoints.
+"""
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+
+
+@pytest.fixture(scope='module')
+def client(migrated) -> Iterator[TestClient]:
+    """A client of the app with a customer to read back."""
+    with TestClient(app) as test_client:
+        test_client.post('/customers/', json={
+            'firstname': "Diana", 'lastname': "Prince", 'email': "diana@themyscira.com",
+            'phone': "555-010-0042", 'delivery_address': "Themyscira", 'billing_address': "Themyscira",
+        })
+        yield test_client
+
+
+def test_fields_are_those_of_the_response(client: TestClient) -> None:
+    """A fieldset returns the requested fields of the response schema, plus the ID."""
+    customers = client.get('/customers/', params={'fields': 'email', 'limit': 1000}).json()
+    diana = next(c for c in customers if c['email'] == "diana@themyscira.com")
+    assert set(diana) == {'id', 'email'}
+
+
+@pytest.mark.parametrize('path, field', [
+    ('/customers/', 'search_firstname'),
+    ('/customers/', 'created_at'),
+    ('/products/', 'updated_at'),
+    ('/purchases/', 'unit_price'),
+])
+def test_unexposed_columns_are_rejected(client: TestClient, path: str, field: str) -> None:
+    """Columns the response schema does not expose cannot be asked for."""
+    response = client.get(path, params={'fields': field})
+    assert response.status_code == 400
+    assert field in response.json()['detail']
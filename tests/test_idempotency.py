@@ -0,0 +1,113 @@
+"""
+Tests of Idempotency-Key replays, within a worker and across workers.
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select, update
+
+from api.dependencies import SessionLocal, engine
+from api.idempotency import KEYS
+from api.main import app
+from api.models.purchase import Purchase
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Stands for a second worker: a separate process with its own app, posting
+# the purchase given on the command line with the given key
+OTHER_WORKER = textwrap.dedent("""
+    import json
+    import sys
+    from fastapi.testclient import TestClient
+    from api.main import app
+    with TestClient(app) as client:
+        response = client.post(
+            '/purchases/', json=json.loads(sys.argv[2]), headers={'Idempotency-Key': sys.argv[1]}
+        )
+    sys.exit(0 if response.status_code == 200 else 1)
+""")
+
+
+@pytest.fixture
+def client(migrated) -> Iterator[TestClient]:
+    """A client of the app, started and stopped around each test."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def purchase(client: TestClient) -> dict[str, int]:
+    """The body of a purchase of a fresh product by a fresh customer."""
+    product = client.post('/products/', json={
+        'name': 'Cape', 'price': 10.5, 'image_url': 'u', 'category': 'Clothing',
+        'description': 'Red', 'quantity': 100, 'in_stock': True,
+    }).json()
+    customer = client.post('/customers/', json={
+        'firstname': 'Clark', 'lastname': 'Kent', 'email': f"retry{product['id']}@dailyplanet.com",
+        'phone': '555-010-1234', 'delivery_address': 'Metropolis', 'billing_address': 'Metropolis',
+    }).json()
+    delivery = client.post('/deliveries/', json={'type': 'STANDARD', 'min_days': 1, 'max_days': 3}).json()
+    return {
+        'customer_id': customer['id'], 'product_id': product['id'],
+        'delivery_id': delivery['id'], 'quantity': 1,
+    }
+
+
+def _purchases(customer_id: int) -> int:
+    """Number of purchases of a customer."""
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).where(Purchase.customer_id == customer_id))
+
+
+def test_retry_is_replayed(client: TestClient, purchase: dict[str, int]) -> None:
+    """A retry with the same key gets the first response and writes nothing."""
+    headers = {'Idempotency-Key': 'retry'}
+    first = client.post('/purchases/', json=purchase, headers=headers)
+    second = client.post('/purchases/', json=purchase, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers['idempotent-replayed'] == 'true'
+    assert _purchases(purchase['customer_id']) == 1
+
+
+def test_key_reused_with_another_body(client: TestClient, purchase: dict[str, int]) -> None:
+    """A key cannot be reused for a different request."""
+    headers = {'Idempotency-Key': 'reused'}
+    assert client.post('/purchases/', json=purchase, headers=headers).status_code == 200
+    other = client.post('/purchases/', json={**purchase, 'quantity': 2}, headers=headers)
+    assert other.status_code == 422
+    assert _purchases(purchase['customer_id']) == 1
+
+
+def test_retry_on_another_worker_is_replayed(client: TestClient, purchase: dict[str, int]) -> None:
+    """Keys are shared through the database, so any worker replays them."""
+    result = subprocess.run(
+        [sys.executable, '-c', OTHER_WORKER, 'other-worker', json.dumps(purchase)], cwd=ROOT, timeout=60
+    )
+    assert result.returncode == 0
+    retry = client.post('/purchases/', json=purchase, headers={'Idempotency-Key': 'other-worker'})
+    assert retry.status_code == 200
+    assert retry.headers['idempotent-replayed'] == 'true'
+    assert _purchases(purchase['customer_id']) == 1
+
+
+def test_dead_attempt_that_wrote_is_not_rerun(client: TestClient, purchase: dict[str, int]) -> None:
+    """An attempt that committed, then died before its response was kept, is never repeated."""
+    headers = {'Idempotency-Key': 'lost'}
+    assert client.post('/purchases/', json=purchase, headers=headers).status_code == 200
+    # As if the worker died between the commit and storing the response
+    with engine.begin() as connection:
+        connection.execute(update(KEYS).where(KEYS.c.key == '/purchases/:lost').values(
+            status=None, headers=None, body=None,
+            locked_until=datetime.now(timezone.utc) - timedelta(seconds=1)
+        ))
+    retry = client.post('/purchases/', json=purchase, headers=headers)
+    assert retry.status_code == 409
+    assert _purchases(purchase['customer_id']) == 1
@@ -0,0 +1,225 @@
+"""
+Query-plan regression tests for the router queries.
+
+Builds the schema with the Alembic migrations, calls every read endpoint
+directly, captures each SELECT it sends to SQLite and runs `EXPLAIN QUERY
+PLAN` on it. A case fails when a query scans a whole table or sorts
+through a temporary B-tree, unless the endpoint is listed as allowed to
+(unfiltered paged listings). Run them after changing a query or an index.
+"""
+import asyncio
+import inspect
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+import pytest
+from sqlalchemy import create_engine, event
+
+from api.dependencies import Base, SessionLocal, engine
+from api.startup import load_models
+
+load_models()
+
+from api.models.comment import Comment
+from api.models.customer import Customer
+from api.models.delivery import Delivery, DeliveryType
+from api.models.product import Product
+from api.models.purchase import Purchase
+from api.models.rating import Rating
+from api.routers import comments, customers, deliveries, products, purchases, ratings, reports
+from api.rollups import rebuild_rollups
+from api.scores import refresh_scores
+
+
+@dataclass
+class Case:
+    """A read endpoint called with sample arguments."""
+    name: str
+    endpoint: Callable
+    kwargs: dict[str, Any] = field(default_factory=dict)
+    # Unfiltered paged listings read the table in rowid order by design
+    allow_scan: bool = False
+    allow_temp_sort: bool = False
+
+
+def _ago(days: int) -> datetime:
+    """A moment `days` days ago."""
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+CASES: list[Case] = [
+    Case('GET /comments/products/{id}', comments.get_product_reviews, {'product_id': 1}),
+    Case('GET /comments/products/{id}/feed', comments.get_product_feed,
+         {'product_id': 1, 'limit': 50, 'cursor': None}),
+    Case('GET /comments/products/{id}/feed?cursor=', comments.get_product_feed,
+         {'product_id': 1, 'limit': 5, 'cursor': f"{datetime.utcnow().isoformat()}_10"}),
+    Case('GET /customers/', customers.get_customers,
+         {'skip': 0, 'limit': 100, 'fields': None}, allow_scan=True),
+    Case('GET /customers/?fields=', customers.get_customers,
+         {'skip': 0, 'limit': 100, 'fields': 'email'}, allow_scan=True),
+    Case('GET /customers/search (name)', customers.search_customers, {'q': 'cla', 'limit': 20}),
+    Case('GET /customers/search (full name)', customers.search_customers,
+         {'q': 'clark ke', 'limit': 20}),
+    Case('GET /customers/search (email)', customers.search_customers,
+         {'q': 'clark1@', 'limit': 20}),
+    Case('GET /customers/search (phone)', customers.search_customers,
+         {'q': '555-01', 'limit': 20}),
+    Case('GET /customers/{id}', customers.get_customer, {'customer_id': 1, 'fields': None}),
+    Case('GET /deliveries/', deliveries.get_deliveries,
+         {'skip': 0, 'limit': 100}, allow_scan=True),
+    Case('GET /products/', products.get_products,
+         {'skip': 0, 'limit': 100, 'category': None, 'sort': products.ProductSort.ID,
+          'fields': None}, allow_scan=True),
+    Case('GET /products/?category=', products.get_products,
+         {'skip': 0, 'limit': 100, 'category': 'Comics', 'sort': products.ProductSort.ID,
+          'fields': None}),
+    Case('GET /products/?sort=price', products.get_products,
+         {'skip': 0, 'limit': 100, 'category': None, 'sort': products.ProductSort.PRICE,
+          'fields': None}),
+    Case('GET /products/?category=&sort=-price', products.get_products,
+         {'skip': 0, 'limit': 100, 'category': 'Comics',
+          'sort': products.ProductSort.PRICE_DESC, 'fields': None}),
+    Case('GET /products/?sort=best_rated', products.get_products,
+         {'skip': 0, 'limit': 100, 'category': None,
+          'sort': products.ProductSort.BEST_RATED, 'fields': None}),
+    Case('GET /products/?category=&sort=best_rated', products.get_products,
+         {'skip': 0, 'limit': 100, 'category': 'Comics',
+          'sort': products.ProductSort.BEST_RATED, 'fields': None}),
+    Case('GET /products/?category=&sort=most_liked&fields=', products.get_products,
+         {'skip': 0, 'limit': 100, 'category': 'Comics',
+          'sort': products.ProductSort.MOST_LIKED, 'fields': 'name,price'}),
+    Case('GET /products/{id}', products.get_product, {'product_id': 1, 'fields': None}),
+    Case('GET /products/{id}?fields=', products.get_product,
+         {'product_id': 1, 'fields': 'name,price'}),
+    Case('GET /products/{id}/detail', products.get_product_detail,
+         {'product_id': 1, 'comments': 10}),
+    # Without a range every purchase is listed, archived ones included
+    Case('GET /purchases/', purchases.get_purchases,
+         {'skip': 0, 'limit': 100, 'since': None, 'until': None, 'fields': None},
+         allow_scan=True, allow_temp_sort=True),
+    Case('GET /purchases/?since=recent', purchases.get_purchases,
+         {'skip': 0, 'limit': 100, 'since': _ago(7), 'until': None, 'fields': None}),
+    Case('GET /purchases/customers/{id}', purchases.get_customer_purchases,
+         {'customer_id': 1, 'since': None, 'until': None, 'fields': None}),
+    Case('GET /purchases/customers/{id}?since=recent', purchases.get_customer_purchases,
+         {'customer_id': 1, 'since': _ago(7), 'until': None, 'fields': None}),
+    # Merging the hot and archived halves of a range needs a sort
+    Case('GET /purchases/customers/{id}?since=old', purchases.get_customer_purchases,
+         {'customer_id': 1, 'since': _ago(365), 'until': None, 'fields': None},
+         allow_temp_sort=True),
+    Case('GET /ratings/products/{id}', ratings.get_product_ratings, {'product_id': 1}),
+    # Rollups hold one row per product per bucket, so re-sorting them is cheap
+    Case('GET /reports/categories', reports.get_category_revenue,
+         {'grain': reports.ReportGrain.DAY, 'since': _ago(30), 'until': None, 'category': None},
+         allow_temp_sort=True),
+    Case('GET /reports/categories?category=', reports.get_category_revenue,
+         {'grain': reports.ReportGrain.DAY, 'since': _ago(30), 'until': None,
+          'category': 'Comics'}),
+    Case('GET /reports/categories?grain=week', reports.get_category_revenue,
+         {'grain': reports.ReportGrain.WEEK, 'since': _ago(90), 'until': None,
+          'category': 'Comics'}, allow_temp_sort=True),
+    Case('GET /reports/products', reports.get_products_revenue,
+         {'grain': reports.ReportGrain.HOUR, 'since': _ago(30), 'until': None,
+          'category': None, 'skip': 0, 'limit': 1000}),
+    Case('GET /reports/products/{id}', reports.get_product_revenue,
+         {'product_id': 1, 'grain': reports.ReportGrain.DAY, 'since': _ago(30), 'until': None}),
+]
+
+
+@pytest.fixture(scope='module')
+def seeded(migrated) -> None:
+    """A few rows in every table, so that the planner has something to plan for."""
+    with SessionLocal() as db:
+        db.add(Delivery(type=DeliveryType.STANDARD, min_days=2, max_days=5))
+        for i in range(1, 21):
+            db.add(Product(
+                name=f"Product {i}", price=5.0 + i, image_url="https://example.com/p.png",
+                category="Comics" if i % 2 else "Clothing", description="A product",
+                quantity=10, in_stock=True
+            ))
+            db.add(Customer(
+                firstname="Clark", lastname="Kent", email=f"clark{i}@dailyplanet.com",
+                phone=f"555-010-{i:04d}", delivery_address="Metropolis",
+                billing_address="Metropolis"
+            ))
+        db.flush()
+        for i in range(1, 21):
+            db.add(Comment(content="Great comic", customer_id=i, product_id=1))
+            db.add(Rating(rating=i % 5 + 1, customer_id=i, product_id=1))
+            db.add(Purchase(
+                customer_id=1, product_id=i, delivery_id=1, quantity=1, unit_price=5.0 + i,
+                purchase_date=_ago(i * 10)
+            ))
+        db.commit()
+        rebuild_rollups(db)
+        refresh_scores(db)
+
+
+def problems(plan: list[str], case: Case) -> list[str]:
+    """The plan lines that break the rules for a case."""
+    found = []
+    for detail in plan:
+        full_scan = detail.startswith('SCAN') and 'USING' not in detail and 'CONSTANT ROW' not in detail
+        if full_scan and not case.allow_scan:
+            found.append(detail)
+        if 'TEMP B-TREE' in detail and not case.allow_temp_sort:
+            found.append(detail)
+    return found
+
+
+
+def _indexes(connection: Any) -> set[tuple[str, str, tuple[str, ...]]]:
+    """Table, name and columns of every named index of a SQLite database."""
+    rows = connection.exec_driver_sql(
+        "SELECT tbl_name, name FROM sqlite_master "
+        "WHERE type = 'index' AND name NOT LIKE 'sqlite_autoindex_%'"
+    ).all()
+    return {
+        (table, name, tuple(
+            column[2] for column in connection.exec_driver_sql(f"PRAGMA index_info('{name}')")
+        ))
+        for table, name in rows
+    }
+
+
+def test_migrations_match_models(migrated, tmp_path) -> None:
+    """The migrated schema has exactly the indexes the models declare."""
+    models = create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    Base.metadata.create_all(models)
+    with models.connect() as expected, engine.connect() as actual:
+        assert _indexes(actual) == _indexes(expected)
+    models.dispose()
+
+
+@pytest.mark.parametrize('case', CASES, ids=lambda case: case.name)
+def test_query_plan(seeded, case: Case) -> None:
+    """Every query of an endpoint is served by an index, or allowed not to be."""
+    captured: list[tuple[str, Any]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        with SessionLocal() as db:
+            kwargs = dict(case.kwargs)
+            if 'db' in case.endpoint.__code__.co_varnames:
+                kwargs['db'] = db
+            result = case.endpoint(**kwargs)
+            # Endpoints that can run long queries are plain functions
+            if inspect.iscoroutine(result):
+                asyncio.run(result)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+    assert captured, f"{case.name} executed no SQL"
+    with engine.connect() as conn:
+        for statement, parameters in captured:
+            plan = [
+                row[-1] for row in
+                conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            ]
+            bad = problems(plan, case)
+            assert not bad, f"{' '.join(statement.split())}\n" + "\n".join(plan)
@@ -0,0 +1,56 @@
+"""
+Tests that the incremental revenue rollups match a rebuild.
+"""
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from api.dependencies import SessionLocal
+from api.main import app
+from api.models.revenue import RevenueDaily, RevenueHourly
+from api.rollups import rebuild_rollups
+
+
+@pytest.fixture
+def client(migrated) -> Iterator[TestClient]:
+    """A client of the app, started and stopped around each test."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _rollups() -> list[tuple]:
+    """Every rollup row, in a stable order."""
+    with SessionLocal() as db:
+        return [
+            (model.__tablename__, row.bucket, row.product_id, row.category, float(row.revenue),
+             row.units, row.orders)
+            for model in (RevenueHourly, RevenueDaily)
+            for row in db.scalars(select(model).order_by(model.bucket, model.product_id))
+        ]
+
+
+def test_category_change_matches_a_rebuild(client: TestClient) -> None:
+    """Sales follow their product to its new category, as a rebuild files them."""
+    product = client.post('/products/', json={
+        'name': "Lasso", 'price': 12.0, 'image_url': "https://example.com/l.png",
+        'category': "Rope", 'description': "Golden", 'quantity': 10, 'in_stock': True,
+    }).json()
+    customer = client.post('/customers/', json={
+        'firstname': "Hal", 'lastname': "Jordan", 'email': "hal@oa.com",
+        'phone': "555-010-2814", 'delivery_address': "Coast City", 'billing_address': "Coast City",
+    }).json()
+    delivery = client.post('/deliveries/', json={'type': 'STANDARD', 'min_days': 1, 'max_days': 2}).json()
+    assert client.post('/purchases/', json={
+        'customer_id': customer['id'], 'product_id': product['id'],
+        'delivery_id': delivery['id'], 'quantity': 2,
+    }).status_code == 200
+
+    client.patch(f"/products/{product['id']}", json={'category': "Artifacts"})
+    incremental = _rollups()
+    assert {row[3] for row in incremental if row[2] == product['id']} == {"Artifacts"}
+
+    with SessionLocal() as db:
+        rebuild_rollups(db)
+    assert _rollups() == incremental
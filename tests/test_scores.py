@@ -0,0 +1,73 @@
+"""
+Tests of the product scores behind ranked catalog listings.
+"""
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from api.dependencies import SessionLocal
+from api.main import app
+from api.models.job import Job
+from api.models.score import ProductScore
+from api.scores import refresh_scores
+
+PRODUCT: dict = {
+    'image_url': "https://example.com/s.png", 'description': "A shield",
+    'price': 20.0, 'quantity': 5, 'in_stock': True,
+}
+
+
+@pytest.fixture
+def client(migrated) -> Iterator[TestClient]:
+    """A client of the app, started and stopped around each test."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _jobs() -> int:
+    """Number of jobs ever queued."""
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(Job))
+
+
+def _score(product_id: int) -> ProductScore:
+    """Stored scores of a product."""
+    with SessionLocal() as db:
+        return db.get(ProductScore, product_id)
+
+
+def test_writes_score_the_product_inline(client: TestClient) -> None:
+    """New products are ranked at once, and ratings move them without a job."""
+    jobs = _jobs()
+    product = client.post('/products/', json={**PRODUCT, 'name': "Shield", 'category': "Armour"}).json()
+    ranked = client.get('/products/', params={'category': "Armour", 'sort': 'best_rated'}).json()
+    assert product['id'] in [p['id'] for p in ranked]
+    assert _score(product['id']).ratings == 0
+
+    customer = client.post('/customers/', json={
+        'firstname': "Steve", 'lastname': "Rogers", 'email': "steve@avengers.com",
+        'phone': "555-010-1941", 'delivery_address': "Brooklyn", 'billing_address': "Brooklyn",
+    }).json()
+    assert client.post('/ratings/', json={
+        'rating': 5, 'customer_id': customer['id'], 'product_id': product['id'],
+    }).status_code == 200
+    score = _score(product['id'])
+    assert (score.ratings, score.average) == (1, 5.0)
+
+    client.patch(f"/products/{product['id']}", json={'category': "Shields"})
+    assert _score(product['id']).category == "Shields"
+    assert _jobs() == jobs
+
+
+def test_single_product_scores_match_a_refresh(client: TestClient) -> None:
+    """Scoring one product gives what a full refresh gives it."""
+    product = client.post('/products/', json={**PRODUCT, 'name': "Buckler", 'category': "Armour"}).json()
+    inline = _score(product['id'])
+    with SessionLocal() as db:
+        refresh_scores(db)
+    refreshed = _score(product['id'])
+    assert (inline.ratings, inline.bayesian, inline.wilson) == pytest.approx(
+        (refreshed.ratings, refreshed.bayesian, refreshed.wilson)
+    )
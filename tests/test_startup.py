@@ -0,0 +1,38 @@
+"""
+Tests of lazy startup, run in a fresh interpreter so nothing is imported yet.
+"""
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports the app in lazy mode, checks what that loaded, then serves a read
+# and an idempotent write through the lazily built middlewares
+LAZY_APP = textwrap.dedent("""
+    import sys
+    import api.main
+    loaded = [name for name in ('api.dependencies', 'api.idempotency', 'api.invalidations',
+                                'api.jobs', 'api.profiler', 'sqlalchemy.orm') if name in sys.modules]
+    assert not loaded, loaded
+    from fastapi.testclient import TestClient
+    with TestClient(api.main.app) as client:
+        assert 'api.jobs' not in sys.modules
+        assert client.get('/products/').status_code == 200
+        delivery = {'type': 'STANDARD', 'min_days': 1, 'max_days': 2}
+        headers = {'Idempotency-Key': 'lazy-startup'}
+        first = client.post('/deliveries/', json=delivery, headers=headers)
+        second = client.post('/deliveries/', json=delivery, headers=headers)
+        assert first.status_code == 200, first.text
+        assert second.headers['idempotent-replayed'] == 'true'
+""")
+
+
+def test_lazy_startup_defers_imports(migrated) -> None:
+    """Lazy mode imports no middleware, job or database module until a request needs it."""
+    env = dict(os.environ, SUPERMAN_LAZY_STARTUP='1')
+    result = subprocess.run(
+        [sys.executable, '-c', LAZY_APP], cwd=ROOT, env=env, timeout=60, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,181 @@
+"""
+End-to-end tests of carrier tracking: deliveries get a carrier and a
+tracking number through the API, then carrier events find them. Replayed,
+duplicate, late and impossible events must leave the deliveries unchanged.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from api.dependencies import SessionLocal
+from api.events import delivery_event
+from api.main import app
+from api.models.delivery import Delivery, DeliveryStatus, DeliveryType
+from api.models.job import Job
+
+
+@pytest.fixture
+def client(migrated) -> Iterator[TestClient]:
+    """A client of the app, started and stopped around each test."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _event(tracking_number: str, status: str, occurred_at: str) -> dict[str, str]:
+    """A carrier tracking event of the test carrier."""
+    return {
+        'carrier': 'DHL', 'tracking_number': tracking_number,
+        'status': status, 'occurred_at': occurred_at,
+    }
+
+
+def test_events_apply_to_a_delivery_created_with_tracking(client: TestClient) -> None:
+    """Tracking set on creation lets carrier events move the delivery along."""
+    created = client.post('/deliveries/', json={
+        'type': 'STANDARD', 'min_days': 1, 'max_days': 3,
+        'carrier': 'DHL', 'tracking_number': 'TRACK-CREATE',
+    })
+    assert created.status_code == 200
+    assert created.json()['tracking_number'] == 'TRACK-CREATE'
+
+    summary = client.post('/deliveries/tracking', json=[
+        _event('TRACK-CREATE', 'Shipped', '2026-10-19T08:00:00Z'),
+        _event('TRACK-CREATE', 'Delivered', '2026-10-19T09:00:00Z'),
+    ]).json()
+    assert (summary['applied'], summary['unknown']) == (2, 0)
+
+    deliveries = {d['id']: d for d in client.get('/deliveries/', params={'limit': 1000}).json()}
+    assert deliveries[created.json()['id']]['status'] == 'Delivered'
+
+
+def test_events_apply_once_tracking_is_set_on_shipping(client: TestClient) -> None:
+    """A delivery is unknown to carriers until shipping assigns its tracking number."""
+    delivery_id = client.post('/deliveries/', json={
+        'type': 'EXPRESS', 'min_days': 1, 'max_days': 2,
+    }).json()['id']
+    events = [_event('TRACK-SHIP', 'Delivered', '2099-01-01T09:00:00Z')]
+    assert client.post('/deliveries/tracking', json=events).json()['unknown'] == 1
+
+    shipped = client.patch(f'/deliveries/{delivery_id}/status', json={
+        'status': 'Shipped', 'carrier': 'DHL', 'tracking_number': 'TRACK-SHIP',
+    })
+    assert shipped.status_code == 200
+    assert (shipped.json()['carrier'], shipped.json()['status']) == ('DHL', 'Shipped')
+
+    summary = client.post('/deliveries/tracking', json=events).json()
+    assert (summary['applied'], summary['unknown']) == (1, 0)
+
+
+def test_shipping_estimates_the_delivery_date(migrated) -> None:
+    """The estimate is set with the Shipped transition, so its event carries it."""
+    shipped_at = datetime(2026, 10, 19, 8, tzinfo=timezone.utc)
+    with SessionLocal() as db:
+        jobs = db.scalar(select(func.count()).select_from(Job))
+        delivery = Delivery(type=DeliveryType.STANDARD, min_days=2, max_days=4)
+        db.add(delivery)
+        db.commit()
+        delivery.update_status(DeliveryStatus.SHIPPED, at=shipped_at)
+        assert delivery.estimated_delivery == shipped_at + timedelta(days=3)
+        payload = delivery_event(delivery, DeliveryStatus.PROCESSING)
+        assert payload['estimated_delivery'] == (shipped_at + timedelta(days=3)).isoformat()
+        db.commit()
+        assert db.scalar(select(func.count()).select_from(Job)) == jobs
+
+    # Deliveries outside any session get one too
+    detached = Delivery(type=DeliveryType.EXPRESS, min_days=1, max_days=2)
+    detached.update_status(DeliveryStatus.SHIPPED, at=shipped_at)
+    assert detached.estimated_delivery == shipped_at + timedelta(days=1.5)
+
+
+def _tracked_delivery(client: TestClient, tracking_number: str) -> int:
+    """Create a delivery tracked by the test carrier and return its ID."""
+    return client.post('/deliveries/', json={
+        'type': 'STANDARD', 'min_days': 1, 'max_days': 3,
+        'carrier': 'DHL', 'tracking_number': tracking_number,
+    }).json()['id']
+
+
+def _status(client: TestClient, delivery_id: int) -> str:
+    """Current status of a delivery."""
+    deliveries = client.get('/deliveries/', params={'limit': 1000}).json()
+    return next(d['status'] for d in deliveries if d['id'] == delivery_id)
+
+
+def _outcomes(summary: dict) -> dict[str, int]:
+    """The per-event outcome counts of an ingestion summary."""
+    return {name: summary[name] for name in ('applied', 'duplicates', 'stale', 'unknown', 'rejected')}
+
+
+def test_redelivered_batch_is_stale(client: TestClient) -> None:
+    """Sending a batch again changes nothing."""
+    delivery_id = _tracked_delivery(client, 'TRACK-REDELIVER')
+    batch = [
+        _event('TRACK-REDELIVER', 'Shipped', '2026-10-19T08:00:00Z'),
+        _event('TRACK-REDELIVER', 'In Transit', '2026-10-19T09:00:00Z'),
+    ]
+    assert client.post('/deliveries/tracking', json=batch).json()['applied'] == 2
+    again = client.post('/deliveries/tracking', json=batch).json()
+    assert _outcomes(again) == {'applied': 0, 'duplicates': 0, 'stale': 2, 'unknown': 0, 'rejected': 0}
+    assert _status(client, delivery_id) == 'In Transit'
+
+
+def test_duplicates_within_a_batch_apply_once(client: TestClient) -> None:
+    """The same event twice in one batch counts once."""
+    _tracked_delivery(client, 'TRACK-DUPLICATE')
+    event = _event('TRACK-DUPLICATE', 'Shipped', '2026-10-19T08:00:00Z')
+    summary = client.post('/deliveries/tracking', json=[event, event]).json()
+    assert _outcomes(summary) == {'applied': 1, 'duplicates': 1, 'stale': 0, 'unknown': 0, 'rejected': 0}
+
+
+def test_out_of_order_events(client: TestClient) -> None:
+    """Events apply in the order they occurred, within a batch and across batches."""
+    delivery_id = _tracked_delivery(client, 'TRACK-ORDER')
+    summary = client.post('/deliveries/tracking', json=[
+        _event('TRACK-ORDER', 'In Transit', '2026-10-19T09:00:00Z'),
+        _event('TRACK-ORDER', 'Shipped', '2026-10-19T08:00:00Z'),
+    ]).json()
+    assert summary['applied'] == 2
+    assert _status(client, delivery_id) == 'In Transit'
+
+    # A late event from before the latest applied one is ignored
+    late = client.post('/deliveries/tracking', json=[
+        _event('TRACK-ORDER', 'Shipped', '2026-10-19T08:30:00Z'),
+    ]).json()
+    assert _outcomes(late) == {'applied': 0, 'duplicates': 0, 'stale': 1, 'unknown': 0, 'rejected': 0}
+    assert _status(client, delivery_id) == 'In Transit'
+
+
+def test_delivery_before_shipping_is_rejected(client: TestClient) -> None:
+    """A Delivered event dated before the shipping date is rejected, not the whole batch."""
+    delivery_id = _tracked_delivery(client, 'TRACK-REJECT')
+    other_id = _tracked_delivery(client, 'TRACK-REJECT-OTHER')
+    client.patch(f'/deliveries/{delivery_id}/status', json={'status': 'Shipped'})
+    summary = client.post('/deliveries/tracking', json=[
+        _event('TRACK-REJECT', 'Delivered', '2020-01-01T00:00:00Z'),
+        _event('TRACK-REJECT-OTHER', 'Shipped', '2026-10-19T08:00:00Z'),
+    ]).json()
+    assert _outcomes(summary) == {'applied': 1, 'duplicates': 0, 'stale': 0, 'unknown': 0, 'rejected': 1}
+    assert (_status(client, delivery_id), _status(client, other_id)) == ('Shipped', 'Shipped')
+
+
+def test_ndjson_with_invalid_lines(client: TestClient) -> None:
+    """Invalid NDJSON lines are counted and reported by line; the valid ones apply."""
+    delivery_id = _tracked_delivery(client, 'TRACK-NDJSON')
+    lines = [
+        json.dumps(_event('TRACK-NDJSON', 'Shipped', '2026-10-19T08:00:00Z')),
+        'not json',
+        json.dumps({'carrier': 'DHL'}),
+        '',
+        json.dumps(_event('TRACK-NDJSON', 'In Transit', '2026-10-19T09:00:00Z')),
+    ]
+    summary = client.post(
+        '/deliveries/tracking', content='\n'.join(lines),
+        headers={'content-type': 'application/x-ndjson'}
+    ).json()
+    assert (summary['received'], summary['invalid'], summary['applied']) == (4, 2, 2)
+    assert [error['line'] for error in summary['errors']] == [2, 3]
+    assert _status(client, delivery_id) == 'In Transit'